@@ -40,6 +40,58 @@ API_CONFIG = {
     "version": "1.0.0"
 }
 
+# 批量行情并发拉取配置
+QUOTE_FANOUT_CONFIG = {
+    "max_workers": 16,     # 调用akshare的线程池大小（所有请求共享）
+    "timeout_seconds": 5,  # 单只股票请求超时时间（从线程开始执行算起）
+    "queue_timeout_seconds": 15  # 线程池繁忙时单只股票最长排队时间，超过后取消该请求
+}
+
+# 综合资讯接口：各数据源并发获取，单个数据源超时（秒）后跳过
+NEWS_COMBINED_CONFIG = {
+    "max_workers": 8,
+    "research_workers": 4,  # 研报接口限流时会退避重试，单独使用线程池，不占用其他数据源的线程
+    "timeout_seconds": {
+        "stock_name": 5,
+        "news": 10,
+        "announcement": 5,
+        "research": 20
+    }
+}
+
+# 个股档案缓存（名称、行业、股本）：内存过期时间（秒）后重新读库，库中档案超过 stale_days 天回源刷新
+STOCK_PROFILE_CONFIG = {
+    "maxsize": 8192,
+    "ttl": 6 * 3600,
+    "stale_days": 7
+}
+
+# 研报PDF磁盘缓存：按URL哈希存放，总大小超过 max_bytes 后淘汰最久未使用的文件
+PDF_CACHE_CONFIG = {
+    "directory": os.getenv("PDF_CACHE_DIR", str(Path(__file__).parent / "pdf_cache")),
+    "max_bytes": 2 * 1024 ** 3,
+    "timeout_seconds": 60,
+    "connection_limit": 20
+}
+
+# akshare接口缓存配置（过期时间单位：秒）
+AKSHARE_CACHE_CONFIG = {
+    "maxsize": 1024,
+    "ttl": {
+        "realtime_quote": 5,
+        "kline_hist": 600,
+        "kline_min_hist": 60,
+        "latest_financial": 6 * 3600,
+        "financial_indicator_list": 6 * 3600
+    }
+}
+
+# 智能分析结果缓存配置：键中包含最新日线日期和实时行情更新时间，数据变化即自然失效，ttl 只作兜底
+ANALYSIS_CACHE_CONFIG = {
+    "maxsize": 2048,
+    "ttl": 3600
+}
+
 # CORS配置
 CORS_CONFIG = {
     "allow_origins": ["*"],
@@ -35,6 +35,15 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+@contextmanager
+def session_scope() -> Generator[Session, None, None]:
+    """在 with 块内使用的数据库会话，退出时关闭并把连接还给连接池"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # def init_db():
 #     """初始化数据库"""
 #     from .models import (
@@ -37,6 +37,10 @@ from .stock.history_api import router as history_router
 from .stock.stock_fund_flow import router as stock_fund_flow_router
 from .stock.stock_news import router as stock_news_router
 from .stock.stock_analysis_routes import router as stock_analysis_router
+from .stock.screener_routes import router as screener_router
+from .stock.stock_profile import stock_profile_cache
+from .stock.pdf_cache import pdf_cache
+from starlette.concurrency import run_in_threadpool
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -86,6 +90,7 @@ app.include_router(stock_router)
 app.include_router(history_router)
 app.include_router(stock_fund_flow_router)
 app.include_router(stock_news_router)
+app.include_router(screener_router)  # 添加选股路由
 
 # 根路由重定向到管理后台
 @app.get("/")
@@ -102,6 +107,16 @@ async def startup_event():
     except Exception as e:
         logger.error(f"数据库初始化失败: {str(e)}")
         raise
+    try:
+        # 预热个股档案缓存，资讯/研报请求直接命中内存
+        await run_in_threadpool(stock_profile_cache.warm)
+    except Exception as e:
+        logger.warning(f"个股档案缓存预热失败: {str(e)}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时释放研报PDF回源的连接池"""
+    await pdf_cache.close()
 
 if __name__ == "__main__":
     uvicorn.run("backend_api.main:app", host="0.0.0.0", port=5000, reload=True) 
\ No newline at end of file
@@ -5,7 +5,7 @@
 from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel, EmailStr
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float, Date, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float, Date, Text, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -290,6 +290,7 @@ class StockNews(Base):
     created_at = Column(DateTime)
     
     __table_args__ = (
+        UniqueConstraint('stock_code', 'title', 'publish_time', name='uq_stock_news_code_title_time'),
         {'sqlite_autoincrement': True},
     )
 
@@ -314,6 +315,7 @@ class StockResearchReport(Base):
     updated_at = Column(DateTime)
     
     __table_args__ = (
+        UniqueConstraint('stock_code', 'report_name', 'report_date', name='uq_stock_research_reports_code_name_date'),
         {'sqlite_autoincrement': True},
     )
 
@@ -0,0 +1,336 @@
+"""
+交易建议回测
+按日回放 historical_quotes，用与 TradingRecommendation 相同的规则生成每只股票每天的 买入/卖出/持有 信号，
+模拟仓位并统计收益、胜率和最大回撤。
+
+信号在整段历史的指标序列上一次算出：各指标都是因果的（只依赖当天及之前的数据），
+第 t 天的值与"把前 t 天数据交给 generate_recommendation"得到的结果相同，无需逐日重算。
+全市场回测按股票分块，用进程池并行，每个进程自行从数据库加载所负责的股票。
+
+运行: python -m backend_api.stock.backtest --start 2019-01-01 --end 2023-12-31 --workers 8
+"""
+
+import argparse
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from . import indicator_kernel
+
+logger = logging.getLogger(__name__)
+
+BUY, HOLD, SELL = 1, 0, -1
+
+# 回测起点之前额外加载的自然日数，用于指标预热（覆盖 MACD/布林带的收敛期）
+WARMUP_DAYS = 180
+# 与 TradingRecommendation 一致：至少 20 根K线才给出建议
+MIN_BARS = 20
+TRADING_DAYS_PER_YEAR = 252
+# 单边交易成本（佣金 + 滑点，卖出另计印花税）
+DEFAULT_COST = 0.0005
+STAMP_DUTY = 0.0005
+
+BARS_SQL = """
+    SELECT code, date, open, high, low, close, volume
+    FROM historical_quotes
+    WHERE code = ANY(:codes) AND date BETWEEN :start AND :end
+      AND close IS NOT NULL AND high IS NOT NULL AND low IS NOT NULL
+    ORDER BY code, date
+"""
+
+
+def signal_series(highs: Sequence[float], lows: Sequence[float], closes: Sequence[float],
+                  volumes: Sequence[float]) -> Dict[str, np.ndarray]:
+    """
+    逐日信号序列，规则与 TradingRecommendation._analyze_signals/_generate_action 相同，当日收盘价作为当前价格
+
+    Returns:
+        Dict[str, np.ndarray]: action（1 买入 / 0 持有 / -1 卖出）、bullish、bearish（看多/看空信号数）
+    """
+    closes = np.asarray(closes, dtype=float)
+    volumes = np.nan_to_num(np.asarray(volumes, dtype=float))
+    n = len(closes)
+    series = indicator_kernel.compute_indicators(highs, lows, closes)
+
+    # 与 TechnicalIndicators.latest 相同的取整和缺省值
+    def latest(key, default, digits=2):
+        return np.round(np.where(np.isfinite(series[key]), series[key], default), digits)
+
+    rsi = latest("rsi", 50.0)
+    macd, hist = latest("macd", 0.0, 4), latest("macd_hist", 0.0, 4)
+    j = latest("j", 50.0)
+    upper, lower = latest("boll_upper", 0.0), latest("boll_lower", 0.0)
+    with np.errstate(invalid='ignore'):
+        # 相对容差避免累加和相减的舍入误差把"相等"判成"放大"
+        volume_up = indicator_kernel.sma(volumes, 5) > indicator_kernel.sma(volumes, 20) * (1 + 1e-9)
+
+    bullish = ((rsi < 30).astype(int) + ((macd > 0) & (hist > 0)) + (j < 20)
+               + (closes < lower) + volume_up)
+    bearish = ((rsi > 70).astype(int) + ((macd < 0) & (hist < 0)) + (j > 80) + (closes > upper))
+
+    action = np.full(n, HOLD, dtype=np.int8)
+    action[(bullish > bearish) & (bullish >= 3)] = BUY
+    action[(bearish > bullish) & (bearish >= 3)] = SELL
+    action[:MIN_BARS - 1] = HOLD
+    return {"action": action, "bullish": bullish, "bearish": bearish}
+
+
+def simulate(opens: Sequence[float], closes: Sequence[float], actions: Sequence[int],
+             cost: float = DEFAULT_COST) -> Dict:
+    """
+    只做多的仓位模拟：第 t 天收盘出信号，第 t+1 天开盘按信号买入或卖出，持有信号保持原仓位
+
+    Args:
+        opens: 开盘价（缺失时用前一天收盘价）
+        closes: 收盘价
+        actions: signal_series 的 action
+        cost: 单边交易成本，卖出另加印花税
+
+    Returns:
+        Dict: position（每天收盘时是否持仓）、returns（每日收益）、trades（每笔交易收益）
+    """
+    closes = np.asarray(closes, dtype=float)
+    opens = np.asarray(opens, dtype=float)
+    actions = np.asarray(actions)
+    n = len(closes)
+    prev_close = np.concatenate(([np.nan], closes[:-1]))
+    opens = np.where(np.isfinite(opens) & (opens > 0), opens, prev_close)
+
+    # 信号决定的目标仓位（沿用最近一次买入/卖出），次日生效
+    target = np.where(actions == BUY, 1.0, np.where(actions == SELL, 0.0, np.nan))
+    target = pd.Series(target).ffill().fillna(0.0).to_numpy()
+    position = np.concatenate(([0.0], target[:-1]))
+    held_before = np.concatenate(([0.0], position[:-1]))
+
+    enter = (position == 1) & (held_before == 0)
+    exit_ = (position == 0) & (held_before == 1)
+    hold = (position == 1) & (held_before == 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.zeros(n)
+        returns[enter] = closes[enter] / opens[enter] - 1 - cost
+        returns[hold] = closes[hold] / prev_close[hold] - 1
+        returns[exit_] = opens[exit_] / prev_close[exit_] - 1 - cost - STAMP_DUTY
+    returns = np.nan_to_num(returns)
+
+    entries = np.flatnonzero(enter)
+    exits = np.flatnonzero(exit_)
+    trades = []
+    for i, entry in enumerate(entries):
+        if i < len(exits):
+            exit_price = opens[exits[i]]
+            costs = 2 * cost + STAMP_DUTY
+        else:
+            # 期末未平仓，按最后收盘价计算浮动收益
+            exit_price = closes[-1]
+            costs = cost
+        trades.append(exit_price / opens[entry] - 1 - costs)
+    return {"position": position, "returns": returns, "trades": np.array(trades)}
+
+
+def max_drawdown(returns: np.ndarray) -> float:
+    """由每日收益计算最大回撤（正数）"""
+    if len(returns) == 0:
+        return 0.0
+    equity = np.cumprod(1 + np.asarray(returns, dtype=float))
+    peak = np.maximum.accumulate(np.concatenate(([1.0], equity)))[1:]
+    return float(np.max(1 - equity / peak))
+
+
+def summarize(returns: np.ndarray, trades: np.ndarray, position: np.ndarray = None) -> Dict:
+    """收益、年化收益、最大回撤、交易次数、胜率、持仓天数占比"""
+    returns = np.asarray(returns, dtype=float)
+    total = float(np.prod(1 + returns) - 1) if len(returns) else 0.0
+    years = len(returns) / TRADING_DAYS_PER_YEAR
+    annual = (1 + total) ** (1 / years) - 1 if years > 0 and total > -1 else None
+    wins = int((trades > 0).sum())
+    return {
+        "total_return": round(total, 4),
+        "annual_return": round(annual, 4) if annual is not None else None,
+        "max_drawdown": round(max_drawdown(returns), 4),
+        "trades": len(trades),
+        "wins": wins,
+        "hit_rate": round(wins / len(trades), 4) if len(trades) else None,
+        "exposure": round(float(np.mean(position)), 4) if position is not None and len(position) else 0.0,
+    }
+
+
+def backtest_stock(bars: pd.DataFrame, start=None, cost: float = DEFAULT_COST):
+    """
+    单只股票回测
+
+    Args:
+        bars: 按日期正序的日线（date/open/high/low/close/volume）
+        start: 回测起始日期，之前的数据只用于指标预热
+        cost: 单边交易成本
+
+    Returns:
+        (统计结果, 以日期为索引的每日收益 Series)
+    """
+    signals = signal_series(bars["high"], bars["low"], bars["close"], bars["volume"])
+    dates = pd.to_datetime(bars["date"]).to_numpy()
+    first = 0 if start is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start))))
+    actions = signals["action"][first:]
+    result = simulate(bars["open"].to_numpy()[first:], bars["close"].to_numpy()[first:], actions, cost)
+
+    closes = bars["close"].to_numpy(dtype=float)[first:]
+    summary = summarize(result["returns"], result["trades"], result["position"])
+    summary.update({
+        "days": len(closes),
+        "buy_signals": int((actions == BUY).sum()),
+        "sell_signals": int((actions == SELL).sum()),
+        "buy_and_hold": round(float(closes[-1] / closes[0] - 1), 4) if len(closes) else None,
+    })
+    return summary, pd.Series(result["returns"], index=dates[first:])
+
+
+def load_bars(codes: List[str], start, end) -> pd.DataFrame:
+    """从数据库加载一批股票的日线（含预热区间）"""
+    from ..database import session_scope
+
+    with session_scope() as db:
+        return pd.read_sql_query(text(BARS_SQL), db.connection(), params={
+            "codes": list(codes),
+            "start": pd.Timestamp(start).date() - timedelta(days=WARMUP_DAYS),
+            "end": pd.Timestamp(end).date(),
+        })
+
+
+def _run_chunk(codes: List[str], start, end, cost: float, loader: Callable = None):
+    """
+    进程池任务：回测一批股票
+
+    Returns:
+        (每只股票的统计列表, 按日期的收益之和, 按日期的参与股票数)
+    """
+    frame = (loader or load_bars)(codes, start, end)
+    summaries = []
+    daily_sum = pd.Series(dtype=float)
+    daily_count = pd.Series(dtype=float)
+    for code, bars in frame.groupby("code", sort=False):
+        if len(bars) < MIN_BARS:
+            continue
+        summary, returns = backtest_stock(bars.reset_index(drop=True), start, cost)
+        if returns.empty:
+            continue
+        summary["code"] = code
+        summaries.append(summary)
+        daily_sum = daily_sum.add(returns, fill_value=0.0)
+        daily_count = daily_count.add(pd.Series(1.0, index=returns.index), fill_value=0.0)
+    return summaries, daily_sum, daily_count
+
+
+def aggregate(summaries: List[Dict], daily_sum: pd.Series, daily_count: pd.Series) -> Dict:
+    """
+    汇总统计：各股票指标的均值/中位数、总体胜率，以及等权组合（每天对当日有数据的股票收益取平均）的收益和回撤
+    """
+    if not summaries:
+        return {"stocks": 0}
+    df = pd.DataFrame(summaries)
+    trades = int(df["trades"].sum())
+    wins = int(df["wins"].sum())
+    portfolio = (daily_sum / daily_count).sort_index().to_numpy()
+    return {
+        "stocks": len(df),
+        "trades": trades,
+        "hit_rate": round(wins / trades, 4) if trades else None,
+        "avg_total_return": round(float(df["total_return"].mean()), 4),
+        "median_total_return": round(float(df["total_return"].median()), 4),
+        "avg_max_drawdown": round(float(df["max_drawdown"].mean()), 4),
+        "avg_buy_and_hold": round(float(df["buy_and_hold"].mean()), 4),
+        "portfolio": summarize(portfolio, np.array([])) | {"days": len(portfolio)},
+    }
+
+
+def _all_codes(start, end) -> List[str]:
+    from ..database import session_scope
+
+    with session_scope() as db:
+        rows = db.execute(text(
+            "SELECT DISTINCT code FROM historical_quotes WHERE date BETWEEN :start AND :end"
+        ), {"start": pd.Timestamp(start).date(), "end": pd.Timestamp(end).date()}).fetchall()
+    return sorted(r[0] for r in rows)
+
+
+def run_backtest(start, end, codes: Optional[List[str]] = None, workers: Optional[int] = None,
+                 chunk_size: int = 200, cost: float = DEFAULT_COST, loader: Callable = None) -> Dict:
+    """
+    全市场（或指定股票）回测
+
+    Args:
+        start: 回测起始日期
+        end: 回测结束日期
+        codes: 股票代码列表，默认区间内有日线的全部股票
+        workers: 进程数，默认 CPU 核数；1 表示在当前进程内执行
+        chunk_size: 每个进程任务包含的股票数
+        cost: 单边交易成本
+        loader: 加载日线的函数 (codes, start, end) -> DataFrame，需可被子进程导入，默认从数据库加载
+
+    Returns:
+        Dict: stocks（每只股票的统计）、aggregate（汇总）、elapsed（耗时秒）
+    """
+    started = time.time()
+    if codes is None:
+        codes = _all_codes(start, end)
+    chunks = [codes[i:i + chunk_size] for i in range(0, len(codes), chunk_size)]
+    workers = workers or multiprocessing.cpu_count()
+
+    summaries = []
+    daily_sum = pd.Series(dtype=float)
+    daily_count = pd.Series(dtype=float)
+
+    def collect(result):
+        nonlocal daily_sum, daily_count
+        chunk_summaries, chunk_sum, chunk_count = result
+        summaries.extend(chunk_summaries)
+        daily_sum = daily_sum.add(chunk_sum, fill_value=0.0)
+        daily_count = daily_count.add(chunk_count, fill_value=0.0)
+
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            collect(_run_chunk(chunk, start, end, cost, loader))
+    else:
+        # spawn：子进程不继承父进程的数据库连接池
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as executor:
+            futures = [executor.submit(_run_chunk, chunk, start, end, cost, loader) for chunk in chunks]
+            for done, future in enumerate(as_completed(futures), 1):
+                collect(future.result())
+                logger.info(f"回测进度: {done}/{len(futures)} 批")
+
+    summaries.sort(key=lambda s: s["code"])
+    return {
+        "stocks": summaries,
+        "aggregate": aggregate(summaries, daily_sum, daily_count),
+        "elapsed": round(time.time() - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='交易建议回测')
+    parser.add_argument('--start', required=True, help='回测起始日期，如 2019-01-01')
+    parser.add_argument('--end', default=date.today().isoformat(), help='回测结束日期')
+    parser.add_argument('--codes', help='逗号分隔的股票代码，默认全市场')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认 CPU 核数')
+    parser.add_argument('--cost', type=float, default=DEFAULT_COST, help='单边交易成本')
+    parser.add_argument('--output', help='每只股票统计结果的 CSV 输出路径')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    codes = args.codes.split(',') if args.codes else None
+    result = run_backtest(args.start, args.end, codes=codes, workers=args.workers, cost=args.cost)
+    if args.output:
+        pd.DataFrame(result["stocks"]).to_csv(args.output, index=False)
+    print(f"回测完成，耗时 {result['elapsed']}s")
+    for key, value in result["aggregate"].items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+进程内键值缓存
+按键设置过期时间，超过容量按 LRU 淘汰；同一键并发未命中时只有一个调用方回源，
+其余调用方等待并共享结果（single-flight）
+"""
+
+import time
+from collections import OrderedDict
+from threading import Event, Lock
+
+_MISSING = object()
+
+
+class _Flight:
+    """一次进行中的回源调用"""
+
+    def __init__(self):
+        self.done = Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    def __init__(self, maxsize=256, ttl=300, name="cache", clock=time.monotonic):
+        """
+        Args:
+            maxsize: 最多缓存的键数量，超过后淘汰最久未使用的键
+            ttl: 默认过期时间（秒）
+            name: 缓存名称，用于统计输出
+            clock: 时钟函数，便于测试替换
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, version, value)
+        self._flights = {}
+        self._lock = Lock()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.load_errors = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.max_load_seconds = 0.0
+
+    def _lookup(self, key):
+        """在持有锁的情况下查找未过期的值"""
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, version, value = entry
+        if version != self.version or expires_at <= self._clock():
+            del self._data[key]
+            self.expirations += 1
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _store(self, key, value, ttl):
+        """在持有锁的情况下写入并按容量淘汰"""
+        self._data[key] = (self._clock() + (self.ttl if ttl is None else ttl), self.version, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        命中则直接返回，否则调用 loader() 回源并缓存结果
+
+        Args:
+            key: 缓存键（需可哈希）
+            loader: 回源函数，抛出的异常会传给所有等待者，且不缓存
+            ttl: 本键的过期时间（秒），默认使用构造时的 ttl
+
+        Returns:
+            缓存的值或 loader 的返回值
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                version = self.version
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        started = time.perf_counter()
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self.load_errors += 1
+            raise
+        else:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.loads += 1
+                self.load_seconds += elapsed
+                self.max_load_seconds = max(self.max_load_seconds, elapsed)
+                # 回源期间缓存被整体失效时，结果只返回给本次调用方，不再写入
+                if version == self.version:
+                    self._store(key, flight.value, ttl)
+            return flight.value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_all(self):
+        """提升版本号，使已缓存的所有值失效"""
+        with self._lock:
+            self.version += 1
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "coalesced": self.coalesced,
+                "load_errors": self.load_errors,
+                "loads": self.loads,
+                "avg_load_ms": round(self.load_seconds / self.loads * 1000, 2) if self.loads else None,
+                "max_load_ms": round(self.max_load_seconds * 1000, 2),
+            }
@@ -0,0 +1,225 @@
+"""
+技术指标向量化内核
+一次计算出 MA/EMA/RSI/MACD/KDJ/布林带的完整序列（NumPy 数组），
+图表和信号判断共用同一次计算结果。
+所有函数沿最后一个轴计算，既可传入单只股票的一维序列，也可传入 (股票数, K线数) 的二维数组；
+二维输入要求没有缺失值（缺失行请用一维接口逐行计算，见 market_indicators）
+"""
+
+import math
+from typing import Dict, Sequence
+
+import numpy as np
+
+# 分块递推时 beta^-k 的指数上限，保证 float64 不溢出
+_MAX_EXPONENT = 300.0
+
+
+def recursive_filter(values: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+    """
+    一阶递推滤波 y[t] = (1 - alpha) * y[t-1] + alpha * x[t]，y[-1] = initial
+
+    等价于 scipy.signal.lfilter([alpha], [1, alpha - 1], x, zi=...)，
+    用分块的闭式解（累加和 + 幂次缩放）实现，每块内部完全向量化
+
+    Args:
+        values: 输入序列
+        alpha: 平滑系数 (0, 1]
+        initial: 初始状态（二维输入时可为每行一个）
+
+    Returns:
+        np.ndarray: 滤波结果，长度与输入相同
+    """
+    x = np.asarray(values, dtype=float)
+    out = np.empty_like(x)
+    n = x.shape[-1]
+    if n == 0:
+        return out
+    beta = 1.0 - alpha
+    if beta <= 0:
+        out[...] = x
+        return out
+    block = max(1, int(_MAX_EXPONENT / -math.log(beta)))
+    powers = beta ** np.arange(1, min(block, n) + 1)
+    prev = np.broadcast_to(np.asarray(initial, dtype=float), x.shape[:-1])[..., None]
+    for start in range(0, n, block):
+        segment = x[..., start:start + block]
+        pw = powers[:segment.shape[-1]]
+        # y[j] = beta^(j+1) * (prev + alpha * sum_{i<=j} x[i] / beta^(i+1))
+        y = pw * (prev + alpha * np.cumsum(segment / pw, axis=-1))
+        out[..., start:start + segment.shape[-1]] = y
+        prev = y[..., -1:]
+    return out
+
+
+def sma(values: Sequence[float], period: int) -> np.ndarray:
+    """简单移动平均，前 period-1 个位置为 NaN"""
+    x = np.asarray(values, dtype=float)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= period:
+        csum = np.cumsum(x, axis=-1)
+        csum = np.concatenate([np.zeros(x.shape[:-1] + (1,)), csum], axis=-1)
+        out[..., period - 1:] = (csum[..., period:] - csum[..., :-period]) / period
+    return out
+
+
+def ema(values: Sequence[float], period: int) -> np.ndarray:
+    """指数移动平均，以首个值作为初始值"""
+    x = np.asarray(values, dtype=float)
+    if x.shape[-1] == 0:
+        return x.copy()
+    return recursive_filter(x, 2.0 / (period + 1), x[..., 0])
+
+
+def rsi(values: Sequence[float], period: int = 14) -> np.ndarray:
+    """
+    RSI（Wilder 平滑）：首个平均涨跌幅取前 period 个变动的算术平均，之后按 1/period 递推
+
+    Returns:
+        np.ndarray: 前 period 个位置为 NaN
+    """
+    x = np.asarray(values, dtype=float)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] < period + 1:
+        return out
+    deltas = np.diff(x, axis=-1)
+    gains = np.clip(deltas, 0, None)
+    losses = np.clip(-deltas, 0, None)
+    alpha = 1.0 / period
+
+    def smooth(values_):
+        seed = values_[..., :period].mean(axis=-1)
+        return np.concatenate([seed[..., None], recursive_filter(values_[..., period:], alpha, seed)], axis=-1)
+
+    avg_gain, avg_loss = smooth(gains), smooth(losses)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi_values = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    out[..., period:] = np.where(avg_loss == 0, 100.0, rsi_values)
+    return out
+
+
+def macd(values: Sequence[float], fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    """MACD 线、信号线和柱状图"""
+    x = np.asarray(values, dtype=float)
+    macd_line = ema(x, fast) - ema(x, slow)
+    signal_line = ema(macd_line, signal)
+    return {"macd": macd_line, "signal": signal_line, "histogram": macd_line - signal_line}
+
+
+def _rolling_extreme(values: Sequence[float], period: int, func) -> np.ndarray:
+    """滑动窗口最值：按窗口内的偏移逐次取 func，只需 period 次整块运算"""
+    x = np.asarray(values, dtype=float)
+    out = np.full(x.shape, np.nan)
+    n = x.shape[-1]
+    if n >= period:
+        acc = x[..., period - 1:].copy()
+        for shift in range(1, period):
+            func(acc, x[..., period - 1 - shift:n - shift], out=acc)
+        out[..., period - 1:] = acc
+    return out
+
+
+def rolling_max(values: Sequence[float], period: int) -> np.ndarray:
+    return _rolling_extreme(values, period, np.maximum)
+
+
+def rolling_min(values: Sequence[float], period: int) -> np.ndarray:
+    return _rolling_extreme(values, period, np.minimum)
+
+
+def kdj(highs: Sequence[float], lows: Sequence[float], closes: Sequence[float], period: int = 9) -> Dict[str, np.ndarray]:
+    """
+    KDJ：K、D 均以 50 为初值按 2/3、1/3 递推；RSV 无效（窗口不足或最高价等于最低价）的位置不更新，沿用前值
+
+    Returns:
+        Dict[str, np.ndarray]: k/d/j 序列，首个有效 RSV 之前为 NaN
+    """
+    c = np.asarray(closes, dtype=float)
+    highest = rolling_max(highs, period)
+    lowest = rolling_min(lows, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = 100.0 * (c - lowest) / (highest - lowest)
+    valid = np.isfinite(rsv)
+    if c.ndim == 2:
+        return _kdj_2d(np.asarray(highs, dtype=float), np.asarray(lows, dtype=float), c, rsv, valid, period)
+    k = np.full(len(c), np.nan)
+    d = np.full(len(c), np.nan)
+    if valid.any():
+        k_valid = recursive_filter(rsv[valid], 1.0 / 3.0, 50.0)
+        d_valid = recursive_filter(k_valid, 1.0 / 3.0, 50.0)
+        k[valid] = k_valid
+        d[valid] = d_valid
+        # 无效位置沿用上一个有效值
+        index = np.where(valid, np.arange(len(c)), -1)
+        np.maximum.accumulate(index, out=index)
+        filled = index >= 0
+        k[filled] = k[index[filled]]
+        d[filled] = d[index[filled]]
+    return {"k": k, "d": d, "j": 3 * k - 2 * d}
+
+
+def _kdj_2d(highs, lows, closes, rsv, valid, period):
+    """
+    二维 KDJ：开头的无效 RSV 用 50 填充（K、D 初值即 50，递推结果保持 50，等价于不更新），
+    首个有效值之后仍出现无效 RSV 的行（连续一字板等）改用一维接口逐行计算
+    """
+    leading = np.logical_not(np.logical_or.accumulate(valid, axis=-1))
+    k = recursive_filter(np.where(valid, rsv, 50.0), 1.0 / 3.0, 50.0)
+    d = recursive_filter(k, 1.0 / 3.0, 50.0)
+    k[leading] = np.nan
+    d[leading] = np.nan
+    for row in np.flatnonzero((~valid & ~leading).any(axis=-1)):
+        series = kdj(highs[row], lows[row], closes[row], period)
+        k[row], d[row] = series["k"], series["d"]
+    return {"k": k, "d": d, "j": 3 * k - 2 * d}
+
+
+def bollinger_bands(values: Sequence[float], period: int = 20, std_dev: float = 2) -> Dict[str, np.ndarray]:
+    """布林带（总体标准差），前 period-1 个位置为 NaN"""
+    x = np.asarray(values, dtype=float)
+    middle = sma(x, period)
+    # 方差平移不变，先减去各行首个值再用滑动一、二阶矩计算，减小大数相减的误差
+    centered = x - x[..., :1] if x.shape[-1] else x
+    variance = sma(centered * centered, period) - sma(centered, period) ** 2
+    std = np.sqrt(np.clip(variance, 0, None))
+    return {"upper": middle + std_dev * std, "middle": middle, "lower": middle - std_dev * std}
+
+
+def compute_indicators(highs: Sequence[float], lows: Sequence[float], closes: Sequence[float]) -> Dict[str, np.ndarray]:
+    """
+    一次计算全部常用指标序列
+
+    Args:
+        highs: 最高价序列（按日期正序）
+        lows: 最低价序列
+        closes: 收盘价序列
+
+    Returns:
+        Dict[str, np.ndarray]: ma5/ma10/ma20/ma60、rsi、macd/macd_signal/macd_hist、
+        k/d/j、boll_upper/boll_middle/boll_lower，均与输入等长
+    """
+    closes = np.asarray(closes, dtype=float)
+    macd_series = macd(closes)
+    kdj_series = kdj(highs, lows, closes)
+    bb = bollinger_bands(closes)
+    series = {f"ma{p}": sma(closes, p) for p in (5, 10, 20, 60)}
+    series.update({
+        "rsi": rsi(closes),
+        "macd": macd_series["macd"],
+        "macd_signal": macd_series["signal"],
+        "macd_hist": macd_series["histogram"],
+        "k": kdj_series["k"],
+        "d": kdj_series["d"],
+        "j": kdj_series["j"],
+        "boll_upper": bb["upper"],
+        "boll_middle": bb["middle"],
+        "boll_lower": bb["lower"],
+    })
+    return series
+
+
+def last_value(series: np.ndarray, default: float, digits: int = 2) -> float:
+    """取序列最后一个值并四舍五入，NaN 或空序列返回 default"""
+    if len(series) == 0 or not np.isfinite(series[-1]):
+        return default
+    return round(float(series[-1]), digits)
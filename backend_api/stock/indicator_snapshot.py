@@ -0,0 +1,151 @@
+"""
+收盘后指标快照
+日线入库后一次性为全市场计算指标、价格预测、关键价位和交易建议，写入 stock_indicator_snapshot（每只股票一行）。
+分析接口按主键读取快照，只用实时价格重算交易建议和关键价位
+"""
+
+import json
+import logging
+import time
+from datetime import datetime
+from typing import List
+
+import numpy as np
+from sqlalchemy import text
+
+from backend_core.database.db import bulk_upsert
+from .market_indicators import MarketBars, load_market_bars, compute_market_series
+from .stock_analysis import DEFAULT_LOOKBACK, PricePrediction, StockAnalysisService, TechnicalIndicators
+
+logger = logging.getLogger(__name__)
+
+# 与分析接口默认回看的K线数量一致，快照与现算结果相同
+SNAPSHOT_BARS = DEFAULT_LOOKBACK
+
+# 可直接用于筛选的指标列
+INDICATOR_COLUMNS = [
+    'ma5', 'ma10', 'ma20', 'ma60', 'rsi', 'macd', 'macd_signal', 'macd_hist',
+    'k', 'd', 'j', 'boll_upper', 'boll_middle', 'boll_lower'
+]
+
+SNAPSHOT_COLUMNS = (
+    ['code', 'date', 'close'] + INDICATOR_COLUMNS
+    + ['indicators', 'price_prediction', 'key_levels', 'trading_recommendation', 'bars', 'updated_at']
+)
+
+CREATE_SNAPSHOT_TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS stock_indicator_snapshot (
+        code VARCHAR(20) PRIMARY KEY,
+        date DATE,
+        close FLOAT,
+        {', '.join(f'{c} FLOAT' for c in INDICATOR_COLUMNS)},
+        indicators JSONB,
+        price_prediction JSONB,
+        key_levels JSONB,
+        trading_recommendation JSONB,
+        bars JSONB,
+        updated_at TIMESTAMP
+    )
+"""
+
+
+def _finite_or_none(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _latest_column(series: np.ndarray, default: float, digits: int) -> np.ndarray:
+    """各行最新值，取整和缺省规则与 indicator_kernel.last_value 相同"""
+    last = series[:, -1]
+    return np.where(np.isfinite(last), np.round(last, digits), default)
+
+
+def predict_market(market: MarketBars, series) -> List[dict]:
+    """用一次矩阵运算为全市场生成价格预测，结果与逐只调用 PricePrediction.predict_price 相同"""
+    predictions = PricePrediction.predict_batch(
+        market.closes,
+        _latest_column(series["rsi"], 50.0, 2),
+        _latest_column(series["macd"], 0.0, 4),
+        _latest_column(series["macd_hist"], 0.0, 4),
+    )
+    return [
+        {
+            "target_price": float(predictions["target_price"][row]),
+            "change_percent": float(predictions["change_percent"][row]),
+            "prediction_range": {"min": float(predictions["min"][row]), "max": float(predictions["max"][row])},
+            "confidence": float(predictions["confidence"][row]),
+        }
+        for row in range(len(market))
+    ]
+
+
+def build_snapshot_rows(market: MarketBars) -> List[tuple]:
+    """
+    由全市场K线矩阵生成快照行
+
+    关键价位和交易建议以收盘价为当前价格计算（收盘后的结论）；接口读取时会按实时价格重算这两部分
+
+    Returns:
+        List[tuple]: 与 SNAPSHOT_COLUMNS 顺序一致的行
+    """
+    series = compute_market_series(market)
+    predictions = predict_market(market, series)
+    now = datetime.now()
+    rows = []
+    for row, code in enumerate(market.codes):
+        valid = np.isfinite(market.closes[row])
+        if not valid.any():
+            continue
+        highs, lows = market.highs[row, valid], market.lows[row, valid]
+        closes, volumes = market.closes[row, valid], market.volumes[row, valid]
+        historical_data = [
+            {"high": float(h), "low": float(l), "close": float(c), "volume": float(v)}
+            for h, l, c, v in zip(highs, lows, closes, volumes)
+        ]
+        indicators = None
+        if len(historical_data) >= 20:
+            indicators = TechnicalIndicators.latest({key: values[row, valid] for key, values in series.items()})
+        close = float(closes[-1])
+        analysis = StockAnalysisService.build_analysis(historical_data, close, indicators, predictions[row])
+        bars = {
+            "high": highs.tolist(),
+            "low": lows.tolist(),
+            "close": closes.tolist(),
+            "volume": volumes.tolist(),
+        }
+        rows.append(
+            (code, market.last_dates[row], close)
+            + tuple(_finite_or_none(series[c][row, -1]) for c in INDICATOR_COLUMNS)
+            + (
+                json.dumps(indicators),
+                json.dumps(analysis["price_prediction"]),
+                json.dumps(analysis["key_levels"]),
+                json.dumps(analysis["trading_recommendation"], ensure_ascii=False),
+                json.dumps(bars),
+                now,
+            )
+        )
+    return rows
+
+
+def refresh_indicator_snapshot(db, bars: int = SNAPSHOT_BARS) -> int:
+    """
+    重新计算并写入全市场指标快照，日线采集完成后调用
+
+    Args:
+        db: 数据库会话（提交由本函数负责）
+        bars: 每只股票回看的K线数量
+
+    Returns:
+        int: 写入的股票数量
+    """
+    start = time.time()
+    # 全市场窗口查询耗时可能超过采集端连接默认的 statement_timeout，本事务内放宽
+    db.execute(text("SET LOCAL statement_timeout = '300s'"))
+    db.execute(text(CREATE_SNAPSHOT_TABLE_SQL))
+    market = load_market_bars(db, bars)
+    rows = build_snapshot_rows(market)
+    bulk_upsert(db, 'stock_indicator_snapshot', SNAPSHOT_COLUMNS, rows, ['code'])
+    db.commit()
+    logger.info(f"指标快照刷新完成: {len(rows)} 只股票, 耗时 {time.time() - start:.1f}s")
+    return len(rows)
@@ -0,0 +1,137 @@
+"""
+全市场横截面技术指标
+一条 SQL 取出每只股票最近 N 根日K，按"倒数第几根"对齐成 (股票数, N) 的二维数组，
+用指标内核沿时间轴一次算完全市场，输出每只股票一行的横截面表，可直接筛选，例如：
+
+    table = compute_market_indicators(load_market_bars(db))
+    table.query("rsi < 30 and macd_hist > 0 and macd_hist_prev <= 0")
+"""
+
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from .indicator_kernel import compute_indicators
+
+# 默认回看的 K 线数量，需覆盖 MA60 和 MACD 的收敛期
+DEFAULT_BARS = 120
+
+MARKET_BARS_SQL = """
+    SELECT code, date, high, low, close, volume, rn
+    FROM (
+        SELECT code, date, high, low, close, volume,
+               ROW_NUMBER() OVER (PARTITION BY code ORDER BY date DESC) AS rn
+        FROM historical_quotes
+        WHERE close IS NOT NULL AND high IS NOT NULL AND low IS NOT NULL
+    ) t
+    WHERE rn <= :bars
+"""
+
+
+class MarketBars:
+    """全市场 K 线矩阵：每行一只股票，按时间正序，最后一列为最新一根；历史不足 N 根的行左侧为 NaN"""
+
+    def __init__(self, codes: List[str], highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                 last_dates: List = None, volumes: np.ndarray = None):
+        self.codes = list(codes)
+        self.highs = highs
+        self.lows = lows
+        self.closes = closes
+        self.volumes = volumes if volumes is not None else np.zeros_like(closes)
+        self.last_dates = list(last_dates) if last_dates is not None else [None] * len(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, bars: int) -> "MarketBars":
+        """
+        由长表构造矩阵
+
+        Args:
+            df: 包含 code/date/high/low/close/rn 列（volume 可选，缺失按 0），rn 为按日期倒序的序号（1 为最新）
+            bars: 矩阵列数
+
+        Returns:
+            MarketBars: K 线矩阵
+        """
+        codes, row = np.unique(df['code'].astype(str).to_numpy(), return_inverse=True)
+        col = bars - df['rn'].to_numpy(dtype=int)
+        arrays = []
+        for field in ('high', 'low', 'close'):
+            matrix = np.full((len(codes), bars), np.nan)
+            matrix[row, col] = df[field].to_numpy(dtype=float)
+            arrays.append(matrix)
+        volumes = np.zeros((len(codes), bars))
+        if 'volume' in df:
+            volumes[row, col] = np.nan_to_num(df['volume'].to_numpy(dtype=float))
+        latest = df[df['rn'] == 1]
+        last_dates = pd.Series(latest['date'].to_numpy(), index=latest['code'].astype(str)).reindex(codes)
+        return cls(codes, *arrays, last_dates=last_dates.tolist(), volumes=volumes)
+
+
+def load_market_bars(db, bars: int = DEFAULT_BARS) -> MarketBars:
+    """
+    一次查询加载全市场最近 bars 根日K
+
+    Args:
+        db: 数据库会话
+        bars: 每只股票的 K 线数量
+
+    Returns:
+        MarketBars: K 线矩阵
+    """
+    df = pd.read_sql_query(text(MARKET_BARS_SQL), db.connection(), params={"bars": bars})
+    return MarketBars.from_frame(df, bars)
+
+
+def compute_market_series(bars: MarketBars) -> Dict[str, np.ndarray]:
+    """
+    计算全市场指标序列
+
+    完整的行（N 根都有数据）走二维向量化；历史不足的行只有左侧缺失，截掉缺失部分后逐行用一维接口计算
+
+    Returns:
+        Dict[str, np.ndarray]: 与 compute_indicators 相同的键，每个值为 (股票数, N) 数组
+    """
+    shape = bars.closes.shape
+    complete = ~(np.isnan(bars.highs) | np.isnan(bars.lows) | np.isnan(bars.closes)).any(axis=1)
+    series = {}
+
+    def store(rows, columns, values):
+        for key, value in values.items():
+            if key not in series:
+                series[key] = np.full(shape, np.nan)
+            series[key][rows, columns] = value
+
+    if complete.any():
+        store(complete, slice(None), compute_indicators(bars.highs[complete], bars.lows[complete], bars.closes[complete]))
+    for row in np.flatnonzero(~complete):
+        start = shape[1] - int(np.isfinite(bars.closes[row])[::-1].cumprod().sum())
+        if start < shape[1]:
+            store(row, slice(start, None),
+                  compute_indicators(bars.highs[row, start:], bars.lows[row, start:], bars.closes[row, start:]))
+    return series
+
+
+def compute_market_indicators(bars: MarketBars) -> pd.DataFrame:
+    """
+    全市场横截面指标表
+
+    Returns:
+        pd.DataFrame: 以 code 为索引，列包括 date、close、bars（有效 K 线数）、各指标最新值，
+        以及 macd_hist_prev/rsi_prev/k_prev/d_prev（前一根的值，用于判断拐头和金叉）
+    """
+    series = compute_market_series(bars)
+    table = pd.DataFrame(index=pd.Index(bars.codes, name='code'))
+    table['date'] = bars.last_dates
+    table['close'] = bars.closes[:, -1]
+    table['bars'] = np.isfinite(bars.closes).sum(axis=1)
+    for key, values in series.items():
+        table[key] = values[:, -1]
+    for key in ('macd_hist', 'rsi', 'k', 'd'):
+        if key in series:
+            table[f'{key}_prev'] = series[key][:, -2] if series[key].shape[1] > 1 else np.nan
+    return table.round(4)
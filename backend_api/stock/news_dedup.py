@@ -0,0 +1,201 @@
+"""
+新闻标题近似去重
+标题去掉空白和标点后切成字符二元组（shingle），用 MinHash 签名 + LSH 分桶查找候选，
+只对落在同一桶里的候选计算 Jaccard 相似度，整体近似线性；
+索引可以先批量装入数据库里已有的标题，再对新抓取的新闻做增量去重
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# 签名长度 = 分桶数 * 每桶行数；Jaccard 为 0.6 的两条标题至少落入同一桶的概率约 99%
+LSH_BANDS = 20
+LSH_ROWS = 3
+NUM_PERM = LSH_BANDS * LSH_ROWS
+# 字符二元组 Jaccard 阈值，大致对应原 difflib 相似度 0.8
+DEFAULT_THRESHOLD = 0.6
+
+# multiply-shift 哈希族 (a * x + b) >> 32（uint64 溢出回绕），a 取奇数
+_rng = np.random.default_rng(20240101)
+_PERM_A = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)[:, None] * np.uint64(2) + np.uint64(1)
+_PERM_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)[:, None]
+_SHIFT = np.uint64(32)
+# 每个桶的 LSH_ROWS 个签名值合成一个整数键，不同桶用不同的乘数区分
+_BAND_MULTIPLIERS = _rng.integers(1, 2 ** 63, (LSH_BANDS, LSH_ROWS), dtype=np.uint64)
+_NON_WORD = re.compile(r'[\W_]+')
+# 一次求签名时 (NUM_PERM, 块内 shingle 数) 矩阵的列数上限
+_CHUNK = 8192
+
+
+def shingle_sets(titles: Sequence[str]) -> List[FrozenSet[int]]:
+    """
+    批量计算标题的字符二元组集合（忽略大小写、空白和标点）
+
+    二元组编码为 前一字符码位 << 21 | 后一字符码位，没有碰撞；只有一个字符的标题整体作为一个 shingle
+
+    Returns:
+        List[FrozenSet[int]]: 与 titles 一一对应，没有有效字符的标题为空集合
+    """
+    texts = [_NON_WORD.sub('', (title or '').lower()) for title in titles]
+    codes = np.frombuffer(''.join(texts).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    grams = (codes[:-1] << 21) | codes[1:]
+    result = []
+    position = 0
+    for text in texts:
+        length = len(text)
+        if length > 1:
+            result.append(frozenset(grams[position:position + length - 1].tolist()))
+        else:
+            result.append(frozenset([int(codes[position]) << 21]) if length else frozenset())
+        position += length
+    return result
+
+
+def shingles(title: str) -> FrozenSet[int]:
+    """单条标题的字符二元组集合"""
+    return shingle_sets([title])[0]
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_signatures(sets: Sequence[FrozenSet[int]]) -> np.ndarray:
+    """
+    批量计算 MinHash 签名
+
+    Args:
+        sets: 每条标题的 shingle 集合（不能为空）
+
+    Returns:
+        np.ndarray: (标题数, NUM_PERM) 的签名矩阵
+    """
+    signatures = np.empty((len(sets), NUM_PERM), dtype=np.uint64)
+    start = 0
+    while start < len(sets):
+        # 把若干标题的 shingle 拼成一段，置换后按标题分段取最小值
+        end, width = start, 0
+        while end < len(sets) and (end == start or width + len(sets[end]) <= _CHUNK):
+            width += len(sets[end])
+            end += 1
+        values = np.fromiter((h for s in sets[start:end] for h in s), dtype=np.uint64, count=width)
+        offsets = np.cumsum([0] + [len(s) for s in sets[start:end - 1]])
+        permuted = _PERM_A * values
+        permuted += _PERM_B
+        permuted >>= _SHIFT
+        signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = end
+    return signatures
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """
+    每条签名在各个桶中的键，(标题数, LSH_BANDS)
+
+    键相同才视为候选；不同签名的键偶然碰撞只会多出候选，最终仍按 Jaccard 判断
+    """
+    bands = signatures.reshape(len(signatures), LSH_BANDS, LSH_ROWS)
+    return (bands * _BAND_MULTIPLIERS).sum(axis=2)
+
+
+class NewsDeduplicator:
+    """
+    标题近似去重索引
+
+    批量装入的标题（add_many）按桶键排序存成数组，用二分查找取候选；
+    去重过程中逐条保留的标题放进字典，两部分一起参与查询
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        """
+        Args:
+            threshold: Jaccard 相似度阈值，达到即视为重复
+        """
+        self.threshold = threshold
+        self.titles: List[str] = []
+        self.sets: List[FrozenSet[int]] = []
+        self._sorted_keys = np.empty(0, dtype=np.uint64)
+        self._sorted_ids = np.empty(0, dtype=np.int64)
+        self._buckets: Dict[int, List[int]] = {}
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add_many(self, titles: Iterable[str]):
+        """批量收录标题（如数据库中已保存的新闻），不做去重判断"""
+        titles = [title for title in titles if title]
+        sets = shingle_sets(titles)
+        keep = [i for i, s in enumerate(sets) if s]
+        keys = band_keys(minhash_signatures([sets[i] for i in keep]))
+        ids = np.repeat(np.arange(len(self.titles), len(self.titles) + len(keep)), LSH_BANDS)
+        self.titles.extend(titles[i] for i in keep)
+        self.sets.extend(sets[i] for i in keep)
+        all_keys = np.concatenate([self._sorted_keys, keys.ravel()])
+        all_ids = np.concatenate([self._sorted_ids, ids])
+        order = np.argsort(all_keys, kind='stable')
+        self._sorted_keys, self._sorted_ids = all_keys[order], all_ids[order]
+
+    def _insert(self, title: str, shingle_set: FrozenSet[int], keys: List[int]):
+        index = len(self.titles)
+        self.titles.append(title)
+        self.sets.append(shingle_set)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(index)
+
+    def _candidates(self, keys: np.ndarray) -> List[int]:
+        candidates = []
+        if len(self._sorted_keys):
+            left = np.searchsorted(self._sorted_keys, keys, 'left')
+            right = np.searchsorted(self._sorted_keys, keys, 'right')
+            for lo, hi in zip(left[left < right].tolist(), right[left < right].tolist()):
+                candidates.extend(self._sorted_ids[lo:hi].tolist())
+        if self._buckets:
+            for key in keys.tolist():
+                candidates.extend(self._buckets.get(key, ()))
+        return candidates
+
+    def _match(self, shingle_set: FrozenSet[int], keys: np.ndarray) -> Optional[int]:
+        seen = set()
+        for index in self._candidates(keys):
+            if index not in seen:
+                seen.add(index)
+                if jaccard(shingle_set, self.sets[index]) >= self.threshold:
+                    return index
+        return None
+
+    def find_duplicate(self, title: str) -> Optional[str]:
+        """返回已收录的相似标题，没有则返回 None"""
+        shingle_set = shingles(title)
+        if not shingle_set:
+            return None
+        index = self._match(shingle_set, band_keys(minhash_signatures([shingle_set]))[0])
+        return None if index is None else self.titles[index]
+
+    def deduplicate(self, items: List[dict], key: str = 'title') -> List[dict]:
+        """
+        按顺序去重：与已收录标题（含本批次先前保留的）相似的条目被丢弃，保留的条目收录进索引
+
+        Args:
+            items: 已按保留优先级排好序的条目
+            key: 标题字段名
+
+        Returns:
+            List[dict]: 保留的条目（标题为空的条目丢弃）
+        """
+        items = [item for item in items if item.get(key)]
+        sets = shingle_sets([item[key] for item in items])
+        signable = [i for i, s in enumerate(sets) if s]
+        keys = dict(zip(signable, band_keys(minhash_signatures([sets[i] for i in signable]))))
+        unique = []
+        for i, item in enumerate(items):
+            # 只有标点的标题无法取 shingle，按原样保留
+            if i in keys:
+                if self._match(sets[i], keys[i]) is not None:
+                    continue
+                self._insert(item[key], sets[i], keys[i].tolist())
+            unique.append(item)
+        return unique
@@ -0,0 +1,245 @@
+"""
+研报 PDF 磁盘缓存
+文件按 URL 的 sha256 命名存放在缓存目录，总大小超过上限时按最近使用时间淘汰（LRU，使用时间记在文件 mtime 上，重启后仍有效）；
+多个 worker 进程共用缓存目录，命中判断和淘汰时的总大小都直接读取目录，不依赖进程内索引；
+回源共用一个长连接 aiohttp 会话，边下载边写临时文件，完成后原子改名，不在内存中保存整个文件；
+同一 URL 的并发请求只下载一次，其余请求等待同一个下载任务
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from ..config import PDF_CACHE_CONFIG
+
+# 模拟浏览器访问
+DOWNLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/pdf,application/octet-stream,*/*',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+PDF_MAGIC = b'%PDF'
+CHUNK_SIZE = 64 * 1024
+
+
+class PdfDownloadError(Exception):
+    """上游返回错误状态或非 PDF 内容，接口返回 400"""
+
+
+def cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def filename_from_response(url: str, content_disposition: str) -> str:
+    """从响应头或 URL 中提取下载文件名"""
+    if 'filename=' in content_disposition:
+        return content_disposition.split('filename=')[1].strip('"\'')
+    filename = url.split('/')[-1]
+    return filename if filename.endswith('.pdf') else "研报.pdf"
+
+
+class PdfCache:
+    """按 URL 缓存 PDF 文件，磁盘占用不超过 max_bytes"""
+
+    def __init__(self, directory: str = PDF_CACHE_CONFIG["directory"], max_bytes: int = PDF_CACHE_CONFIG["max_bytes"],
+                 timeout: float = PDF_CACHE_CONFIG["timeout_seconds"], connection_limit: int = PDF_CACHE_CONFIG["connection_limit"]):
+        """
+        Args:
+            directory: 缓存目录
+            max_bytes: 缓存目录总大小上限（字节，共用目录的所有进程合计），超过后淘汰最久未使用的文件
+            timeout: 单次下载超时时间（秒）
+            connection_limit: 回源连接池大小
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.connection_limit = connection_limit
+        self.filenames: Dict[str, str] = {}  # key -> 上游给出的文件名（仅本进程内）
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop = None
+        self._prepared = False
+        self.hits = 0
+        self.downloads = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.pdf')
+
+    def _prepare(self):
+        """首次使用时创建缓存目录，清理超时仍未完成的临时文件（其他 worker 进程正在写的不动），并按上限淘汰"""
+        if self._prepared:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        expired = time.time() - self.timeout
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.part'):
+                try:
+                    if entry.stat().st_mtime < expired:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+        self._prepared = True
+        self._evict()
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        """
+        扫描缓存目录，多个 worker 进程共用同一目录，文件列表和大小都以磁盘为准
+
+        Returns:
+            [(mtime, key, 文件大小), ...]，按使用时间从旧到新
+        """
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.pdf'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        return sorted(files)
+
+    def _evict(self, keep: Optional[str] = None):
+        """淘汰最久未使用的文件直到目录总大小不超过上限，keep 为刚写入的文件，不淘汰"""
+        files = self._scan()
+        total = sum(size for _, _, size in files)
+        for _, key, size in files:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self.path_for(key))
+                self.evictions += 1
+            except FileNotFoundError:
+                # 已被其他进程淘汰
+                pass
+            total -= size
+            self.filenames.pop(key, None)
+
+    def lookup(self, url: str) -> Optional[Tuple[str, os.stat_result]]:
+        """
+        命中缓存时返回 (文件路径, 文件状态)，并把该文件标记为最近使用（其他进程下载的文件同样命中）
+        """
+        self._prepare()
+        path = self.path_for(cache_key(url))
+        try:
+            os.utime(path)
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        self.hits += 1
+        return path, stat_result
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """共用的回源会话，连接在请求之间复用；会话绑定事件循环，循环变化时重建"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session_loop = loop
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector, headers=DOWNLOAD_HEADERS, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def _download(self, url: str, key: str):
+        """下载到临时文件，校验是 PDF 后改名为缓存文件"""
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{id(asyncio.current_task())}.part"
+        session = self._get_session()
+        started = time.perf_counter()
+        try:
+            async with session.get(url) as response:
+                if response.status != 200:
+                    raise PdfDownloadError(f"无法获取PDF文件，状态码: {response.status}")
+                content_type = response.headers.get('content-type', '').lower()
+                looks_like_pdf = 'pdf' in content_type or 'octet-stream' in content_type
+                size = 0
+                with open(tmp_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        # 内容类型不对时看文件头，错误页面不写入缓存
+                        if size == 0 and not looks_like_pdf and not chunk.lstrip().startswith(PDF_MAGIC):
+                            raise PdfDownloadError("访问被拒绝或文件不存在")
+                        f.write(chunk)
+                        size += len(chunk)
+                if size == 0:
+                    raise PdfDownloadError("访问被拒绝或文件不存在")
+                os.replace(tmp_path, path)
+                self.filenames[key] = filename_from_response(url, response.headers.get('content-disposition', ''))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict(keep=key)
+        self.downloads += 1
+        print(f"[pdf_cache] 下载完成 {size} 字节，耗时 {time.perf_counter() - started:.2f}s: {url}")
+
+    def _finish(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # 等待者都已断开时取走异常，避免 "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    async def fetch(self, url: str) -> Tuple[str, os.stat_result]:
+        """
+        取 PDF 的本地文件，未缓存时下载；同一 URL 的并发请求共用一个下载任务
+
+        Returns:
+            (文件路径, 文件状态)
+        """
+        cached = self.lookup(url)
+        if cached is not None:
+            return cached
+        key = cache_key(url)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._download(url, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        # 某个请求断开不会取消下载，其余等待者仍能拿到结果
+        await asyncio.shield(task)
+        path = self.path_for(key)
+        return path, os.stat(path)
+
+    @staticmethod
+    def etag(path: str, stat_result: os.stat_result) -> str:
+        """同一 URL 的缓存内容不变，ETag 取 URL 哈希和文件大小（不受 LRU 更新 mtime 影响）"""
+        return f'"{os.path.basename(path)[:32]}-{stat_result.st_size}"'
+
+    def filename(self, url: str) -> str:
+        """下载文件名：优先使用上游响应头中的文件名"""
+        return self.filenames.get(cache_key(url)) or filename_from_response(url, '')
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    def stats(self) -> Dict:
+        self._prepare()
+        files = self._scan()
+        return {
+            'files': len(files),
+            'bytes': sum(size for _, _, size in files),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'downloads': self.downloads,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+        }
+
+
+pdf_cache = PdfCache()
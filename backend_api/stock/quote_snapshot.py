@@ -0,0 +1,122 @@
+"""
+实时行情快照缓存
+进程内缓存整张 stock_realtime_quote，按 MAX(update_time) 判断采集器是否写入了新快照，
+每个快照预先算好各排行类型、各市场的排序下标，分页请求只需切片
+"""
+
+import time
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# 排行类型 -> (排序列, 是否升序)
+RANKING_SORT_MAP = {
+    'rise': ('change_percent', False),
+    'fall': ('change_percent', True),
+    'volume': ('volume', False),
+    'turnover_rate': ('turnover_rate', False)
+}
+
+# 市场类型 -> 代码前缀
+MARKET_PREFIXES = {
+    'all': None,
+    'sh': ('6',),
+    'sz': ('0', '3'),  # 深市包含主板和创业板
+    'cy': ('3',),
+    'bj': ('8', '4'),  # 北交所
+}
+
+QUOTE_BOARD_FIELDS = {
+    'code': 'code',
+    'name': 'name',
+    'current_price': 'current',
+    'change_percent': 'change_percent',
+    'open': 'open',
+    'pre_close': 'pre_close',
+    'high': 'high',
+    'low': 'low',
+    'volume': 'volume',
+    'amount': 'turnover',
+    'turnover_rate': 'rate',
+    'pe_dynamic': 'pe_dynamic',
+    'pb_ratio': 'pb',
+    'total_market_value': 'market_cap',
+    'circulating_market_value': 'circulating_market_cap'
+}
+
+
+class QuoteSnapshot:
+    """一份实时行情快照：格式化后的记录 + 每个 (排行类型, 市场) 的排序下标"""
+
+    def __init__(self, df: pd.DataFrame, version=None):
+        self.version = version
+        df = df.reset_index(drop=True)
+        frame = df[list(QUOTE_BOARD_FIELDS.keys())].rename(columns=QUOTE_BOARD_FIELDS)
+        frame['change'] = (frame['current'] - frame['pre_close']).round(2)
+        frame = frame.replace([np.inf, -np.inf], np.nan)
+        self.records = frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+
+        codes = df['code'].astype(str)
+        self.index = {}
+        for market, prefixes in MARKET_PREFIXES.items():
+            subset = df if prefixes is None else df[codes.str.startswith(prefixes)]
+            for ranking_type, (col, ascending) in RANKING_SORT_MAP.items():
+                ordered = subset.sort_values(by=col, ascending=ascending, na_position='last', kind='stable')
+                self.index[(ranking_type, market)] = ordered.index.to_numpy()
+
+    def __len__(self):
+        return len(self.records)
+
+    def page(self, ranking_type: str, market: str, page: int, page_size: int):
+        """
+        取一页排行数据
+
+        Returns:
+            (当前页记录列表, 总条数)
+        """
+        order = self.index[(ranking_type, market if market in MARKET_PREFIXES else 'all')]
+        start = max(page - 1, 0) * page_size
+        return [self.records[i] for i in order[start:start + page_size]], len(order)
+
+
+class QuoteSnapshotCache:
+    """进程级快照缓存，版本号变化（采集器写入新快照）时才重新加载"""
+
+    def __init__(self, check_interval: float = 5.0):
+        """
+        Args:
+            check_interval: 两次检查版本号的最短间隔（秒），间隔内直接复用当前快照
+        """
+        self.check_interval = check_interval
+        self.snapshot = None
+        self.checked_at = 0.0
+        self.lock = Lock()
+
+    def _current_version(self, db):
+        return db.execute(text(
+            "SELECT MAX(update_time), COUNT(*) FROM stock_realtime_quote WHERE change_percent IS NOT NULL"
+        )).fetchone()
+
+    def _load(self, db, version) -> QuoteSnapshot:
+        df = pd.read_sql_query("SELECT * FROM stock_realtime_quote WHERE change_percent IS NOT NULL", db.bind)
+        return QuoteSnapshot(df, version)
+
+    def get(self, db) -> QuoteSnapshot:
+        """返回最新快照，必要时从数据库重建（同一时间只有一个请求重建）"""
+        snapshot = self.snapshot
+        if snapshot is not None and time.monotonic() - self.checked_at < self.check_interval:
+            return snapshot
+        with self.lock:
+            if self.snapshot is not None and time.monotonic() - self.checked_at < self.check_interval:
+                return self.snapshot
+            version = tuple(self._current_version(db))
+            if self.snapshot is None or self.snapshot.version != version:
+                self.snapshot = self._load(db, version)
+                print(f"[quote_snapshot] 行情快照已刷新: update_time={version[0]}, 共 {len(self.snapshot)} 条")
+            self.checked_at = time.monotonic()
+            return self.snapshot
+
+
+quote_snapshot_cache = QuoteSnapshotCache()
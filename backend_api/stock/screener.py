@@ -0,0 +1,229 @@
+"""
+全市场选股器
+进程内持有一张列式表：实时行情的数值列 + 收盘后指标快照（stock_indicator_snapshot）的指标列，每个字段一个 NumPy 数组。
+行情表或指标快照写入新数据时整表重建（版本判断同 quote_snapshot），筛选表达式编译一次后在整列上向量化求值，
+请求期间不访问数据库，例如：
+
+    table.screen("change_percent > 3 and turnover_rate >= 5 and rsi < 70", sort_by="turnover_rate")
+"""
+
+import ast
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from .indicator_snapshot import INDICATOR_COLUMNS
+from .quote_snapshot import MARKET_PREFIXES, QUOTE_BOARD_FIELDS, QuoteSnapshotCache
+
+# 可筛选的行情字段（stock_realtime_quote 列名）
+QUOTE_COLUMNS = [
+    'current_price', 'change_percent', 'open', 'pre_close', 'high', 'low', 'volume', 'amount',
+    'turnover_rate', 'pe_dynamic', 'pb_ratio', 'total_market_value', 'circulating_market_value'
+]
+
+# 排行接口返回的字段名（current、rate、pb、market_cap 等）也可直接用于筛选和排序
+FIELD_ALIASES = {alias: column for column, alias in QUOTE_BOARD_FIELDS.items() if column in QUOTE_COLUMNS and alias != column}
+
+MAX_EXPRESSION_LENGTH = 500
+
+_COMPARE_OPS = {
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+_BINARY_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+}
+
+
+class ScreenerError(ValueError):
+    """筛选条件或排序字段不合法，接口返回 400"""
+
+
+@lru_cache(maxsize=256)
+def compile_expression(expression: str) -> ast.AST:
+    """
+    解析筛选表达式，只允许字段名、数字、比较、四则运算和 and/or/not
+
+    Args:
+        expression: 例如 "0 < pe_dynamic < 20 and current_price > ma20"
+
+    Returns:
+        ast.AST: 表达式语法树（同一表达式只解析一次）
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ScreenerError(f"筛选条件过长（最多 {MAX_EXPRESSION_LENGTH} 个字符）")
+    try:
+        return ast.parse(expression.strip(), mode='eval').body
+    except SyntaxError:
+        raise ScreenerError(f"筛选条件语法错误: {expression}")
+
+
+def _as_mask(value, size: int) -> np.ndarray:
+    mask = np.asarray(value)
+    if mask.dtype != bool:
+        raise ScreenerError("筛选条件必须是比较表达式，例如 rsi < 30")
+    return np.broadcast_to(mask, (size,))
+
+
+def evaluate(node: ast.AST, columns: Dict[str, np.ndarray], size: int):
+    """在列上递归求值语法树，比较结果为布尔数组；NaN 参与的比较均为 False"""
+    if isinstance(node, ast.BoolOp):
+        masks = [_as_mask(evaluate(value, columns, size), size) for value in node.values]
+        reduce = np.logical_and.reduce if isinstance(node.op, ast.And) else np.logical_or.reduce
+        return reduce(masks)
+    if isinstance(node, ast.UnaryOp):
+        operand = evaluate(node.operand, columns, size)
+        if isinstance(node.op, ast.Not):
+            return ~_as_mask(operand, size)
+        if np.asarray(operand).dtype == bool:
+            raise ScreenerError("比较结果不能参与算术运算")
+        if isinstance(node.op, ast.USub):
+            return -operand
+        if isinstance(node.op, ast.UAdd):
+            return operand
+    if isinstance(node, ast.Compare):
+        result = None
+        left = evaluate(node.left, columns, size)
+        for op, comparator in zip(node.ops, node.comparators):
+            func = _COMPARE_OPS.get(type(op))
+            if func is None:
+                raise ScreenerError(f"不支持的比较运算: {type(op).__name__}")
+            right = evaluate(comparator, columns, size)
+            part = func(left, right)
+            result = part if result is None else result & part
+            left = right
+        return result
+    if isinstance(node, ast.BinOp):
+        func = _BINARY_OPS.get(type(node.op))
+        if func is None:
+            raise ScreenerError(f"不支持的运算: {type(node.op).__name__}")
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return func(evaluate(node.left, columns, size), evaluate(node.right, columns, size))
+    if isinstance(node, ast.Name):
+        if node.id not in columns:
+            raise ScreenerError(f"未知字段: {node.id}")
+        return columns[node.id]
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    raise ScreenerError(f"不支持的表达式: {type(node).__name__}")
+
+
+class ScreenerTable:
+    """一份列式选股表，行顺序与行情快照一致；缺少指标快照的股票指标列为 NaN"""
+
+    def __init__(self, quotes: pd.DataFrame, indicators: Optional[pd.DataFrame] = None, version=None):
+        """
+        Args:
+            quotes: stock_realtime_quote 整表
+            indicators: stock_indicator_snapshot 的 code + INDICATOR_COLUMNS
+            version: 数据版本，用于判断是否需要重建
+        """
+        self.version = version
+        quotes = quotes.reset_index(drop=True)
+        self.codes = quotes['code'].astype(str).to_numpy()
+        self.names = quotes['name'].to_numpy() if 'name' in quotes else np.full(len(quotes), None)
+
+        columns = {}
+        for column in QUOTE_COLUMNS:
+            values = quotes[column] if column in quotes else np.nan
+            columns[column] = pd.to_numeric(pd.Series(values, index=quotes.index), errors='coerce').to_numpy(dtype=float)
+        columns['change'] = np.round(columns['current_price'] - columns['pre_close'], 2)
+        if indicators is not None and len(indicators):
+            aligned = indicators.assign(code=indicators['code'].astype(str)).set_index('code').reindex(self.codes)
+        else:
+            aligned = pd.DataFrame(index=self.codes)
+        for column in INDICATOR_COLUMNS:
+            values = aligned[column] if column in aligned else np.nan
+            columns[column] = pd.to_numeric(pd.Series(values, index=aligned.index), errors='coerce').to_numpy(dtype=float)
+        for column in columns:
+            columns[column][~np.isfinite(columns[column])] = np.nan
+        self.fields = list(columns)
+        for alias, column in FIELD_ALIASES.items():
+            columns[alias] = columns[column]
+        self.columns = columns
+
+        self.markets = {
+            market: np.ones(len(self.codes), dtype=bool) if prefixes is None
+            else pd.Series(self.codes).str.startswith(prefixes).to_numpy()
+            for market, prefixes in MARKET_PREFIXES.items()
+        }
+
+    def __len__(self):
+        return len(self.codes)
+
+    def mask(self, expression: Optional[str], market: str = 'all') -> np.ndarray:
+        """满足筛选条件的行（布尔数组）"""
+        mask = self.markets.get(market, self.markets['all'])
+        if expression and expression.strip():
+            mask = mask & _as_mask(evaluate(compile_expression(expression), self.columns, len(self)), len(self))
+        return mask
+
+    def record(self, row: int) -> Dict:
+        """单行输出：代码、名称和全部字段，缺失值为 None"""
+        record = {'code': self.codes[row], 'name': self.names[row]}
+        for field in self.fields:
+            value = self.columns[field][row]
+            record[field] = None if np.isnan(value) else float(value)
+        return record
+
+    def screen(self, expression: Optional[str] = None, market: str = 'all', sort_by: str = 'change_percent',
+               ascending: bool = False, page: int = 1, page_size: int = 20) -> Tuple[List[Dict], int]:
+        """
+        筛选、排序并分页
+
+        Args:
+            expression: 筛选条件，为空时返回全部
+            market: 市场类型，同排行接口
+            sort_by: 排序字段，缺失值排在最后
+            ascending: 是否升序
+            page: 页码，从 1 开始
+            page_size: 每页条数
+
+        Returns:
+            (当前页记录列表, 满足条件的总条数)
+        """
+        if sort_by not in self.columns:
+            raise ScreenerError(f"未知排序字段: {sort_by}")
+        rows = np.flatnonzero(self.mask(expression, market))
+        values = self.columns[sort_by][rows]
+        # NaN 在 argsort 中排在最后；降序时对取负后的值升序排列，保持 NaN 在最后且同值保持原顺序
+        order = np.argsort(values if ascending else -values, kind='stable')
+        start = max(page - 1, 0) * page_size
+        return [self.record(row) for row in rows[order[start:start + page_size]]], len(rows)
+
+
+class ScreenerCache(QuoteSnapshotCache):
+    """选股表缓存：行情快照或指标快照任一更新时重建"""
+
+    def _current_version(self, db):
+        version = tuple(super()._current_version(db))
+        try:
+            indicator_version = db.execute(text("SELECT MAX(updated_at) FROM stock_indicator_snapshot")).scalar()
+        except Exception:
+            # 指标快照表尚未建立（日线任务还没跑过），只按行情筛选
+            db.rollback()
+            indicator_version = None
+        return version + (indicator_version,)
+
+    def _load(self, db, version) -> ScreenerTable:
+        quotes = pd.read_sql_query("SELECT * FROM stock_realtime_quote WHERE change_percent IS NOT NULL", db.bind)
+        indicators = None
+        if version[-1] is not None:
+            indicators = pd.read_sql_query(
+                f"SELECT code, {', '.join(INDICATOR_COLUMNS)} FROM stock_indicator_snapshot", db.bind
+            )
+        return ScreenerTable(quotes, indicators, version)
+
+
+screener_cache = ScreenerCache()
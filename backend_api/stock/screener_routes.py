@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+from typing import Optional
+import traceback
+from ..database import session_scope
+from .quote_snapshot import MARKET_PREFIXES
+from .screener import FIELD_ALIASES, ScreenerError, screener_cache
+
+router = APIRouter(prefix="/api/screener", tags=["选股器"])
+
+MARKET_PATTERN = "^(" + "|".join(MARKET_PREFIXES) + ")$"
+
+
+def _screener_table():
+    # 会话只在到了版本检查间隔时才真正取连接，间隔内的请求直接使用内存中的列式表
+    with session_scope() as db:
+        return screener_cache.get(db)
+
+
+@router.get("")
+def screen_stocks(
+    expression: Optional[str] = Query(None, alias="filter", description="筛选条件，如: change_percent > 3 and turnover_rate >= 5 and rsi < 70"),
+    market: str = Query('all', pattern=MARKET_PATTERN, description="市场类型: all(全部市场), sh(上交所), sz(深交所), bj(北交所), cy(创业板)"),
+    sort_by: str = Query('change_percent', description="排序字段，可用字段见 /api/screener/fields"),
+    order: str = Query('desc', pattern="^(asc|desc)$", description="排序方向: asc(升序), desc(降序)"),
+    page: int = Query(1, ge=1, description="页码，从1开始"),
+    page_size: int = Query(20, ge=1, le=200, description="每页条数，默认20")
+):
+    """
+    全市场选股：在实时行情和收盘后指标上按条件筛选，支持排序和分页 (数据源: 进程内列式表)
+    """
+    try:
+        print(f"🔎 选股: filter={expression}, market={market}, sort_by={sort_by}, order={order}, page={page}, page_size={page_size}")
+        table = _screener_table()
+        data, total = table.screen(expression, market, sort_by, order == 'asc', page, page_size)
+        print(f"✅ 选股完成: 满足条件 {total} 只, 返回 {len(data)} 条")
+        return JSONResponse({'success': True, 'data': data, 'total': total, 'page': page, 'page_size': page_size})
+    except ScreenerError as e:
+        print(f"❌ 选股条件无效: {str(e)}")
+        return JSONResponse({'success': False, 'message': str(e)}, status_code=400)
+    except Exception as e:
+        print(f"❌ 选股失败: {str(e)}")
+        tb = traceback.format_exc()
+        print(tb)
+        return JSONResponse({'success': False, 'message': '选股失败', 'error': str(e), 'traceback': tb}, status_code=500)
+
+
+@router.get("/fields")
+def get_screener_fields():
+    """
+    可用于筛选和排序的字段
+    """
+    try:
+        table = _screener_table()
+        return JSONResponse({'success': True, 'data': {'fields': table.fields, 'aliases': FIELD_ALIASES}})
+    except Exception as e:
+        print(f"❌ 获取选股字段失败: {str(e)}")
+        return JSONResponse({'success': False, 'message': '获取选股字段失败', 'error': str(e)}, status_code=500)
@@ -1,37 +1,80 @@
+import bisect
+import math
+from collections import deque
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Sequence
 import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from ..database import get_db
-from ..models import HistoricalQuotes, StockRealtimeQuote
+from . import indicator_kernel
 
 logger = logging.getLogger(__name__)
 
+# 默认回看的K线数量（收盘后指标快照也按这个数量计算）
+DEFAULT_LOOKBACK = 60
+
+# 分析周期 -> 每根K线约包含的交易日数，用于换算需要加载的日线数量
+TIMEFRAME_DAYS = {
+    "daily": 1,
+    "weekly": 5,
+    "monthly": 23
+}
+
+# 周期 -> pandas 周期频率
+_TIMEFRAME_PERIODS = {"weekly": "W", "monthly": "M"}
+
+
+def resample_bars(historical_data: List[Dict], timeframe: str) -> List[Dict]:
+    """
+    把日线在内存中合成周线/月线：开盘取首日、收盘取末日、最高/最低取极值、成交量/额求和，
+    日期为该周期内最后一个交易日（当前周期未走完时为最新交易日）
+
+    Args:
+        historical_data: 按日期正序的日线
+        timeframe: daily/weekly/monthly
+
+    Returns:
+        List[Dict]: 按日期正序的K线，字段与日线相同
+    """
+    if timeframe == "daily" or not historical_data:
+        return historical_data
+    df = pd.DataFrame(historical_data)
+    period = pd.to_datetime(df["date"]).dt.to_period(_TIMEFRAME_PERIODS[timeframe])
+    grouped = df.groupby(period.to_numpy(), sort=True)
+    bars = grouped.agg(
+        code=("code", "last"),
+        name=("name", "last"),
+        date=("date", "last"),
+        open=("open", "first"),
+        high=("high", "max"),
+        low=("low", "min"),
+        close=("close", "last"),
+        volume=("volume", "sum"),
+        amount=("amount", "sum"),
+        turnover_rate=("turnover_rate", "sum"),
+    )
+    prev_close = bars["close"].shift(1)
+    bars["change"] = (bars["close"] - prev_close).fillna(0.0).round(4)
+    bars["change_percent"] = ((bars["close"] - prev_close) / prev_close * 100).fillna(0.0).round(4)
+    return bars.reset_index(drop=True).to_dict(orient="records")
+
+
 class TechnicalIndicators:
-    """技术指标计算类"""
+    """技术指标计算类（取最新值；完整序列见 indicator_kernel）"""
+    
+    @staticmethod
+    def calculate_series(highs: List[float], lows: List[float], closes: List[float]) -> Dict[str, np.ndarray]:
+        """一次计算全部指标的完整序列，供图表和信号判断共用"""
+        return indicator_kernel.compute_indicators(highs, lows, closes)
     
     @staticmethod
     def calculate_rsi(prices: List[float], period: int = 14) -> float:
-        """计算RSI指标"""
+        """计算RSI指标（Wilder平滑）"""
         if len(prices) < period + 1:
             return 50.0
-        
-        deltas = np.diff(prices)
-        gains = np.where(deltas > 0, deltas, 0)
-        losses = np.where(deltas < 0, -deltas, 0)
-        
-        avg_gain = np.mean(gains[-period:])
-        avg_loss = np.mean(losses[-period:])
-        
-        if avg_loss == 0:
-            return 100.0
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return round(rsi, 2)
+        return indicator_kernel.last_value(indicator_kernel.rsi(prices, period), 50.0)
     
     @staticmethod
     def calculate_macd(prices: List[float], fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, float]:
@@ -39,19 +82,8 @@ class TechnicalIndicators:
         if len(prices) < slow:
             return {"macd": 0.0, "signal": 0.0, "histogram": 0.0}
         
-        prices_array = np.array(prices)
-        ema_fast = TechnicalIndicators._calculate_ema(prices_array, fast)
-        ema_slow = TechnicalIndicators._calculate_ema(prices_array, slow)
-        
-        macd_line = ema_fast - ema_slow
-        signal_line = TechnicalIndicators._calculate_ema(macd_line, signal)
-        histogram = macd_line - signal_line
-        
-        return {
-            "macd": round(macd_line[-1], 4),
-            "signal": round(signal_line[-1], 4),
-            "histogram": round(histogram[-1], 4)
-        }
+        series = indicator_kernel.macd(prices, fast, slow, signal)
+        return {key: indicator_kernel.last_value(values, 0.0, 4) for key, values in series.items()}
     
     @staticmethod
     def calculate_kdj(highs: List[float], lows: List[float], closes: List[float], period: int = 9) -> Dict[str, float]:
@@ -59,30 +91,8 @@ class TechnicalIndicators:
         if len(closes) < period:
             return {"k": 50.0, "d": 50.0, "j": 50.0}
         
-        highs_array = np.array(highs)
-        lows_array = np.array(lows)
-        closes_array = np.array(closes)
-        
-        # 计算RSV
-        highest_high = pd.Series(highs_array).rolling(window=period).max()
-        lowest_low = pd.Series(lows_array).rolling(window=period).min()
-        rsv = 100 * (closes_array - lowest_low) / (highest_high - lowest_low)
-        
-        # 计算K、D、J值
-        k = 50.0
-        d = 50.0
-        
-        for i in range(len(rsv)):
-            if not np.isnan(rsv[i]):
-                k = (2/3) * k + (1/3) * rsv[i]
-                d = (2/3) * d + (1/3) * k
-                j = 3 * k - 2 * d
-        
-        return {
-            "k": round(k, 2),
-            "d": round(d, 2),
-            "j": round(j, 2)
-        }
+        series = indicator_kernel.kdj(highs, lows, closes, period)
+        return {key: indicator_kernel.last_value(values, 50.0) for key, values in series.items()}
     
     @staticmethod
     def calculate_bollinger_bands(prices: List[float], period: int = 20, std_dev: int = 2) -> Dict[str, float]:
@@ -90,67 +100,167 @@ class TechnicalIndicators:
         if len(prices) < period:
             return {"upper": 0.0, "middle": 0.0, "lower": 0.0}
         
-        prices_array = np.array(prices)
-        middle = np.mean(prices_array[-period:])
-        std = np.std(prices_array[-period:])
-        
-        upper = middle + (std_dev * std)
-        lower = middle - (std_dev * std)
-        
+        series = indicator_kernel.bollinger_bands(prices, period, std_dev)
+        return {key: indicator_kernel.last_value(values, 0.0) for key, values in series.items()}
+    
+    @staticmethod
+    def latest(series: Dict[str, np.ndarray]) -> Dict[str, Dict[str, float]]:
+        """
+        从 calculate_series 的结果中取最新值，格式与 calculate_macd/kdj/bollinger_bands 的返回一致
+
+        Returns:
+            Dict: {"rsi": float, "macd": {...}, "kdj": {...}, "bb": {...}}
+        """
+        last = indicator_kernel.last_value
         return {
-            "upper": round(upper, 2),
-            "middle": round(middle, 2),
-            "lower": round(lower, 2)
+            "rsi": last(series["rsi"], 50.0),
+            "macd": {
+                "macd": last(series["macd"], 0.0, 4),
+                "signal": last(series["macd_signal"], 0.0, 4),
+                "histogram": last(series["macd_hist"], 0.0, 4),
+            },
+            "kdj": {"k": last(series["k"], 50.0), "d": last(series["d"], 50.0), "j": last(series["j"], 50.0)},
+            "bb": {
+                "upper": last(series["boll_upper"], 0.0),
+                "middle": last(series["boll_middle"], 0.0),
+                "lower": last(series["boll_lower"], 0.0),
+            },
         }
     
     @staticmethod
     def _calculate_ema(prices: np.ndarray, period: int) -> np.ndarray:
         """计算指数移动平均"""
-        alpha = 2 / (period + 1)
-        ema = np.zeros_like(prices)
-        ema[0] = prices[0]
-        
-        for i in range(1, len(prices)):
-            ema[i] = alpha * prices[i] + (1 - alpha) * ema[i-1]
-        
-        return ema
+        return indicator_kernel.ema(prices, period)
+
+class TrendState:
+    """
+    收盘价线性趋势的滚动状态（x 为窗口内序号 0..n-1）
+
+    只保存 n、sum(y)、sum(x*y) 以及收益率的一、二阶和，新K线到来时 push 为 O(1)；
+    斜率/截距用闭式解计算，等价于 np.polyfit(x, y, 1)
+    """
+    
+    def __init__(self, window: Optional[int] = None):
+        """
+        Args:
+            window: 窗口长度，None 表示不限长度（只增不减）
+        """
+        self.window = window
+        self.closes = deque()
+        self.returns = deque()
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+        self.sum_r = 0.0
+        self.sum_rr = 0.0
+    
+    @classmethod
+    def from_closes(cls, closes: Sequence[float], window: Optional[int] = None) -> "TrendState":
+        """由已有收盘价一次性（向量化）建立状态"""
+        closes = np.asarray(closes, dtype=float)
+        if window is not None:
+            closes = closes[-window:]
+        state = cls(window)
+        state.closes.extend(closes.tolist())
+        state.sum_y = float(closes.sum())
+        state.sum_xy = float(np.arange(len(closes)) @ closes)
+        if len(closes) > 1:
+            returns = np.diff(closes) / closes[:-1]
+            state.returns.extend(returns.tolist())
+            state.sum_r = float(returns.sum())
+            state.sum_rr = float(returns @ returns)
+        return state
+    
+    def __len__(self):
+        return len(self.closes)
+    
+    def push(self, close: float):
+        """追加一根K线，窗口已满时移除最旧的一根，剩余各点序号减一"""
+        close = float(close)
+        if self.closes:
+            r = close / self.closes[-1] - 1
+            self.returns.append(r)
+            self.sum_r += r
+            self.sum_rr += r * r
+        if self.window is not None and len(self.closes) == self.window:
+            oldest = self.closes.popleft()
+            self.sum_y -= oldest
+            self.sum_xy -= self.sum_y
+            dropped = self.returns.popleft()
+            self.sum_r -= dropped
+            self.sum_rr -= dropped * dropped
+        self.sum_xy += len(self.closes) * close
+        self.sum_y += close
+        self.closes.append(close)
+    
+    def fit(self) -> Tuple[float, float]:
+        """(斜率, 截距)"""
+        n = len(self.closes)
+        if n < 2:
+            return 0.0, self.sum_y / n if n else 0.0
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        slope = (n * self.sum_xy - sum_x * self.sum_y) / (n * sum_xx - sum_x * sum_x)
+        return slope, (self.sum_y - slope * sum_x) / n
+    
+    def volatility(self) -> float:
+        """收益率的总体标准差（同 np.std）"""
+        m = len(self.returns)
+        if m == 0:
+            return 0.0
+        mean = self.sum_r / m
+        return math.sqrt(max(self.sum_rr / m - mean * mean, 0.0))
+
 
 class PricePrediction:
     """价格预测类"""
     
+    EMPTY_PREDICTION = {
+        "target_price": 0.0,
+        "change_percent": 0.0,
+        "prediction_range": {"min": 0.0, "max": 0.0},
+        "confidence": 0.0
+    }
+    
     @staticmethod
-    def predict_price(historical_data: List[Dict], days: int = 30) -> Dict:
-        """基于历史数据预测价格"""
+    def predict_price(historical_data: List[Dict], days: int = 30, indicators: Optional[Dict] = None) -> Dict:
+        """基于历史数据预测价格，indicators 为 TechnicalIndicators.latest 的结果（不传则现算）"""
         if len(historical_data) < 20:
-            return {
-                "target_price": 0.0,
-                "change_percent": 0.0,
-                "prediction_range": {"min": 0.0, "max": 0.0},
-                "confidence": 0.0
-            }
+            return dict(PricePrediction.EMPTY_PREDICTION)
         
         # 提取收盘价
-        closes = [float(data['close']) for data in historical_data]
+        closes = np.array([float(data['close']) for data in historical_data])
         
         # 计算技术指标
-        rsi = TechnicalIndicators.calculate_rsi(closes)
-        macd = TechnicalIndicators.calculate_macd(closes)
-        
-        # 简单的线性回归预测
-        x = np.arange(len(closes))
-        y = np.array(closes)
-        
-        # 计算趋势
-        slope, intercept = np.polyfit(x, y, 1)
+        if indicators is not None:
+            rsi, macd = indicators["rsi"], indicators["macd"]
+        else:
+            rsi = TechnicalIndicators.calculate_rsi(closes)
+            macd = TechnicalIndicators.calculate_macd(closes)
         
-        # 预测目标价格
-        target_price = slope * (len(closes) + days) + intercept
-        current_price = closes[-1]
+        return PricePrediction.predict_from_state(TrendState.from_closes(closes), rsi, macd, days)
+    
+    @staticmethod
+    def predict_from_state(state: TrendState, rsi: float, macd: Dict, days: int = 30) -> Dict:
+        """
+        由趋势状态和同一分析流程中已算好的指标生成预测
+        
+        Args:
+            state: 收盘价趋势状态（可随新K线 push 增量更新）
+            rsi: RSI 最新值
+            macd: {"macd", "signal", "histogram"} 最新值
+            days: 预测天数
+        """
+        if len(state) < 20:
+            return dict(PricePrediction.EMPTY_PREDICTION)
+        
+        # 线性趋势外推
+        slope, intercept = state.fit()
+        target_price = slope * (len(state) + days) + intercept
+        current_price = state.closes[-1]
         change_percent = ((target_price - current_price) / current_price) * 100
         
         # 计算预测区间（基于历史波动率）
-        returns = np.diff(closes) / closes[:-1]
-        volatility = np.std(returns) * np.sqrt(days)
+        volatility = state.volatility() * np.sqrt(days)
         
         prediction_range = {
             "min": round(target_price * (1 - volatility), 2),
@@ -167,6 +277,56 @@ class PricePrediction:
             "confidence": round(confidence, 1)
         }
     
+    @staticmethod
+    def predict_batch(closes: np.ndarray, rsi: np.ndarray, macd: np.ndarray, histogram: np.ndarray,
+                      days: int = 30) -> Dict[str, np.ndarray]:
+        """
+        全市场批量预测：每行一只股票，历史不足的行左侧为 NaN
+        
+        Args:
+            closes: (股票数, K线数) 收盘价矩阵
+            rsi/macd/histogram: 各股票的指标最新值（已按 TechnicalIndicators.latest 取整）
+            days: 预测天数
+        
+        Returns:
+            Dict[str, np.ndarray]: target_price/change_percent/min/max/confidence，不足 20 根K线的行为 0
+        """
+        closes = np.asarray(closes, dtype=float)
+        valid = np.isfinite(closes)
+        n = valid.sum(axis=1).astype(float)
+        # 每行以第一根有效K线为 x=0
+        x = np.arange(closes.shape[1]) - (closes.shape[1] - n)[:, None]
+        y = np.where(valid, closes, 0.0)
+        sum_y = y.sum(axis=1)
+        sum_xy = (np.where(valid, x, 0.0) * y).sum(axis=1)
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x * sum_x)
+            intercept = (sum_y - slope * sum_x) / n
+            target = slope * (n + days) + intercept
+            current = closes[:, -1]
+            change = (target - current) / current * 100
+            returns = closes[:, 1:] / closes[:, :-1] - 1
+            volatility = np.sqrt(np.nanmean(returns ** 2, axis=1) - np.nanmean(returns, axis=1) ** 2) * np.sqrt(days)
+        
+        # 置信度规则与 _calculate_confidence 相同
+        confidence = (50.0 + np.where((rsi >= 30) & (rsi <= 70), 10, -5)
+                      + np.where((macd > 0) & (histogram > 0), 15, np.where((macd < 0) & (histogram < 0), -10, 0))
+                      + np.where(slope > 0, 10, -10))
+        enough = n >= 20
+        
+        def finish(values, digits):
+            return np.where(enough, np.round(values, digits), 0.0)
+        
+        return {
+            "target_price": finish(target, 2),
+            "change_percent": finish(change, 2),
+            "min": finish(target * (1 - volatility), 2),
+            "max": finish(target * (1 + volatility), 2),
+            "confidence": finish(np.clip(confidence, 0, 100), 1),
+        }
+    
     @staticmethod
     def _calculate_confidence(rsi: float, macd: Dict, slope: float) -> float:
         """计算预测置信度"""
@@ -196,8 +356,8 @@ class TradingRecommendation:
     """交易建议类"""
     
     @staticmethod
-    def generate_recommendation(historical_data: List[Dict], current_price: float) -> Dict:
-        """生成交易建议"""
+    def generate_recommendation(historical_data: List[Dict], current_price: float, indicators: Optional[Dict] = None) -> Dict:
+        """生成交易建议，indicators 为 TechnicalIndicators.latest 的结果（不传则现算）"""
         if len(historical_data) < 20:
             return {
                 "action": "hold",
@@ -213,10 +373,9 @@ class TradingRecommendation:
         lows = [float(data['low']) for data in historical_data]
         
         # 计算技术指标
-        rsi = TechnicalIndicators.calculate_rsi(closes)
-        macd = TechnicalIndicators.calculate_macd(closes)
-        kdj = TechnicalIndicators.calculate_kdj(highs, lows, closes)
-        bb = TechnicalIndicators.calculate_bollinger_bands(closes)
+        if indicators is None:
+            indicators = TechnicalIndicators.latest(TechnicalIndicators.calculate_series(highs, lows, closes))
+        rsi, macd, kdj, bb = indicators["rsi"], indicators["macd"], indicators["kdj"], indicators["bb"]
         
         # 分析信号
         signals = TradingRecommendation._analyze_signals(rsi, macd, kdj, bb, current_price, volumes)
@@ -317,7 +476,10 @@ class TradingRecommendation:
         }
 
 class KeyLevels:
-    """关键价位分析类"""
+    """关键价位分析类（数组实现，整体线性复杂度，可用于多年窗口和全市场批量计算）"""
+    
+    # 局部极值检测的半窗口大小，参考主流网站
+    WINDOW_SIZE = 3
     
     @staticmethod
     def calculate_key_levels(historical_data: List[Dict], current_price: float) -> Dict:
@@ -330,10 +492,10 @@ class KeyLevels:
             }
         
         # 提取数据
-        highs = [float(data['high']) for data in historical_data]
-        lows = [float(data['low']) for data in historical_data]
-        closes = [float(data['close']) for data in historical_data]
-        volumes = [float(data.get('volume', 0)) for data in historical_data]
+        highs = np.array([float(data['high']) for data in historical_data])
+        lows = np.array([float(data['low']) for data in historical_data])
+        closes = np.array([float(data['close']) for data in historical_data])
+        volumes = np.array([float(data.get('volume', 0)) for data in historical_data])
         
         # 计算支撑位（基于近期低点和重要价位）
         support_levels = KeyLevels._find_support_levels(lows, closes, volumes, current_price)
@@ -350,6 +512,8 @@ class KeyLevels:
     @staticmethod
     def _find_support_levels(lows: List[float], closes: List[float], volumes: List[float], current_price: float) -> List[float]:
         """寻找支撑位"""
+        lows = np.asarray(lows, dtype=float)
+        closes = np.asarray(closes, dtype=float)
         support_levels = []
         
         # 1. 寻找重要低点（使用改进的极值检测算法）
@@ -359,8 +523,8 @@ class KeyLevels:
         # 2. 计算斐波那契回调位
         if len(closes) >= 20:
             # 从收盘价中估算高低点
-            recent_high = max(closes[-20:])
-            recent_low = min(lows[-20:])
+            recent_high = float(closes[-20:].max())
+            recent_low = float(lows[-20:].min())
             fib_levels = KeyLevels._calculate_fibonacci_levels(recent_high, recent_low, current_price, is_support=True)
             support_levels.extend(fib_levels)
         
@@ -384,6 +548,9 @@ class KeyLevels:
     @staticmethod
     def _find_resistance_levels(highs: List[float], lows: List[float], closes: List[float], volumes: List[float], current_price: float) -> List[float]:
         """寻找阻力位"""
+        highs = np.asarray(highs, dtype=float)
+        lows = np.asarray(lows, dtype=float)
+        closes = np.asarray(closes, dtype=float)
         resistance_levels = []
         
         # 1. 寻找重要高点（使用改进的极值检测算法）
@@ -393,8 +560,8 @@ class KeyLevels:
         # 2. 计算斐波那契回调位
         if len(closes) >= 20:
             # 使用真实的高低点
-            recent_high = max(highs[-20:])
-            recent_low = min(lows[-20:])
+            recent_high = float(highs[-20:].max())
+            recent_low = float(lows[-20:].min())
             fib_levels = KeyLevels._calculate_fibonacci_levels(recent_high, recent_low, current_price, is_support=False)
             resistance_levels.extend(fib_levels)
         
@@ -415,53 +582,70 @@ class KeyLevels:
         
         return resistance_levels[:3]
     
+    @staticmethod
+    def _local_extrema(values: np.ndarray, volumes: List[float], is_low: bool) -> np.ndarray:
+        """
+        成交量较大的局部极值点（按时间顺序）
+        
+        某点是窗口 [i-w, i+w] 内的最小值（或最大值），且成交量超过全期平均值的80%
+        """
+        values = np.asarray(values, dtype=float)
+        w = KeyLevels.WINDOW_SIZE
+        n = len(values)
+        if n < 2 * w + 1:
+            return np.array([])
+        center = values[w:n - w]
+        if is_low:
+            extreme = indicator_kernel.rolling_min(values, 2 * w + 1)[2 * w:]
+            is_extreme = center <= extreme
+        else:
+            extreme = indicator_kernel.rolling_max(values, 2 * w + 1)[2 * w:]
+            is_extreme = center >= extreme
+        
+        # 只有成交量较大的点才被认为是重要的（参考主流网站标准）
+        volumes = np.asarray(volumes, dtype=float)
+        avg_volume = volumes.mean() if len(volumes) else 0
+        if avg_volume > 0:
+            is_extreme &= volumes[w:n - w] / avg_volume > 0.8
+        return center[is_extreme]
+    
+    @staticmethod
+    def _merge_nearby(candidates: np.ndarray, min_distance: float) -> List[float]:
+        """
+        按顺序依次接纳候选价位，与已接纳价位距离小于 min_distance 的跳过
+        
+        已接纳价位保存在有序数组中，每个候选只需与二分查找到的左右相邻价位比较
+        """
+        accepted = []
+        ordered = []
+        for value in candidates:
+            pos = bisect.bisect_left(ordered, value)
+            if pos > 0 and abs(value - ordered[pos - 1]) < min_distance:
+                continue
+            if pos < len(ordered) and abs(value - ordered[pos]) < min_distance:
+                continue
+            level = round(float(value), 2)
+            accepted.append(level)
+            bisect.insort(ordered, level)
+        return accepted
+    
     @staticmethod
     def _find_significant_lows(lows: List[float], volumes: List[float], current_price: float) -> List[float]:
         """寻找重要低点（参考东方财富网、同花顺等主流网站）"""
-        significant_lows = []
-        window_size = 3  # 滑动窗口大小，参考主流网站
-        
-        for i in range(window_size, len(lows) - window_size):
-            # 检查是否为局部最低点
-            is_local_min = all(lows[i] <= lows[j] for j in range(i - window_size, i + window_size + 1))
-            
-            # 支撑位必须严格小于当前价格
-            if is_local_min and lows[i] < current_price and lows[i] > 0:
-                # 计算成交量权重
-                avg_volume = sum(volumes) / len(volumes) if volumes else 0
-                volume_weight = volumes[i] / avg_volume if avg_volume > 0 else 1
-                
-                # 只有成交量较大的低点才被认为是重要的（参考主流网站标准）
-                if volume_weight > 0.8:  # 成交量超过平均值的80%
-                    # 避免过于接近的低点
-                    if not any(abs(lows[i] - existing) < current_price * 0.02 for existing in significant_lows):
-                        significant_lows.append(round(lows[i], 2))
-        
-        return significant_lows
+        candidates = KeyLevels._local_extrema(lows, volumes, is_low=True)
+        # 支撑位必须严格小于当前价格
+        candidates = candidates[(candidates < current_price) & (candidates > 0)]
+        # 避免过于接近的低点
+        return KeyLevels._merge_nearby(candidates, current_price * 0.02)
     
     @staticmethod
     def _find_significant_highs(highs: List[float], volumes: List[float], current_price: float) -> List[float]:
         """寻找重要高点（参考东方财富网、同花顺等主流网站）"""
-        significant_highs = []
-        window_size = 3  # 滑动窗口大小，参考主流网站
-        
-        for i in range(window_size, len(highs) - window_size):
-            # 检查是否为局部最高点
-            is_local_max = all(highs[i] >= highs[j] for j in range(i - window_size, i + window_size + 1))
-            
-            # 阻力位必须严格大于当前价格
-            if is_local_max and highs[i] > current_price:
-                # 计算成交量权重
-                avg_volume = sum(volumes) / len(volumes) if volumes else 0
-                volume_weight = volumes[i] / avg_volume if avg_volume > 0 else 1
-                
-                # 只有成交量较大的高点才被认为是重要的（参考主流网站标准）
-                if volume_weight > 0.8:  # 成交量超过平均值的80%
-                    # 避免过于接近的高点
-                    if not any(abs(highs[i] - existing) < current_price * 0.02 for existing in significant_highs):
-                        significant_highs.append(round(highs[i], 2))
-        
-        return significant_highs
+        candidates = KeyLevels._local_extrema(highs, volumes, is_low=False)
+        # 阻力位必须严格大于当前价格
+        candidates = candidates[candidates > current_price]
+        # 避免过于接近的高点
+        return KeyLevels._merge_nearby(candidates, current_price * 0.02)
     
     @staticmethod
     def _calculate_fibonacci_levels(high: float, low: float, current_price: float, is_support: bool) -> List[float]:
@@ -490,43 +674,30 @@ class KeyLevels:
         
         return fib_levels
     
+    @staticmethod
+    def _moving_averages(closes: List[float]) -> List[float]:
+        """多个周期的移动平均线（参考主流网站常用周期），数据不足的周期跳过"""
+        closes = np.asarray(closes, dtype=float)
+        csum = np.concatenate(([0.0], np.cumsum(closes)))
+        return [(csum[-1] - csum[-1 - period]) / period for period in (5, 10, 20, 30, 60) if len(closes) >= period]
+    
     @staticmethod
     def _calculate_ma_support_levels(closes: List[float], current_price: float) -> List[float]:
         """计算移动平均线支撑位（参考东方财富网、同花顺等主流网站）"""
-        ma_levels = []
-        
-        # 计算多个周期的移动平均线，参考主流网站常用周期
-        ma_periods = [5, 10, 20, 30, 60]
-        
-        for period in ma_periods:
-            if len(closes) >= period:
-                ma = sum(closes[-period:]) / period
-                # 支撑位必须严格小于当前价格，且为正数
-                if ma < current_price and ma > 0:
-                    # 只添加距离当前价格不太远的移动平均线（避免过远的支撑位）
-                    if current_price - ma <= current_price * 0.15:  # 距离不超过15%
-                        ma_levels.append(round(ma, 2))
-        
-        return ma_levels
+        # 支撑位必须严格小于当前价格且为正数，且距离当前价格不超过15%（避免过远的支撑位）
+        return [
+            round(float(ma), 2) for ma in KeyLevels._moving_averages(closes)
+            if 0 < ma < current_price and current_price - ma <= current_price * 0.15
+        ]
     
     @staticmethod
     def _calculate_ma_resistance_levels(closes: List[float], current_price: float) -> List[float]:
         """计算移动平均线阻力位（参考东方财富网、同花顺等主流网站）"""
-        ma_levels = []
-        
-        # 计算多个周期的移动平均线，参考主流网站常用周期
-        ma_periods = [5, 10, 20, 30, 60]
-        
-        for period in ma_periods:
-            if len(closes) >= period:
-                ma = sum(closes[-period:]) / period
-                # 阻力位必须严格大于当前价格
-                if ma > current_price:
-                    # 只添加距离当前价格不太远的移动平均线（避免过远的阻力位）
-                    if ma - current_price <= current_price * 0.15:  # 距离不超过15%
-                        ma_levels.append(round(ma, 2))
-        
-        return ma_levels
+        # 阻力位必须严格大于当前价格，且距离当前价格不超过15%（避免过远的阻力位）
+        return [
+            round(float(ma), 2) for ma in KeyLevels._moving_averages(closes)
+            if ma > current_price and ma - current_price <= current_price * 0.15
+        ]
     
     @staticmethod
     def _calculate_psychological_levels(current_price: float, is_support: bool) -> List[float]:
@@ -562,21 +733,21 @@ class KeyLevels:
         
         return psychological_levels
     
+    @staticmethod
+    def _bollinger_band(closes: List[float]) -> Tuple[float, float]:
+        """最近20日的布林带 (下轨, 上轨)，总体标准差"""
+        recent = np.asarray(closes[-20:], dtype=float)
+        ma20 = recent.mean()
+        std = recent.std()
+        return float(ma20 - 2 * std), float(ma20 + 2 * std)
+    
     @staticmethod
     def _calculate_bollinger_support_levels(closes: List[float], current_price: float) -> List[float]:
         """计算布林带支撑位"""
         if len(closes) < 20:
             return []
         
-        # 计算20日移动平均线
-        ma20 = sum(closes[-20:]) / 20
-        
-        # 计算标准差
-        variance = sum((price - ma20) ** 2 for price in closes[-20:]) / 20
-        std = variance ** 0.5
-        
-        # 布林带下轨
-        lower_band = ma20 - (2 * std)
+        lower_band, _ = KeyLevels._bollinger_band(closes)
         
         if lower_band < current_price and lower_band > 0:
             return [round(lower_band, 2)]
@@ -589,15 +760,7 @@ class KeyLevels:
         if len(closes) < 20:
             return []
         
-        # 计算20日移动平均线
-        ma20 = sum(closes[-20:]) / 20
-        
-        # 计算标准差
-        variance = sum((price - ma20) ** 2 for price in closes[-20:]) / 20
-        std = variance ** 0.5
-        
-        # 布林带上轨
-        upper_band = ma20 + (2 * std)
+        _, upper_band = KeyLevels._bollinger_band(closes)
         
         if upper_band > current_price:
             return [round(upper_band, 2)]
@@ -610,93 +773,209 @@ class KeyLevels:
         if not levels:
             return []
         
-        # 去重
-        unique_levels = list(set(levels))
+        # 去重并升序排列
+        unique_levels = np.unique(np.asarray(levels, dtype=float))
         
         # 过滤：支撑位必须严格小于当前价格，阻力位必须严格大于当前价格
         if is_support:
-            filtered_levels = [level for level in unique_levels if level < current_price and level > 0]
             # 支撑位按降序排列（从高到低，最接近当前价格的在前）
-            filtered_levels.sort(reverse=True)
+            filtered_levels = unique_levels[(unique_levels < current_price) & (unique_levels > 0)][::-1]
         else:
-            filtered_levels = [level for level in unique_levels if level > current_price]
             # 阻力位按升序排列（从低到高，最接近当前价格的在前）
-            filtered_levels.sort()
+            filtered_levels = unique_levels[unique_levels > current_price]
         
-        # 去除过于接近的价位（避免重复，参考主流网站标准）
+        # 去除过于接近的价位（避免重复，参考主流网站标准）；
+        # 限制返回的价位数量，参考主流网站通常显示3-5个价位，凑够即可停止
         final_levels = []
         min_distance = current_price * 0.015  # 最小距离为当前价格的1.5%
+        max_levels = 5
         
         for level in filtered_levels:
             if not any(abs(level - existing) < min_distance for existing in final_levels):
-                final_levels.append(round(level, 2))
+                final_levels.append(round(float(level), 2))
+                if len(final_levels) >= max_levels:
+                    break
         
-        # 限制返回的价位数量，参考主流网站通常显示3-5个价位
-        max_levels = 5
-        return final_levels[:max_levels]
+        return final_levels
 
 class StockAnalysisService:
     """股票分析服务类"""
     
-    def __init__(self):
-        self.db = next(get_db())
+    def __init__(self, db: Session):
+        """
+        Args:
+            db: 数据库会话，由调用方负责关闭（见 database.session_scope）
+        """
+        self.db = db
     
-    def get_stock_analysis(self, stock_code: str) -> Dict:
-        """获取股票智能分析结果"""
+    def get_stock_analysis(self, stock_code: str, lookback: int = DEFAULT_LOOKBACK, timeframe: str = "daily") -> Dict:
+        """
+        获取股票智能分析结果：默认参数下优先读取收盘后预计算的指标快照，否则从历史行情现算
+        
+        Args:
+            stock_code: 股票代码
+            lookback: 回看的K线数量（按 timeframe 的周期计）
+            timeframe: 分析周期 daily/weekly/monthly
+        """
         try:
-            # 获取历史数据
-            historical_data = self._get_historical_data(stock_code)
-            if not historical_data:
-                return {"error": "无法获取历史数据"}
+            snapshot = None
+            if lookback == DEFAULT_LOOKBACK and timeframe == "daily":
+                snapshot = self._get_snapshot(stock_code)
+            if snapshot is not None:
+                historical_data, indicators, price_prediction, current_price = snapshot
+            else:
+                # 获取历史数据和当前价格
+                daily, current_price = self._get_history_with_price(stock_code, lookback * TIMEFRAME_DAYS[timeframe])
+                historical_data = resample_bars(daily, timeframe)[-lookback:]
+                if not historical_data:
+                    return {"error": "无法获取历史数据"}
+                
+                indicators = self.calculate_indicators(historical_data)
+                price_prediction = None
             
-            # 获取当前价格
-            current_price = self._get_current_price(stock_code)
             if not current_price:
                 current_price = float(historical_data[-1]['close'])
             
-            # 计算技术指标
-            technical_indicators = self._calculate_technical_indicators(historical_data)
-            
-            # 价格预测
-            price_prediction = PricePrediction.predict_price(historical_data)
+            data = self.build_analysis(historical_data, current_price, indicators, price_prediction)
+            data["analysis_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            return {"success": True, "data": data}
             
-            # 交易建议
-            trading_recommendation = TradingRecommendation.generate_recommendation(historical_data, current_price)
-            
-            # 关键价位
-            key_levels = KeyLevels.calculate_key_levels(historical_data, current_price)
+        except Exception as e:
+            logger.error(f"分析股票 {stock_code} 时出错: {str(e)}")
+            return {"error": f"分析失败: {str(e)}"}
+    
+    def get_multi_timeframe_analysis(self, stock_code: str, lookback: int = DEFAULT_LOOKBACK,
+                                     timeframes: Tuple[str, ...] = ("daily", "weekly", "monthly")) -> Dict:
+        """
+        多周期分析：按最长周期加载一次日线，在内存中合成各周期K线后分别计算
+        
+        Returns:
+            Dict: data 以周期为键，每个周期包含 build_analysis 的结果和 bars/start_date/end_date
+        """
+        try:
+            daily, current_price = self._get_history_with_price(
+                stock_code, lookback * max(TIMEFRAME_DAYS[tf] for tf in timeframes)
+            )
+            if not daily:
+                return {"error": "无法获取历史数据"}
+            current_price = current_price or float(daily[-1]['close'])
             
+            data = {}
+            for timeframe in timeframes:
+                bars = resample_bars(daily, timeframe)[-lookback:]
+                analysis = self.build_analysis(bars, current_price, self.calculate_indicators(bars))
+                analysis.update({"bars": len(bars), "start_date": bars[0]["date"], "end_date": bars[-1]["date"]})
+                data[timeframe] = analysis
             return {
                 "success": True,
-                "data": {
-                    "technical_indicators": technical_indicators,
-                    "price_prediction": price_prediction,
-                    "trading_recommendation": trading_recommendation,
-                    "key_levels": key_levels,
-                    "current_price": current_price,
-                    "analysis_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
+                "data": data,
+                "current_price": current_price,
+                "analysis_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
-            
+        
         except Exception as e:
-            logger.error(f"分析股票 {stock_code} 时出错: {str(e)}")
+            logger.error(f"多周期分析股票 {stock_code} 时出错: {str(e)}")
             return {"error": f"分析失败: {str(e)}"}
     
-    def _get_historical_data(self, stock_code: str, days: int = 60) -> List[Dict]:
-        """获取历史数据"""
+    @staticmethod
+    def calculate_indicators(historical_data: List[Dict]) -> Optional[Dict]:
+        """指标序列只计算一次，技术指标、预测和交易建议共用；不足 20 根 K 线时返回 None"""
+        if len(historical_data) < 20:
+            return None
+        series = TechnicalIndicators.calculate_series(
+            [d['high'] for d in historical_data],
+            [d['low'] for d in historical_data],
+            [d['close'] for d in historical_data]
+        )
+        return TechnicalIndicators.latest(series)
+    
+    @staticmethod
+    def build_analysis(historical_data: List[Dict], current_price: float, indicators: Optional[Dict] = None,
+                       price_prediction: Optional[Dict] = None) -> Dict:
+        """
+        由历史K线和指标组装分析结果
+        
+        Args:
+            historical_data: 按日期正序的K线（至少包含 high/low/close/volume）
+            current_price: 当前价格，交易建议和关键价位以它为准
+            indicators: TechnicalIndicators.latest 的结果
+            price_prediction: 已算好的价格预测（只依赖收盘价，可直接复用快照）
+        
+        Returns:
+            Dict: technical_indicators/price_prediction/trading_recommendation/key_levels/current_price
+        """
+        if price_prediction is None:
+            price_prediction = PricePrediction.predict_price(historical_data, indicators=indicators)
+        return {
+            "technical_indicators": StockAnalysisService._calculate_technical_indicators(historical_data, indicators),
+            "price_prediction": price_prediction,
+            "trading_recommendation": TradingRecommendation.generate_recommendation(historical_data, current_price, indicators),
+            "key_levels": KeyLevels.calculate_key_levels(historical_data, current_price),
+            "current_price": current_price
+        }
+    
+    def _get_snapshot(self, stock_code: str) -> Optional[Tuple[List[Dict], Optional[Dict], Dict, Optional[float]]]:
+        """
+        按主键读取指标快照（见 indicator_snapshot），同时带出实时价格
+        快照日期早于该股票最新日线（akshare/自选股采集后尚未刷新快照，或刷新失败）时不使用快照
+        
+        Returns:
+            (K线列表, 指标, 价格预测, 当前价格)，没有快照或快照已过期时返回 None
+        """
+        try:
+            row = self.db.execute(text("""
+                SELECT s.bars, s.indicators, s.price_prediction, r.current_price, s.date,
+                       (SELECT MAX(h.date) FROM historical_quotes h WHERE h.code = s.code) AS latest_date
+                FROM stock_indicator_snapshot s
+                LEFT JOIN stock_realtime_quote r ON r.code = s.code
+                WHERE s.code = :code
+            """), {"code": stock_code}).fetchone()
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"读取指标快照失败，改为现算: {str(e)}")
+            return None
+        if row is None or not row[0]:
+            return None
+        snapshot_date, latest_date = row[4], row[5]
+        if snapshot_date is None or (latest_date is not None and str(snapshot_date)[:10] < str(latest_date)[:10]):
+            logger.info(f"{stock_code} 指标快照日期 {snapshot_date} 早于最新日线 {latest_date}，改为现算")
+            return None
+        bars = row[0]
+        historical_data = [
+            {"high": h, "low": l, "close": c, "volume": v}
+            for h, l, c, v in zip(bars["high"], bars["low"], bars["close"], bars["volume"])
+        ]
+        current_price = float(row[3]) if row[3] else None
+        return historical_data, row[1], row[2], current_price
+    
+    def _get_historical_data(self, stock_code: str, days: int = DEFAULT_LOOKBACK) -> List[Dict]:
+        """获取最近 days 个交易日的日线"""
+        return self._get_history_with_price(stock_code, days)[0]
+    
+    def _get_history_with_price(self, stock_code: str, days: int = DEFAULT_LOOKBACK) -> Tuple[List[Dict], Optional[float]]:
+        """
+        一次查询取出最近 days 个交易日的日线和实时价格
+        
+        Returns:
+            (按日期正序的日线列表, 当前价格)，查询失败时返回 ([], None)
+        """
         try:
-            # 查询最近60天的历史数据
             query = text("""
-                SELECT code, name, date, open, high, low, close, volume, amount, 
-                       change_percent, change, turnover_rate
-                FROM historical_quotes 
-                WHERE code = :code 
-                ORDER BY date DESC 
-                LIMIT :days
+                SELECT h.code, h.name, h.date, h.open, h.high, h.low, h.close, h.volume, h.amount,
+                       h.change_percent, h.change, h.turnover_rate, r.current_price
+                FROM (
+                    SELECT code, name, date, open, high, low, close, volume, amount,
+                           change_percent, change, turnover_rate
+                    FROM historical_quotes
+                    WHERE code = :code
+                    ORDER BY date DESC
+                    LIMIT :days
+                ) h
+                LEFT JOIN stock_realtime_quote r ON r.code = h.code
+                ORDER BY h.date
             """)
             
-            result = self.db.execute(query, {"code": stock_code, "days": days})
-            rows = result.fetchall()
+            rows = self.db.execute(query, {"code": stock_code, "days": days}).fetchall()
             
             # 转换为字典列表
             data = []
@@ -715,40 +994,27 @@ class StockAnalysisService:
                     "change": float(row[10]) if row[10] else 0.0,
                     "turnover_rate": float(row[11]) if row[11] else 0.0
                 })
-            
-            # 按日期正序排列
-            return list(reversed(data))
+            current_price = float(rows[-1][12]) if rows and rows[-1][12] else None
+            return data, current_price
             
         except Exception as e:
+            self.db.rollback()
             logger.error(f"获取历史数据失败: {str(e)}")
-            return []
-    
-    def _get_current_price(self, stock_code: str) -> Optional[float]:
-        """获取当前价格"""
-        try:
-            stock = self.db.query(StockRealtimeQuote).filter(StockRealtimeQuote.code == stock_code).first()
-            if stock:
-                return float(stock.current_price) if stock.current_price else None
-            return None
-        except Exception as e:
-            logger.error(f"获取当前价格失败: {str(e)}")
-            return None
+            return [], None
     
-    def _calculate_technical_indicators(self, historical_data: List[Dict]) -> Dict:
-        """计算技术指标"""
+    @staticmethod
+    def _calculate_technical_indicators(historical_data: List[Dict], indicators: Optional[Dict] = None) -> Dict:
+        """计算技术指标，indicators 为 TechnicalIndicators.latest 的结果（不传则现算）"""
         if len(historical_data) < 20:
             return {}
         
-        # 提取数据
-        closes = [data['close'] for data in historical_data]
-        highs = [data['high'] for data in historical_data]
-        lows = [data['low'] for data in historical_data]
-        
-        # 计算各项指标
-        rsi = TechnicalIndicators.calculate_rsi(closes)
-        macd = TechnicalIndicators.calculate_macd(closes)
-        kdj = TechnicalIndicators.calculate_kdj(highs, lows, closes)
-        bb = TechnicalIndicators.calculate_bollinger_bands(closes)
+        if indicators is None:
+            indicators = TechnicalIndicators.latest(TechnicalIndicators.calculate_series(
+                [data['high'] for data in historical_data],
+                [data['low'] for data in historical_data],
+                [data['close'] for data in historical_data]
+            ))
+        rsi, macd, kdj, bb = indicators["rsi"], indicators["macd"], indicators["kdj"], indicators["bb"]
         
         # 判断信号
         rsi_signal = "超卖" if rsi < 30 else "超买" if rsi > 70 else "中性"
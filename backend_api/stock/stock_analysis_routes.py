@@ -1,24 +1,113 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 import logging
-from ..database import get_db
-from .stock_analysis import StockAnalysisService
+from ..database import session_scope
+from ..config import ANALYSIS_CACHE_CONFIG
+from .cache import TTLCache
+from .stock_analysis import StockAnalysisService, DEFAULT_LOOKBACK, TIMEFRAME_DAYS
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/analysis", tags=["智能分析"])
 
+TIMEFRAME_PATTERN = "^(" + "|".join(TIMEFRAME_DAYS) + ")$"
+
+# 每只股票的完整分析结果只计算一次，各子路由从同一份结果中取所需部分
+analysis_cache = TTLCache(
+    maxsize=ANALYSIS_CACHE_CONFIG["maxsize"],
+    ttl=ANALYSIS_CACHE_CONFIG["ttl"],
+    name="stock_analysis"
+)
+
+
+class _AnalysisFailed(Exception):
+    """分析失败的结果不写入缓存"""
+
+    def __init__(self, result):
+        super().__init__(result.get("error"))
+        self.result = result
+
+
+VERSION_SQL = """
+    SELECT (SELECT MAX(date) FROM historical_quotes WHERE code = :code),
+           (SELECT update_time FROM stock_realtime_quote WHERE code = :code)
+"""
+
+SNAPSHOT_VERSION_SQL = """
+    SELECT (SELECT MAX(date) FROM historical_quotes WHERE code = :code),
+           (SELECT update_time FROM stock_realtime_quote WHERE code = :code),
+           (SELECT updated_at FROM stock_indicator_snapshot WHERE code = :code)
+"""
+
+
+def _analysis_version(stock_code: str):
+    """
+    分析结果的版本：最新日线日期 + 实时行情更新时间 + 指标快照更新时间，任一变化都需要重新计算
+    （日线入库后、快照刷新前算出的结果不会在快照刷新后继续命中）
+    """
+    with session_scope() as db:
+        try:
+            row = db.execute(text(SNAPSHOT_VERSION_SQL), {"code": stock_code}).fetchone()
+        except Exception:
+            # 指标快照表尚未建立（日线任务还没跑过）
+            db.rollback()
+            row = db.execute(text(VERSION_SQL), {"code": stock_code}).fetchone()
+            row = tuple(row) + (None,) if row else None
+    return tuple(row) if row else (None, None, None)
+
+
+def _compute_analysis(stock_code: str, lookback: int = DEFAULT_LOOKBACK, timeframe: str = "daily"):
+    # 会话只在计算期间持有，结束即归还连接池；等待同一结果的并发请求不占用连接
+    with session_scope() as db:
+        result = StockAnalysisService(db).get_stock_analysis(stock_code, lookback, timeframe)
+    if "error" in result:
+        raise _AnalysisFailed(result)
+    return result
+
+
+def _compute_timeframes(stock_code: str, lookback: int, timeframes):
+    with session_scope() as db:
+        result = StockAnalysisService(db).get_multi_timeframe_analysis(stock_code, lookback, timeframes)
+    if "error" in result:
+        raise _AnalysisFailed(result)
+    return result
+
+
+async def _cached(key, stock_code: str, compute):
+    version = await run_in_threadpool(_analysis_version, stock_code)
+    try:
+        return await run_in_threadpool(analysis_cache.get_or_load, key + version, compute)
+    except _AnalysisFailed as e:
+        return e.result
+
+
+async def get_analysis(stock_code: str, lookback: int = DEFAULT_LOOKBACK, timeframe: str = "daily"):
+    """
+    经缓存获取完整分析结果，同一股票同一版本的并发请求只计算一次
+
+    Returns:
+        Dict: StockAnalysisService.get_stock_analysis 的返回值（失败时包含 error）
+    """
+    return await _cached(
+        (stock_code, lookback, timeframe), stock_code,
+        lambda: _compute_analysis(stock_code, lookback, timeframe)
+    )
+
 @router.get("/stock/{stock_code}")
 async def get_stock_analysis(
     stock_code: str,
-    db: Session = Depends(get_db)
+    lookback: int = Query(DEFAULT_LOOKBACK, description="回看K线数量（按分析周期计）", ge=20, le=500),
+    timeframe: str = Query("daily", description="分析周期", pattern=TIMEFRAME_PATTERN)
 ):
     """
     获取股票智能分析结果
     
     Args:
         stock_code: 股票代码
+        lookback: 回看K线数量
+        timeframe: 分析周期 daily/weekly/monthly
         
     Returns:
         包含技术指标、价格预测、交易建议、关键价位的分析结果
@@ -31,11 +120,8 @@ async def get_stock_analysis(
                 content={"success": False, "message": "股票代码格式错误"}
             )
         
-        # 创建分析服务
-        analysis_service = StockAnalysisService()
-        
-        # 获取分析结果
-        result = analysis_service.get_stock_analysis(stock_code)
+        # 获取分析结果（经缓存）
+        result = await get_analysis(stock_code, lookback, timeframe)
         
         if "error" in result:
             return JSONResponse(
@@ -55,20 +141,22 @@ async def get_stock_analysis(
 @router.get("/technical/{stock_code}")
 async def get_technical_indicators(
     stock_code: str,
-    db: Session = Depends(get_db)
+    lookback: int = Query(DEFAULT_LOOKBACK, description="回看K线数量（按分析周期计）", ge=20, le=500),
+    timeframe: str = Query("daily", description="分析周期", pattern=TIMEFRAME_PATTERN)
 ):
     """
     获取股票技术指标
     
     Args:
         stock_code: 股票代码
+        lookback: 回看K线数量
+        timeframe: 分析周期 daily/weekly/monthly
         
     Returns:
         技术指标数据（RSI、MACD、KDJ、布林带）
     """
     try:
-        analysis_service = StockAnalysisService()
-        result = analysis_service.get_stock_analysis(stock_code)
+        result = await get_analysis(stock_code, lookback, timeframe)
         
         if "error" in result:
             return JSONResponse(
@@ -95,21 +183,23 @@ async def get_technical_indicators(
 async def get_price_prediction(
     stock_code: str,
     days: int = Query(30, description="预测天数", ge=1, le=365),
-    db: Session = Depends(get_db)
+    lookback: int = Query(DEFAULT_LOOKBACK, description="回看K线数量（按分析周期计）", ge=20, le=500),
+    timeframe: str = Query("daily", description="分析周期", pattern=TIMEFRAME_PATTERN)
 ):
     """
     获取股票价格预测
     
     Args:
         stock_code: 股票代码
+        lookback: 回看K线数量
+        timeframe: 分析周期 daily/weekly/monthly
         days: 预测天数（1-365天）
         
     Returns:
         价格预测结果
     """
     try:
-        analysis_service = StockAnalysisService()
-        result = analysis_service.get_stock_analysis(stock_code)
+        result = await get_analysis(stock_code, lookback, timeframe)
         
         if "error" in result:
             return JSONResponse(
@@ -135,20 +225,22 @@ async def get_price_prediction(
 @router.get("/recommendation/{stock_code}")
 async def get_trading_recommendation(
     stock_code: str,
-    db: Session = Depends(get_db)
+    lookback: int = Query(DEFAULT_LOOKBACK, description="回看K线数量（按分析周期计）", ge=20, le=500),
+    timeframe: str = Query("daily", description="分析周期", pattern=TIMEFRAME_PATTERN)
 ):
     """
     获取交易建议
     
     Args:
         stock_code: 股票代码
+        lookback: 回看K线数量
+        timeframe: 分析周期 daily/weekly/monthly
         
     Returns:
         交易建议和风险分析
     """
     try:
-        analysis_service = StockAnalysisService()
-        result = analysis_service.get_stock_analysis(stock_code)
+        result = await get_analysis(stock_code, lookback, timeframe)
         
         if "error" in result:
             return JSONResponse(
@@ -174,20 +266,22 @@ async def get_trading_recommendation(
 @router.get("/levels/{stock_code}")
 async def get_key_levels(
     stock_code: str,
-    db: Session = Depends(get_db)
+    lookback: int = Query(DEFAULT_LOOKBACK, description="回看K线数量（按分析周期计）", ge=20, le=500),
+    timeframe: str = Query("daily", description="分析周期", pattern=TIMEFRAME_PATTERN)
 ):
     """
     获取关键价位
     
     Args:
         stock_code: 股票代码
+        lookback: 回看K线数量
+        timeframe: 分析周期 daily/weekly/monthly
         
     Returns:
         支撑位和阻力位
     """
     try:
-        analysis_service = StockAnalysisService()
-        result = analysis_service.get_stock_analysis(stock_code)
+        result = await get_analysis(stock_code, lookback, timeframe)
         
         if "error" in result:
             return JSONResponse(
@@ -213,20 +307,22 @@ async def get_key_levels(
 @router.get("/summary/{stock_code}")
 async def get_analysis_summary(
     stock_code: str,
-    db: Session = Depends(get_db)
+    lookback: int = Query(DEFAULT_LOOKBACK, description="回看K线数量（按分析周期计）", ge=20, le=500),
+    timeframe: str = Query("daily", description="分析周期", pattern=TIMEFRAME_PATTERN)
 ):
     """
     获取分析摘要（简化版）
     
     Args:
         stock_code: 股票代码
+        lookback: 回看K线数量
+        timeframe: 分析周期 daily/weekly/monthly
         
     Returns:
         分析摘要信息
     """
     try:
-        analysis_service = StockAnalysisService()
-        result = analysis_service.get_stock_analysis(stock_code)
+        result = await get_analysis(stock_code, lookback, timeframe)
         
         if "error" in result:
             return JSONResponse(
@@ -268,4 +364,56 @@ async def get_analysis_summary(
         return JSONResponse(
             status_code=500,
             content={"success": False, "message": f"获取分析摘要失败: {str(e)}"}
-        ) 
\ No newline at end of file
+        )
+
+@router.get("/timeframes/{stock_code}")
+async def get_multi_timeframe_analysis(
+    stock_code: str,
+    lookback: int = Query(DEFAULT_LOOKBACK, description="每个周期回看的K线数量", ge=20, le=500),
+    timeframes: str = Query("daily,weekly,monthly", description="逗号分隔的分析周期")
+):
+    """
+    多周期分析：日线只查询一次，周线/月线在内存中合成
+    
+    Args:
+        stock_code: 股票代码
+        lookback: 每个周期回看的K线数量
+        timeframes: 逗号分隔的周期（daily/weekly/monthly）
+        
+    Returns:
+        各周期的技术指标、价格预测、交易建议和关键价位
+    """
+    try:
+        requested = tuple(dict.fromkeys(tf.strip() for tf in timeframes.split(",") if tf.strip()))
+        if not requested or any(tf not in TIMEFRAME_DAYS for tf in requested):
+            return JSONResponse(
+                status_code=400,
+                content={"success": False, "message": f"分析周期错误，可选: {', '.join(TIMEFRAME_DAYS)}"}
+            )
+        
+        result = await _cached(
+            ("timeframes", stock_code, lookback, requested), stock_code,
+            lambda: _compute_timeframes(stock_code, lookback, requested)
+        )
+        
+        if "error" in result:
+            return JSONResponse(
+                status_code=500,
+                content={"success": False, "message": result["error"]}
+            )
+        
+        return JSONResponse(content=result)
+        
+    except Exception as e:
+        logger.error(f"获取多周期分析失败: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"多周期分析失败: {str(e)}"}
+        )
+
+@router.get("/cache_stats")
+async def get_analysis_cache_stats():
+    """
+    查看分析结果缓存的命中率、计算次数和计算耗时
+    """
+    return JSONResponse(content={"success": True, "data": analysis_cache.stats()})
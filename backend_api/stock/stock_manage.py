@@ -5,33 +5,36 @@ from ..database import get_db
 from sqlalchemy.orm import Session
 from fastapi import Depends
 import traceback
-import numpy as np
-import time
-from threading import Lock
 import datetime
-import pandas as pd
 import math
 from ..models import StockRealtimeQuote
+from ..config import QUOTE_FANOUT_CONFIG, AKSHARE_CACHE_CONFIG
+from .cache import TTLCache
+from starlette.concurrency import run_in_threadpool
+from .quote_snapshot import quote_snapshot_cache, RANKING_SORT_MAP
+from backend_core.utils.trading_calendar import get_trading_calendar
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-# 简单内存缓存实现,缓存600秒。
-class DataFrameCache:
-    def __init__(self, expire_seconds=600):
-        self.data = None
-        self.timestamp = 0
-        self.expire = expire_seconds
-        self.lock = Lock()
-    def get(self):
-        with self.lock:
-            if self.data is not None and (time.time() - self.timestamp) < self.expire:
-                return self.data
-            return None
-    def set(self, df):
-        with self.lock:
-            self.data = df
-            self.timestamp = time.time()
+# akshare 接口结果缓存：按键过期 + LRU 淘汰，并发未命中时只回源一次
+akshare_cache = TTLCache(maxsize=AKSHARE_CACHE_CONFIG["maxsize"], name="akshare")
+
+async def cached_akshare(kind, key, func, **kwargs):
+    """
+    经缓存调用 akshare 接口，回源在线程池中执行，不阻塞事件循环
 
-# 创建一个全局缓存实例
-stock_spot_cache = DataFrameCache(expire_seconds=600)
+    Args:
+        kind: 接口类别，对应 AKSHARE_CACHE_CONFIG["ttl"] 中的过期时间
+        key: 请求参数组成的缓存键
+        func: akshare 函数
+        **kwargs: 传给 func 的参数
+    """
+    ttl = AKSHARE_CACHE_CONFIG["ttl"][kind]
+    return await run_in_threadpool(akshare_cache.get_or_load, (kind, key), lambda: func(**kwargs), ttl)
+
+# 批量行情并发拉取使用的共享线程池，限制同时打到上游的请求数
+quote_executor = ThreadPoolExecutor(max_workers=QUOTE_FANOUT_CONFIG["max_workers"], thread_name_prefix="stock_quote")
 
 router = APIRouter(prefix="/api/stock", tags=["stock"])
 
@@ -43,6 +46,93 @@ def safe_float(value):
     except (ValueError, TypeError):
         return None
 
+def fetch_bid_ask_quote(code):
+    """调用 ak.stock_bid_ask_em 获取单只股票的盘口行情，无数据时返回 None"""
+    df = ak.stock_bid_ask_em(symbol=code)
+    if df.empty:
+        return None
+    data_dict = dict(zip(df['item'], df['value']))
+    return {
+        "code": code,
+        "current_price": safe_float(data_dict.get("最新")),
+        "change_amount": safe_float(data_dict.get("涨跌")),
+        "change_percent": safe_float(data_dict.get("涨幅")),
+        "open": safe_float(data_dict.get("今开")),
+        "pre_close": safe_float(data_dict.get("昨收")),
+        "high": safe_float(data_dict.get("最高")),
+        "low": safe_float(data_dict.get("最低")),
+        "volume": safe_float(data_dict.get("总手")),
+        "turnover": safe_float(data_dict.get("金额")),
+    }
+
+class QuoteQueueTimeout(Exception):
+    """线程池繁忙，排队超时仍未开始执行"""
+
+async def _fetch_in_pool(fetch, code, timeout, queue_timeout):
+    """
+    在共享线程池中执行 fetch(code)，超时从线程开始执行时算起，排队时间单独限制
+    排队超时的请求直接从线程池队列中取消；已开始执行的调用超时后线程仍会执行完
+    """
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+    # 线程开始执行和排队超时放弃在锁内二选一，已开始的调用不会被报为排队超时
+    state = {"started": False, "abandoned": False}
+    state_lock = threading.Lock()
+
+    def run():
+        with state_lock:
+            if state["abandoned"]:
+                return None
+            state["started"] = True
+        loop.call_soon_threadsafe(started.set)
+        return fetch(code)
+
+    future = loop.run_in_executor(quote_executor, run)
+    try:
+        await asyncio.wait_for(started.wait(), queue_timeout)
+    except asyncio.TimeoutError:
+        with state_lock:
+            if not state["started"]:
+                state["abandoned"] = True
+        if state["abandoned"]:
+            future.cancel()
+            raise QuoteQueueTimeout()
+    return await asyncio.wait_for(future, timeout)
+
+async def fetch_bid_ask_quotes(codes, fetch=fetch_bid_ask_quote, timeout=None, queue_timeout=None):
+    """
+    在共享线程池上并发拉取多只股票行情，单只超时或失败不影响其余结果
+
+    Args:
+        timeout: 单只股票的执行超时（秒），排队等待线程的时间不计入
+        queue_timeout: 单只股票最长排队时间（秒）
+
+    Returns:
+        (行情列表, 错误列表)，行情按请求顺序排列，错误项形如 {"code": ..., "error": ...}
+    """
+    timeout = timeout or QUOTE_FANOUT_CONFIG["timeout_seconds"]
+    queue_timeout = queue_timeout or QUOTE_FANOUT_CONFIG["queue_timeout_seconds"]
+    outcomes = await asyncio.gather(
+        *(_fetch_in_pool(fetch, code, timeout, queue_timeout) for code in codes),
+        return_exceptions=True
+    )
+    result, errors = [], []
+    for code, outcome in zip(codes, outcomes):
+        if isinstance(outcome, QuoteQueueTimeout):
+            print(f"[stock_quote] 获取 {code} 行情排队超时，线程池繁忙")
+            errors.append({"code": code, "error": "busy"})
+        elif isinstance(outcome, asyncio.TimeoutError):
+            print(f"[stock_quote] 获取 {code} 行情超时")
+            errors.append({"code": code, "error": "timeout"})
+        elif isinstance(outcome, Exception):
+            print(f"[stock_quote] 获取 {code} 行情异常: {outcome}")
+            errors.append({"code": code, "error": str(outcome)})
+        elif outcome is None:
+            errors.append({"code": code, "error": "no_data"})
+        else:
+            result.append(outcome)
+    return result, errors
+
 @router.post("/quote")
 async def get_stock_quote(request: Request):
     """
@@ -57,6 +147,7 @@ async def get_stock_quote(request: Request):
             print("[stock_quote] 缺少股票代码")
             return JSONResponse({"success": False, "message": "缺少股票代码"}, status_code=400)
         result = []
+        errors = []
         today = datetime.date.today()
         # 如果是周六或周日，从数据库获取
         if today.weekday() in (5, 6):
@@ -77,29 +168,9 @@ async def get_stock_quote(request: Request):
                     })
             db.close()
         else:
-            for code in codes:
-                try:
-                    df = ak.stock_bid_ask_em(symbol=code)
-                    if df.empty:
-                        continue
-                    data_dict = dict(zip(df['item'], df['value']))
-                    result.append({
-                        "code": code,
-                        "current_price": safe_float(data_dict.get("最新")),
-                        "change_amount": safe_float(data_dict.get("涨跌")),
-                        "change_percent": safe_float(data_dict.get("涨幅")),
-                        "open": safe_float(data_dict.get("今开")),
-                        "pre_close": safe_float(data_dict.get("昨收")),
-                        "high": safe_float(data_dict.get("最高")),
-                        "low": safe_float(data_dict.get("最低")),
-                        "volume": safe_float(data_dict.get("总手")),
-                        "turnover": safe_float(data_dict.get("金额")),
-                    })
-                except Exception as e:
-                    print(f"[stock_quote] 获取 {code} 行情异常: {e}")
-                    continue
+            result, errors = await fetch_bid_ask_quotes(codes)
         print(f"[stock_quote] 返回数据: {result}")
-        return JSONResponse({"success": True, "data": result})
+        return JSONResponse({"success": True, "data": result, "errors": errors})
     except Exception as e:
         print(f"[stock_quote] 异常: {e}")
         return JSONResponse({"success": False, "message": str(e)}, status_code=500)
@@ -174,74 +245,16 @@ def get_quote_board_list(
     try:
         print(f"📊 获取A股行情排行 (from DB): type={ranking_type}, market={market}, page={page}, page_size={page_size}")
         
-        # 1. 从数据库读取数据到 pandas DataFrame
-        db = next(get_db())
-        df = pd.read_sql_query("SELECT * FROM stock_realtime_quote WHERE change_percent IS NOT NULL", db.bind)
-        db.close()
-
-        # 2. 市场类型过滤
-        if market != 'all':
-            if market == 'sh':
-                df = df[df['code'].str.startswith('6')]
-            elif market == 'sz':
-                df = df[df['code'].str.startswith('0') | df['code'].str.startswith('3')] # 深市包含主板和创业板
-            elif market == 'cy':
-                df = df[df['code'].str.startswith('3')]
-            elif market == 'bj':
-                df = df[df['code'].str.startswith('8') | df['code'].str.startswith('4')] # 北交所
-        
-        # 3. 排行类型排序
-        sort_column_map = {
-            'rise': ('change_percent', False),
-            'fall': ('change_percent', True),
-            'volume': ('volume', False),
-            'turnover_rate': ('turnover_rate', False)
-        }
-        
-        if ranking_type in sort_column_map:
-            col, ascending = sort_column_map[ranking_type]
-            df = df.sort_values(by=col, ascending=ascending)
-        else:
+        if ranking_type not in RANKING_SORT_MAP:
             return JSONResponse({'success': False, 'message': '无效的排行类型'}, status_code=400)
 
-        # 4. 字段重命名和格式化
-        df = df.replace({np.nan: None})
-        
-        field_rename_map = {
-            'code': 'code',
-            'name': 'name',
-            'current_price': 'current',
-            # 'change' is not in db, can be calculated if needed
-            'change_percent': 'change_percent',
-            'open': 'open',
-            'pre_close': 'pre_close',
-            'high': 'high',
-            'low': 'low',
-            'volume': 'volume',
-            'amount': 'turnover',
-            'turnover_rate': 'rate',
-            'pe_dynamic': 'pe_dynamic',
-            'pb_ratio': 'pb',
-            'total_market_value': 'market_cap',
-            'circulating_market_value': 'circulating_market_cap'
-        }
-        
-        # Select and rename columns
-        df_selected = df[list(field_rename_map.keys())].rename(columns=field_rename_map)
-
-        # Calculate 'change' if possible
-        if 'current' in df_selected.columns and 'pre_close' in df_selected.columns:
-            df_selected['change'] = (df_selected['current'] - df_selected['pre_close']).round(2)
-        else:
-            df_selected['change'] = None
-
-        # 5. 分页
-        total = len(df_selected)
-        start = (page - 1) * page_size
-        end = start + page_size
-        df_page = df_selected.iloc[start:end]
-        
-        data = df_page.to_dict(orient='records')
+        # 进程内快照缓存，只有采集器写入新快照时才重新读表；排序下标已预先算好，分页只是切片
+        db = next(get_db())
+        try:
+            snapshot = quote_snapshot_cache.get(db)
+        finally:
+            db.close()
+        data, total = snapshot.page(ranking_type, market, page, page_size)
         data = clean_nan(data)
         
         print(f"✅ 成功获取 {len(data)} 条A股排行数据 (总数: {total})")
@@ -261,7 +274,7 @@ async def get_realtime_quote_by_code(code: str = Query(None, description="股票
         print("[realtime_quote_by_code] 缺少参数")
         return JSONResponse({"success": False, "message": "缺少股票代码参数code"}, status_code=400)
     try:
-        df = ak.stock_bid_ask_em(symbol=code)
+        df = await cached_akshare("realtime_quote", code, ak.stock_bid_ask_em, symbol=code)
         if df.empty:
             print(f"[realtime_quote_by_code] 未找到股票代码: {code}")
             return JSONResponse({"success": False, "message": f"未找到股票代码: {code}"}, status_code=404)
@@ -314,16 +327,12 @@ async def get_minute_data_by_code(code: str = Query(None, description="股票代
         print(f"[minute_data_by_code] 缺少参数code")
         return JSONResponse({"success": False, "message": "缺少股票代码参数code"}, status_code=400)
     try:
-        trade_dates = ak.tool_trade_date_hist_sina()['trade_date'].tolist()
-        trade_dates_str = [d.strftime('%Y-%m-%d') for d in trade_dates]
-        print(f"[minute_data_by_code] 交易日历: {trade_dates_str[:10]} ... 共{len(trade_dates_str)}天")
+        calendar = get_trading_calendar()
         today = datetime.date.today()
-        today_str = today.strftime('%Y-%m-%d')
         # 如果今天不是交易日，则取最近一个交易日的分钟数据
-        if today_str not in trade_dates_str:
+        if not calendar.is_trading_day(today):
             today = today - datetime.timedelta(days=1)
-            today_str = today.strftime('%Y-%m-%d')
-        is_trading_day = today_str in trade_dates_str
+        is_trading_day = calendar.is_trading_day(today)
         print(f"[minute_data_by_code] 今日是否交易日: {is_trading_day}")
         result = []
         if is_trading_day:
@@ -402,7 +411,10 @@ async def get_kline_hist(
         # 日期格式化为YYYYMMDD
         start_date_fmt = start_date.replace('-', '') if start_date else None
         end_date_fmt = end_date.replace('-', '') if end_date else None
-        df = ak.stock_zh_a_hist(symbol=code, period=period, start_date=start_date_fmt, end_date=end_date_fmt, adjust=adjust)
+        df = await cached_akshare(
+            "kline_hist", (code, period, start_date_fmt, end_date_fmt, adjust),
+            ak.stock_zh_a_hist, symbol=code, period=period, start_date=start_date_fmt, end_date=end_date_fmt, adjust=adjust
+        )
         if df is None or df.empty:
             print(f"[kline_hist] 未找到股票代码: {code}")
             return JSONResponse({"success": False, "message": f"未找到股票代码: {code}"}, status_code=404)
@@ -463,7 +475,10 @@ async def get_kline_min_hist(
         # 1分钟线不支持复权，adjust传空
         ak_adjust = '' if period == '1' else adjust
         print(f"[kline_min_hist] 调用ak，symbol={code}, period={period}, start={start_dt_fmt}, end={end_dt_fmt}, adjust={ak_adjust}")
-        df = ak.stock_zh_a_hist_min_em(symbol=code, period=period, start_date=start_dt_fmt, end_date=end_dt_fmt, adjust=ak_adjust)
+        df = await cached_akshare(
+            "kline_min_hist", (code, period, start_dt_fmt, end_dt_fmt, ak_adjust),
+            ak.stock_zh_a_hist_min_em, symbol=code, period=period, start_date=start_dt_fmt, end_date=end_dt_fmt, adjust=ak_adjust
+        )
         if df is None or df.empty:
             print(f"[kline_min_hist] 未找到股票代码: {code}")
             return JSONResponse({"success": False, "message": f"未找到股票代码: {code}"}, status_code=404)
@@ -509,7 +524,7 @@ async def get_latest_financial(code: str = Query(..., description="股票代码"
     try:
         print(f"[latest_financial] 请求参数: code={code}")
         import pandas as pd
-        df = ak.stock_financial_abstract(symbol=code)
+        df = await cached_akshare("latest_financial", code, ak.stock_financial_abstract, symbol=code)
         print(f"[latest_financial] 获取到原始数据: {df.shape if df is not None else None}")
         if df is None or df.empty:
             print(f"[latest_financial] 未获取到财务数据")
@@ -593,7 +608,10 @@ async def get_financial_indicator_list(
             indicator = "按单季度"
         else:
             indicator = "按报告期"
-        df = ak.stock_financial_abstract_ths(symbol=symbol, indicator=indicator)
+        df = await cached_akshare(
+            "financial_indicator_list", (symbol, indicator),
+            ak.stock_financial_abstract_ths, symbol=symbol, indicator=indicator
+        )
         print(f"[financial_indicator_list] 原始数据列: {df.columns.tolist()}")
         if df is None or df.empty:
             return JSONResponse({"success": False, "message": "未获取到财务数据"}, status_code=404)
@@ -619,6 +637,14 @@ async def get_financial_indicator_list(
         return JSONResponse({"success": False, "message": str(e)}, status_code=500)
 
 
+@router.get("/cache_stats")
+async def get_cache_stats():
+    """
+    查看 akshare 接口缓存的命中、未命中、淘汰等统计
+    """
+    return JSONResponse({"success": True, "data": akshare_cache.stats()})
+
+
 def clean_nan(obj):
     if isinstance(obj, float) and (math.isnan(obj) or math.isinf(obj)):
         return None
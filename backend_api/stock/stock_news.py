@@ -1,21 +1,49 @@
 from fastapi import APIRouter, Query, Request, Depends, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, Response
 import akshare as ak
-from ..database import get_db
+from ..database import session_scope, SessionLocal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..config import NEWS_COMBINED_CONFIG
 from sqlalchemy.orm import Session
 import traceback
 import datetime
 import pandas as pd
-import difflib
 import time
 import aiohttp
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from ..models import StockNoticeReport, StockNews, StockResearchReport
+from .news_dedup import DEFAULT_THRESHOLD, NewsDeduplicator
+from .stock_profile import stock_profile_cache
+from .pdf_cache import PdfDownloadError, pdf_cache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/stock", tags=["stock_news"])
 
+# 保存新闻时与最近几天已保存的标题做近似去重
+NEWS_DEDUP_DAYS = 7
+
+# 资讯各数据源（akshare 接口、公告查询）共用的线程池，阻塞调用不占用事件循环
+news_executor = ThreadPoolExecutor(max_workers=NEWS_COMBINED_CONFIG["max_workers"], thread_name_prefix="stock_news")
+
+# 研报接口单独的线程池：上游限流时重试等待较长，不挤占股票名称、新闻、公告的线程
+research_executor = ThreadPoolExecutor(max_workers=NEWS_COMBINED_CONFIG["research_workers"], thread_name_prefix="stock_research")
+
+# 资讯落库的后台写入队列：单线程按提交顺序写入，接口返回前不等待
+persist_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="news_persist")
+
+def _log_persist_error(future):
+    error = future.exception()
+    if error is not None:
+        print(f"[news_persist] 后台写入失败: {error}")
+
+def enqueue_persist(func, *args):
+    """把写库任务放进后台队列，失败只记录日志"""
+    persist_executor.submit(func, *args).add_done_callback(_log_persist_error)
+
 def clean_nan(obj):
     """清理NaN和inf值"""
     import math
@@ -123,53 +151,37 @@ def is_news_related_to_stock(title: str, content: str, stock_info: dict) -> bool
         # 出现异常时返回False，避免显示无关新闻
         return False
 
-def calculate_similarity(title1, title2):
-    """计算两个标题的相似度"""
-    if not title1 or not title2:
-        return 0.0
-    return difflib.SequenceMatcher(None, title1, title2).ratio()
+def get_source_priority(item):
+    """来源优先级（数值越小越优先）：东方财富 > 财经/证券类媒体 > 其他来源"""
+    source = (item.get('source', '') or '').lower()
+    if '东方财富' in source:
+        return 1  # 最高优先级
+    elif '财经' in source or '证券' in source:
+        return 2  # 财经类媒体次优先
+    else:
+        return 3  # 其他来源最低优先级
 
-def deduplicate_news(news_list, similarity_threshold=0.8):
+def deduplicate_news(news_list, similarity_threshold=DEFAULT_THRESHOLD, existing_titles=None):
     """
     新闻去重函数
-    优先保留东方财富网的新闻，相似度超过阈值的新闻只保留一条
+    优先保留东方财富网的新闻，标题相似度（字符二元组 Jaccard）达到阈值的新闻只保留一条；
+    用 MinHash/LSH 索引查找相似标题，不再两两比较
+
+    Args:
+        news_list: 待去重的新闻/公告/研报
+        similarity_threshold: 相似度阈值
+        existing_titles: 已保存的标题，与其相似的新闻同样视为重复
     """
     if not news_list:
         return news_list
     
-    # 按来源优先级排序：东方财富 > 其他来源
-    def get_source_priority(item):
-        source = item.get('source', '').lower()
-        if '东方财富' in source:
-            return 1  # 最高优先级
-        elif '财经' in source or '证券' in source:
-            return 2  # 财经类媒体次优先
-        else:
-            return 3  # 其他来源最低优先级
-    
-    # 先按时间倒序，再按来源优先级排序
-    sorted_news = sorted(news_list, key=lambda x: (x.get('publish_time', ''), get_source_priority(x)), reverse=True)
+    # 同一时间的新闻按来源优先级保留
+    sorted_news = sorted(news_list, key=lambda x: (x.get('publish_time', ''), -get_source_priority(x)), reverse=True)
     
-    unique_news = []
-    processed_titles = []
-    
-    for news_item in sorted_news:
-        title = news_item.get('title', '')
-        if not title:
-            continue
-            
-        # 检查是否与已处理的标题相似
-        is_duplicate = False
-        for processed_title in processed_titles:
-            similarity = calculate_similarity(title, processed_title)
-            if similarity >= similarity_threshold:
-                is_duplicate = True
-                print(f"[deduplicate_news] 发现重复新闻: '{title}' 与 '{processed_title}' 相似度: {similarity:.2f}")
-                break
-        
-        if not is_duplicate:
-            unique_news.append(news_item)
-            processed_titles.append(title)
+    deduplicator = NewsDeduplicator(similarity_threshold)
+    if existing_titles:
+        deduplicator.add_many(existing_titles)
+    unique_news = deduplicator.deduplicate(sorted_news)
     
     print(f"[deduplicate_news] 去重前: {len(news_list)} 条，去重后: {len(unique_news)} 条")
     return unique_news
@@ -187,7 +199,7 @@ def init_stock_research_table():
 
 async def _get_research_data(symbol: str, limit: int = 20) -> list:
     """
-    获取研报数据的内部函数
+    获取研报数据的内部函数（在资讯线程池中执行，不阻塞事件循环）
     
     Args:
         symbol: 股票代码
@@ -196,14 +208,23 @@ async def _get_research_data(symbol: str, limit: int = 20) -> list:
     Returns:
         list: 研报数据列表
     """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(research_executor, _fetch_research_data, symbol, limit)
+
+def _fetch_research_data(symbol: str, limit: int = 20, deadline: float = None) -> list:
+    """
+    同步获取研报数据，上游失败时按退避时间重试
+    
+    Args:
+        symbol: 股票代码
+        limit: 研报数量限制
+        deadline: 截止时间（time.monotonic()），等待后会超过截止时间时不再重试，及时释放线程
+    """
     research_data = []
     
     try:
         print(f"[_get_research_data] 开始获取{symbol}的研报数据...")
         
-        # 添加延迟避免请求过于频繁
-        time.sleep(2)  # 增加延迟到2秒
-        
         # 尝试获取研报数据，如果失败则重试
         max_retries = 3
         retry_count = 0
@@ -230,6 +251,10 @@ async def _get_research_data(symbol: str, limit: int = 20) -> list:
                 else:
                     wait_time = retry_count * 5   # 5秒、10秒、15秒
                 
+                if deadline is not None and time.monotonic() + wait_time >= deadline:
+                    print(f"[_get_research_data] 重试将超过截止时间，返回空数据")
+                    research_df = None
+                    break
                 if retry_count < max_retries:
                     print(f"[_get_research_data] 等待{wait_time}秒后重试...")
                     time.sleep(wait_time)
@@ -321,6 +346,104 @@ async def _get_research_data(symbol: str, limit: int = 20) -> list:
     
     return research_data
 
+def _fetch_news_frame(symbol: str):
+    """东方财富个股新闻原始数据"""
+    return ak.stock_news_em(symbol=symbol)
+
+def _build_news_items(news_df, stock_info: dict) -> list:
+    """把新闻原始数据转换成统一格式，只保留与该股票相关的新闻"""
+    news_items = []
+    if news_df is None or news_df.empty:
+        return news_items
+    print(f"[stock_news_combined] AkShare返回{len(news_df)}条原始新闻数据")
+    
+    for _, row in news_df.iterrows():
+        title = row.get('新闻标题', '') or row.get('标题', '') or ''
+        content = row.get('新闻内容', '') or row.get('内容', '') or ''
+        
+        # 检查新闻是否与该股票相关
+        if not is_news_related_to_stock(title, content, stock_info):
+            continue
+            
+        publish_time = row.get('发布时间', '') or row.get('时间', '')
+        if pd.isna(publish_time):
+            publish_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        else:
+            if hasattr(publish_time, 'strftime'):
+                publish_time = publish_time.strftime('%Y-%m-%d %H:%M:%S')
+            else:
+                publish_time = str(publish_time)
+        
+        news_items.append({
+            "id": f"news_{row.get('序号', '')}" or f"news_{len(news_items)}",
+            "title": title,
+            "content": content,
+            "keywords": row.get('关键词', '') or '',
+            "publish_time": publish_time,
+            "source": row.get('文章来源', '') or '东方财富',
+            "url": row.get('新闻链接', '') or '',
+            "summary": row.get('摘要', '') or '',
+            "type": "news"
+        })
+    
+    print(f"[stock_news_combined] 过滤后保留{len(news_items)}条相关新闻")
+    return news_items
+
+def _fetch_announcements(symbol: str, limit: int) -> list:
+    """从数据库读取公告并转换成统一格式"""
+    with session_scope() as db:
+        announcements = db.query(StockNoticeReport).filter(StockNoticeReport.code == symbol).order_by(StockNoticeReport.publish_date.desc()).limit(limit).all()
+        announcement_data = [row.to_dict() for row in announcements]
+    
+    if announcement_data:
+        print(f"[stock_news_combined] 从数据库获取到公告数据: {len(announcement_data)} 条")
+    else:
+        print(f"[stock_news_combined] 未从数据库获取到公告数据")
+    
+    announcement_items = []
+    for row in announcement_data:
+        publish_time = row.get('publish_date', '')
+        if not publish_time:
+            publish_time = datetime.datetime.now().strftime('%Y-%m-%d')
+        else:
+            if hasattr(publish_time, 'strftime'):
+                publish_time = publish_time.strftime('%Y-%m-%d')
+            else:
+                publish_time = str(publish_time)
+        
+        announcement_items.append({
+            "id": f"ann_{row.get('id', '')}" or f"ann_{len(announcement_items)}",
+            "title": row.get('notice_title', '') or '',
+            "content": row.get('notice_title', '') or '',  # 使用公告标题作为内容
+            "keywords": row.get('notice_type', '') or '',
+            "publish_time": publish_time,
+            "source": "上市公司公告",
+            "url": row.get('url', '') or '',
+            "summary": row.get('notice_title', '') or '',
+            "type": "announcement"
+        })
+    return announcement_items
+
+async def _fetch_source(source: str, timeout: float, default, func, *args, executor=None):
+    """
+    在线程池中获取一个数据源，超时或出错时返回默认值，不影响其他数据源
+    超时后线程仍会把当前调用执行完，耗时可能较长的数据源需要自行按截止时间退出
+
+    Args:
+        executor: 使用的线程池，默认 news_executor
+
+    Returns:
+        (数据, 是否成功)
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(executor or news_executor, func, *args), timeout), True
+    except asyncio.TimeoutError:
+        print(f"[stock_news_combined] 获取{source}超时（{timeout}秒），跳过该数据源")
+    except Exception as e:
+        print(f"[stock_news_combined] 获取{source}失败: {e}")
+    return default, False
+
 @router.get("/news_combined")
 async def get_stock_news_combined(
     symbol: str = Query(..., description="股票代码"),
@@ -330,109 +453,27 @@ async def get_stock_news_combined(
 ):
     """
     获取指定股票代码的综合资讯数据（新闻+公告+研报）
+    各数据源并发获取，单个数据源超时或失败时跳过，结果写库放到后台队列
     """
     try:
         print(f"[stock_news_combined] 获取综合资讯: symbol={symbol}")
+        start = time.time()
+        timeouts = NEWS_COMBINED_CONFIG["timeout_seconds"]
+        
+        # 股票名称（用于新闻过滤）、新闻、公告、研报同时获取，总耗时取决于最慢的数据源
+        (stock_name, _), (news_df, news_ok), (announcement_data, announcement_ok), (research_data, research_ok) = await asyncio.gather(
+            _fetch_source("股票名称", timeouts["stock_name"], "", stock_profile_cache.get_name, symbol),
+            _fetch_source("新闻数据", timeouts["news"], None, _fetch_news_frame, symbol),
+            _fetch_source("公告数据", timeouts["announcement"], [], _fetch_announcements, symbol, announcement_limit),
+            _fetch_source("研报数据", timeouts["research"], [], _fetch_research_data, symbol, research_limit,
+                          time.monotonic() + timeouts["research"], executor=research_executor),
+        )
+        failed_sources = [name for name, ok in (("news", news_ok), ("announcement", announcement_ok), ("research", research_ok)) if not ok]
         
-        all_data = []
-        
-        # 获取股票基本信息用于新闻过滤
-        stock_name = await get_stock_name(symbol)
         stock_info = {"name": stock_name, "code": symbol}
-        
-        # 获取新闻数据
-        try:
-            news_df = ak.stock_news_em(symbol=symbol)
-            if news_df is not None and not news_df.empty:
-                print(f"[stock_news_combined] AkShare返回{len(news_df)}条原始新闻数据")
-                
-                # 过滤新闻 - 只保留与该股票相关的新闻
-                filtered_news_count = 0
-                for _, row in news_df.iterrows():
-                    title = row.get('新闻标题', '') or row.get('标题', '') or ''
-                    content = row.get('新闻内容', '') or row.get('内容', '') or ''
-                    
-                    # 检查新闻是否与该股票相关
-                    if not is_news_related_to_stock(title, content, stock_info):
-                        continue
-                        
-                    filtered_news_count += 1
-                    publish_time = row.get('发布时间', '') or row.get('时间', '')
-                    if pd.isna(publish_time):
-                        publish_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    else:
-                        if hasattr(publish_time, 'strftime'):
-                            publish_time = publish_time.strftime('%Y-%m-%d %H:%M:%S')
-                        else:
-                            publish_time = str(publish_time)
-                    
-                    news_item = {
-                        "id": f"news_{row.get('序号', '')}" or f"news_{len(all_data)}",
-                        "title": title,
-                        "content": content,
-                        "keywords": row.get('关键词', '') or '',
-                        "publish_time": publish_time,
-                        "source": row.get('文章来源', '') or '东方财富',
-                        "url": row.get('新闻链接', '') or '',
-                        "summary": row.get('摘要', '') or '',
-                        "type": "news"
-                    }
-                    all_data.append(news_item)
-                
-                print(f"[stock_news_combined] 过滤后保留{filtered_news_count}条相关新闻")
-        except Exception as e:
-            print(f"[stock_news_combined] 获取新闻数据失败: {e}")
-        
-        # 获取公告数据
-        try:
-            # 直接连接SQLite数据库获取公告数据
-            db = next(get_db())
-            
-            # 公告数据查询示例（替换原sqlite3公告查询）
-            announcements = db.query(StockNoticeReport).filter(StockNoticeReport.code == symbol).order_by(StockNoticeReport.publish_date.desc()).limit(announcement_limit).all()
-            announcement_data = [row.to_dict() for row in announcements]
-            
-            if announcement_data:
-                print(f"[stock_news_combined] 从数据库获取到公告数据: {len(announcement_data)} 条")
-                for i, row in enumerate(announcement_data[:3]):
-                    print(f"  第{i+1}条: {dict(row)}")
-            else:
-                print(f"[stock_news_combined] 未从数据库获取到公告数据")
-            
-            if announcement_data:
-                for row in announcement_data:
-                    publish_time = row.get('publish_date', '')
-                    if not publish_time:
-                        publish_time = datetime.datetime.now().strftime('%Y-%m-%d')
-                    else:
-                        if hasattr(publish_time, 'strftime'):
-                            publish_time = publish_time.strftime('%Y-%m-%d')
-                        else:
-                            publish_time = str(publish_time)
-                    
-                    announcement_item = {
-                        "id": f"ann_{row.get('id', '')}" or f"ann_{len(all_data)}",
-                        "title": row.get('notice_title', '') or '',
-                        "content": row.get('notice_title', '') or '',  # 使用公告标题作为内容
-                        "keywords": row.get('notice_type', '') or '',
-                        "publish_time": publish_time,
-                        "source": "上市公司公告",
-                        "url": row.get('url', '') or '',
-                        "summary": row.get('notice_title', '') or '',
-                        "type": "announcement"
-                    }
-                    all_data.append(announcement_item)
-        except Exception as e:
-            print(f"[stock_news_combined] 获取公告数据失败: {e}")
-        
-        # 获取研报数据 - 调用独立的研报获取逻辑
-        try:
-            research_data = await _get_research_data(symbol=symbol, limit=research_limit)
-            if research_data:
-                all_data.extend(research_data)
-                print(f"[stock_news_combined] 从研报数据获取到 {len(research_data)} 条研报数据")
-        except Exception as e:
-            print(f"[stock_news_combined] 获取研报数据失败: {e}")
+        all_data = _build_news_items(news_df, stock_info) + announcement_data + research_data
+        if research_data:
+            print(f"[stock_news_combined] 从研报数据获取到 {len(research_data)} 条研报数据")
         
         # 去重处理 - 在合并后统一去重，这样可以跨类型去重
         all_data = deduplicate_news(all_data)
@@ -461,177 +502,171 @@ async def get_stock_news_combined(
         # 清理数据
         filtered_data = clean_nan(filtered_data)
         
-        # 保存到数据库
-        await save_news_to_db(symbol, filtered_data)
+        # 保存到数据库（后台队列，不阻塞响应）
+        enqueue_persist(save_news_to_db, symbol, filtered_data)
         
-        print(f"[stock_news_combined] 成功返回 {len(filtered_data)} 条综合资讯数据 (新闻:{news_count}, 公告:{announcement_count}, 研报:{research_count})")
-        return JSONResponse({"success": True, "data": filtered_data, "total": len(filtered_data)})
+        print(f"[stock_news_combined] 成功返回 {len(filtered_data)} 条综合资讯数据 (新闻:{news_count}, 公告:{announcement_count}, 研报:{research_count}), 耗时 {time.time() - start:.2f}s")
+        return JSONResponse({"success": True, "data": filtered_data, "total": len(filtered_data), "failed_sources": failed_sources})
         
     except Exception as e:
         print(f"[stock_news_combined] 获取综合资讯异常: {e}")
         print(traceback.format_exc())
         return JSONResponse({"success": False, "message": f"获取综合资讯失败: {str(e)}"}, status_code=500)
 
-async def save_news_to_db(symbol: str, news_data: list):
-    """保存新闻数据到数据库"""
+# 资讯写库依赖 models 中声明的唯一约束（由 migrate_db.py 建立），冲突的行由 ON CONFLICT DO NOTHING 跳过
+NEWS_UNIQUE_COLUMNS = ['stock_code', 'title', 'publish_time']
+RESEARCH_UNIQUE_COLUMNS = ['stock_code', 'report_name', 'report_date']
+
+def _parse_time(value, default: datetime.datetime) -> datetime.datetime:
+    """
+    解析发布时间/报告日期；取不到时用首次抓取的当天代替
+    唯一约束中的列不能为 NULL，否则 NULL 之间互不冲突，同一条数据每次都会重复写入
+    """
+    if isinstance(value, datetime.datetime):
+        return value
+    try:
+        return datetime.datetime.fromisoformat(str(value).strip())
+    except (TypeError, ValueError):
+        return default
+
+def _insert_new_rows(db, model, rows: list, conflict_columns: list) -> int:
+    """
+    一条 INSERT ... ON CONFLICT DO NOTHING RETURNING id 写入整批数据
+
+    Returns:
+        int: 实际写入的行数（与已有数据冲突的行不计入）
+    """
+    if not rows:
+        return 0
+    insert = sqlite_insert if db.bind.dialect.name == 'sqlite' else pg_insert
+    stmt = (insert(model.__table__).values(rows)
+            .on_conflict_do_nothing(index_elements=conflict_columns)
+            .returning(model.__table__.c.id))
+    return len(db.execute(stmt).fetchall())
+
+def save_news_to_db(symbol: str, news_data: list):
+    """保存新闻数据到数据库（由后台写入队列执行），整批一条 INSERT ... ON CONFLICT DO NOTHING"""
+    db = SessionLocal()
     try:
-        db = next(get_db())
-        
         # 先删除该股票的旧数据（保持当日最新）
         today = datetime.date.today().strftime('%Y-%m-%d')
         db.query(StockNews).filter(StockNews.stock_code == symbol, StockNews.created_at >= today).delete()
         
-        # 插入新数据
-        saved_count = 0
-        skipped_count = 0
+        # 近几天已保存的标题一次性装入去重索引（今天的数据上面已删除，会整体重新写入）
+        since = datetime.date.today() - datetime.timedelta(days=NEWS_DEDUP_DAYS)
+        stored_titles = db.query(StockNews.title).filter(StockNews.stock_code == symbol, StockNews.created_at >= since).all()
+        deduplicator = NewsDeduplicator()
+        deduplicator.add_many(title for (title,) in stored_titles)
         
+        # 在内存中组装整批数据，与已保存的新闻标题相同或相似的跳过
+        now = datetime.datetime.now()
+        first_seen = datetime.datetime.combine(now.date(), datetime.time())
+        rows = []
         for item in news_data:
-            try:
-                # 检查是否已存在相同的新闻
-                existing_news = db.query(StockNews).filter(
-                    StockNews.stock_code == symbol,
-                    StockNews.title == item.get('title', ''),
-                    StockNews.publish_time == item.get('publish_time', '')
-                ).first()
-                
-                if existing_news:
-                    print(f"[DEBUG] 跳过重复新闻: {item.get('title', '')} (已存在)")
-                    skipped_count += 1
-                    continue
-                
-                news_obj = StockNews(
-                    stock_code=symbol,
-                    title=item.get('title', ''),
-                    content=item.get('content', ''),
-                    keywords=item.get('keywords', ''),
-                    publish_time=item.get('publish_time', ''),
-                    source=item.get('source', ''),
-                    url=item.get('url', ''),
-                    summary=item.get('summary', ''),
-                    type=item.get('type', 'news'),
-                    rating=item.get('rating', ''),
-                    target_price=item.get('target_price', ''),
-                    created_at=datetime.datetime.now()
-                )
-                # 不设置id字段，让数据库自动生成
-                db.add(news_obj)
-                saved_count += 1
-                
-            except Exception as e:
-                print(f"[save_news_to_db] 保存单条新闻数据失败: {e}")
+            if deduplicator.find_duplicate(item.get('title', '')):
                 continue
-        
+            rows.append({
+                'stock_code': symbol,
+                'title': item.get('title', ''),
+                'content': item.get('content', ''),
+                'keywords': item.get('keywords', ''),
+                'publish_time': _parse_time(item.get('publish_time'), first_seen),
+                'source': item.get('source', ''),
+                'url': item.get('url', ''),
+                'summary': item.get('summary', ''),
+                'type': item.get('type', 'news'),
+                'rating': item.get('rating', ''),
+                'target_price': item.get('target_price', ''),
+                'created_at': now,
+            })
+        
+        saved_count = _insert_new_rows(db, StockNews, rows, NEWS_UNIQUE_COLUMNS)
         db.commit()
+        skipped_count = len(news_data) - saved_count
         print(f"[save_news_to_db] 成功保存 {saved_count}/{len(news_data)} 条数据到数据库，跳过 {skipped_count} 条重复数据")
+        return saved_count, skipped_count
         
     except Exception as e:
         print(f"[save_news_to_db] 保存数据到数据库失败: {e}")
         print(traceback.format_exc())
         db.rollback()
         raise
+    finally:
+        db.close()
+
+def _research_rows(symbol: str, research_data: list, profile: dict) -> list:
+    """把研报数据组装成待写入的行"""
+    stock_name = profile['name'] or ""
+    now = datetime.datetime.now()
+    first_seen = datetime.datetime.combine(now.date(), datetime.time())
+    rows = []
+    for i, item in enumerate(research_data):
+        report_name = (item.get('title', '') or '').strip()
+        
+        # 允许默认标题但添加序号
+        if not report_name:
+            report_name = f"研报_{symbol}_{i+1}"
+        elif report_name in ['研报标题', '暂无研报标题']:
+            report_name = f"{report_name}_{symbol}_{i+1}"
+        
+        dongcai_rating = (item.get('rating', '') or '').strip()
+        institution = (item.get('source', '') or '').strip()
+        report_date_str = item.get('publish_time', '').split(' ')[0] if item.get('publish_time') else ''
+        pdf_url = (item.get('url', '') or '').strip()
+        
+        rows.append({
+            'stock_code': symbol,
+            'stock_name': stock_name,
+            'report_name': report_name,
+            'dongcai_rating': dongcai_rating if dongcai_rating and dongcai_rating != '未评级' else None,
+            'institution': institution if institution and institution != '研究机构' else None,
+            'monthly_report_count': item.get('monthly_count', len(research_data)),
+            'profit_2024': item.get('profit_2024', None),
+            'pe_2024': item.get('pe_2024', None),
+            'profit_2025': item.get('profit_2025', None),
+            'pe_2025': item.get('pe_2025', None),
+            'profit_2026': item.get('profit_2026', None),
+            'pe_2026': item.get('pe_2026', None),
+            'industry': item.get('industry', '') or profile['industry'] or "",
+            'report_date': _parse_time(report_date_str, first_seen),
+            'pdf_url': pdf_url if pdf_url else None,
+            'updated_at': now,
+        })
+    return rows
+
+def _write_research_rows(rows: list) -> int:
+    """整批写入研报，已存在的 (股票代码, 报告名称, 报告日期) 跳过，返回实际写入条数"""
+    db = SessionLocal()
+    try:
+        saved_count = _insert_new_rows(db, StockResearchReport, rows, RESEARCH_UNIQUE_COLUMNS)
+        db.commit()
+        return saved_count
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
 async def save_research_reports_to_db(symbol: str, research_data: list):
-    """保存研报信息到个股研报信息表"""
+    """保存研报信息到个股研报信息表，整批一条 INSERT ... ON CONFLICT DO NOTHING"""
     try:
         # 确保表已创建
         init_stock_research_table()
         
-        db = next(get_db())
-        
-        # 获取股票名称（从其他表或API获取）
-        stock_name = await get_stock_name(symbol)
+        # 股票名称和行业取自个股档案缓存，整批研报只取一次
+        loop = asyncio.get_running_loop()
+        profile = await loop.run_in_executor(news_executor, stock_profile_cache.get, symbol)
         
-        # 获取近一个月研报数
-        monthly_count = len(research_data)
-        
-        saved_count = 0
-        skipped_count = 0
-        
-        for i, item in enumerate(research_data):
-            try:
-                # 提取和处理各字段
-                report_name = item.get('title', '').strip()
-                
-                # 调试信息
-                print(f"[DEBUG] 第{i+1}条研报: title='{report_name}', rating='{item.get('rating', '')}', source='{item.get('source', '')}'")
-                
-                # 修改过滤条件 - 允许默认标题但添加序号
-                if not report_name:
-                    report_name = f"研报_{symbol}_{i+1}"
-                elif report_name in ['研报标题', '暂无研报标题']:
-                    report_name = f"{report_name}_{symbol}_{i+1}"
-                
-                dongcai_rating = item.get('rating', '').strip()
-                institution = item.get('source', '').strip()
-                report_date_str = item.get('publish_time', '').split(' ')[0] if item.get('publish_time') else ''
-                pdf_url = item.get('url', '').strip()
-                
-                # 检查是否已存在相同的研报
-                existing_report = db.query(StockResearchReport).filter(
-                    StockResearchReport.stock_code == symbol,
-                    StockResearchReport.report_name == report_name,
-                    StockResearchReport.report_date == report_date_str
-                ).first()
-                
-                if existing_report:
-                    print(f"[DEBUG] 跳过重复研报: {report_name} (已存在)")
-                    skipped_count += 1
-                    continue
-                
-                print(f"[DEBUG] 准备保存研报: {report_name}")
-                
-                # 直接从研报数据中获取盈利预测信息
-                profit_2024 = item.get('profit_2024', None)
-                pe_2024 = item.get('pe_2024', None)
-                profit_2025 = item.get('profit_2025', None)
-                pe_2025 = item.get('pe_2025', None)
-                profit_2026 = item.get('profit_2026', None)
-                pe_2026 = item.get('pe_2026', None)
-                
-                # 直接从研报数据中获取行业信息
-                industry = item.get('industry', '') or await get_stock_industry(symbol)
-                
-                # 获取近一月研报数
-                monthly_count = item.get('monthly_count', len(research_data))
-                
-                # 插入新数据
-                research_obj = StockResearchReport(
-                    stock_code=symbol,
-                    stock_name=stock_name,
-                    report_name=report_name,
-                    dongcai_rating=dongcai_rating if dongcai_rating and dongcai_rating != '未评级' else None,
-                    institution=institution if institution and institution != '研究机构' else None,
-                    monthly_report_count=monthly_count,
-                    profit_2024=profit_2024,
-                    pe_2024=pe_2024,
-                    profit_2025=profit_2025,
-                    pe_2025=pe_2025,
-                    profit_2026=profit_2026,
-                    pe_2026=pe_2026,
-                    industry=industry,
-                    report_date=report_date_str if report_date_str else None,
-                    pdf_url=pdf_url if pdf_url else None,
-                    updated_at=datetime.datetime.now()
-                )
-                # 不设置id字段，让数据库自动生成
-                db.add(research_obj)
-                
-                saved_count += 1
-                print(f"[DEBUG] 成功保存第{i+1}条研报: {report_name}")
-                
-            except Exception as e:
-                print(f"[save_research_reports_to_db] 保存第{i+1}条研报数据失败: {e}")
-                print(f"[DEBUG] 失败的研报数据: {item}")
-                continue
-        
-        db.commit()
+        rows = _research_rows(symbol, research_data, profile)
+        saved_count = await loop.run_in_executor(news_executor, _write_research_rows, rows)
+        skipped_count = len(research_data) - saved_count
         print(f"[save_research_reports_to_db] 成功保存 {saved_count}/{len(research_data)} 条研报数据到数据库，跳过 {skipped_count} 条重复数据")
+        return saved_count, skipped_count
         
     except Exception as e:
         print(f"[save_research_reports_to_db] 保存研报数据到数据库失败: {e}")
         import traceback
         traceback.print_exc()
-        db.rollback()
         raise
 
 def extract_profit_forecast(summary: str, year: str):
@@ -657,13 +692,8 @@ def extract_profit_forecast(summary: str, year: str):
 async def get_stock_name(symbol: str) -> str:
     """获取股票名称"""
     try:
-        # 尝试从AkShare获取股票基本信息
-        stock_info = ak.stock_individual_info_em(symbol=symbol)
-        if stock_info is not None and not stock_info.empty:
-            # 查找股票名称字段
-            name_row = stock_info[stock_info['item'] == '股票简称']
-            if not name_row.empty:
-                return str(name_row['value'].iloc[0]).strip()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(news_executor, stock_profile_cache.get_name, symbol)
     except Exception as e:
         print(f"[get_stock_name] 获取股票名称失败: {e}")
     
@@ -672,13 +702,8 @@ async def get_stock_name(symbol: str) -> str:
 async def get_stock_industry(symbol: str) -> str:
     """获取股票行业信息"""
     try:
-        # 尝试从AkShare获取股票基本信息
-        stock_info = ak.stock_individual_info_em(symbol=symbol)
-        if stock_info is not None and not stock_info.empty:
-            # 查找行业字段
-            industry_row = stock_info[stock_info['item'] == '所处行业']
-            if not industry_row.empty:
-                return str(industry_row['value'].iloc[0]).strip()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(news_executor, stock_profile_cache.get_industry, symbol)
     except Exception as e:
         print(f"[get_stock_industry] 获取股票行业失败: {e}")
     
@@ -715,69 +740,37 @@ async def get_research_reports(
 
 @router.get("/download_pdf")
 async def download_pdf_proxy(
+    request: Request,
     url: str = Query(..., description="PDF文件URL"),
     filename: str = Query(None, description="下载文件名")
 ):
     """
     代理下载PDF文件，解决前端跨域问题
+    文件缓存在本地磁盘，同一研报只回源一次，之后直接从磁盘返回（支持 Range 断点续传和 ETag 协商缓存）
     """
     try:
-        # 设置请求头，模拟浏览器访问
+        path, stat_result = await pdf_cache.fetch(url)
+        etag = pdf_cache.etag(path, stat_result)
         headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'application/pdf,application/octet-stream,*/*',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
+            'ETag': etag,
+            'Cache-Control': 'private, max-age=86400',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'Content-Disposition, Content-Range, ETag'
         }
+        if etag in request.headers.get('if-none-match', ''):
+            return Response(status_code=304, headers=headers)
+        
+        return FileResponse(
+            path,
+            media_type='application/pdf',
+            filename=filename or pdf_cache.filename(url),
+            stat_result=stat_result,
+            headers=headers
+        )
         
-        # 使用aiohttp获取PDF文件
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, timeout=30) as response:
-                if response.status != 200:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail=f"无法获取PDF文件，状态码: {response.status}"
-                    )
-                
-                # 检查内容类型
-                content_type = response.headers.get('content-type', '')
-                if 'pdf' not in content_type.lower() and 'octet-stream' not in content_type.lower():
-                    # 如果不是PDF，可能是错误页面，检查内容
-                    content_preview = await response.text()
-                    if len(content_preview) < 10000 and ('error' in content_preview.lower() or 'access denied' in content_preview.lower()):
-                        raise HTTPException(status_code=400, detail="访问被拒绝或文件不存在")
-                
-                # 设置下载文件名
-                if not filename:
-                    # 从URL或响应头中提取文件名
-                    content_disposition = response.headers.get('content-disposition', '')
-                    if 'filename=' in content_disposition:
-                        filename = content_disposition.split('filename=')[1].strip('"\'')
-                    else:
-                        filename = url.split('/')[-1]
-                        if not filename.endswith('.pdf'):
-                            filename = "研报.pdf"
-                
-                # 流式返回PDF内容
-                async def generate():
-                    while True:
-                        chunk = await response.content.read(8192)
-                        if not chunk:
-                            break
-                        yield chunk
-                
-                return StreamingResponse(
-                    generate(),
-                    media_type='application/pdf',
-                    headers={
-                        'Content-Disposition': f'attachment; filename="{filename}"',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Expose-Headers': 'Content-Disposition'
-                    }
-                )
-                
+    except PdfDownloadError as e:
+        logger.error(f"下载PDF失败: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except aiohttp.ClientError as e:
         logger.error(f"下载PDF失败: {e}")
         raise HTTPException(status_code=400, detail=f"网络请求失败: {str(e)}")
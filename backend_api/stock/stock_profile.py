@@ -0,0 +1,180 @@
+"""
+个股档案缓存
+名称、行业、总股本和流通股本优先从 stock_basic_info 读取，内存中再加一层 LRU（TTLCache）；
+库里没有该股票、缺少行业，或档案超过 stale_days 天未更新时才回源 ak.stock_individual_info_em，
+回源结果写回 stock_basic_info。启动时可整表预热，资讯和研报请求不再每次访问上游
+"""
+
+import datetime
+from typing import Dict, List, Optional
+
+import akshare as ak
+from sqlalchemy import text
+
+from ..config import STOCK_PROFILE_CONFIG
+from ..database import session_scope
+from .cache import TTLCache
+
+# ak.stock_individual_info_em 的 item -> 档案字段
+AKSHARE_PROFILE_ITEMS = {
+    '股票简称': 'name',
+    '行业': 'industry',
+    '所处行业': 'industry',
+    '总股本': 'total_share',
+    '流通股': 'float_share',
+}
+
+PROFILE_FIELDS = ['name', 'industry', 'total_share', 'float_share', 'profile_updated_at']
+
+# total_share / float_share 单位为股（akshare 原始股数），tushare 历史行情按此单位计算换手率
+
+# stock_basic_info 由采集器建表，档案相关的列在这里按需补齐
+ENSURE_PROFILE_COLUMNS_SQL = """
+    ALTER TABLE stock_basic_info
+        ADD COLUMN IF NOT EXISTS industry TEXT,
+        ADD COLUMN IF NOT EXISTS total_share REAL,
+        ADD COLUMN IF NOT EXISTS float_share REAL,
+        ADD COLUMN IF NOT EXISTS profile_updated_at TIMESTAMP
+"""
+
+SELECT_PROFILE_SQL = f"SELECT code, {', '.join(PROFILE_FIELDS)} FROM stock_basic_info"
+
+UPSERT_PROFILE_SQL = """
+    INSERT INTO stock_basic_info (code, name, industry, total_share, float_share, profile_updated_at)
+    VALUES (:code, :name, :industry, :total_share, :float_share, :profile_updated_at)
+    ON CONFLICT (code) DO UPDATE SET
+        name = COALESCE(NULLIF(EXCLUDED.name, ''), stock_basic_info.name),
+        industry = COALESCE(NULLIF(EXCLUDED.industry, ''), stock_basic_info.industry),
+        total_share = COALESCE(EXCLUDED.total_share, stock_basic_info.total_share),
+        float_share = COALESCE(EXCLUDED.float_share, stock_basic_info.float_share),
+        profile_updated_at = EXCLUDED.profile_updated_at
+"""
+
+
+def empty_profile(symbol: str) -> Dict:
+    return {'code': symbol, 'name': '', 'industry': '', 'total_share': None, 'float_share': None, 'profile_updated_at': None}
+
+
+def fetch_akshare_profile(symbol: str) -> Dict:
+    """从 ak.stock_individual_info_em 取个股档案，取不到的字段为空"""
+    profile = empty_profile(symbol)
+    stock_info = ak.stock_individual_info_em(symbol=symbol)
+    if stock_info is None or stock_info.empty:
+        return profile
+    for item, value in zip(stock_info['item'], stock_info['value']):
+        field = AKSHARE_PROFILE_ITEMS.get(str(item).strip())
+        if field is None or value is None:
+            continue
+        if field in ('total_share', 'float_share'):
+            try:
+                profile[field] = float(value)
+            except (TypeError, ValueError):
+                pass
+        else:
+            profile[field] = str(value).strip()
+    return profile
+
+
+class StockProfileCache:
+    """个股档案的两级缓存：内存 LRU -> stock_basic_info -> akshare"""
+
+    def __init__(self, maxsize: int = STOCK_PROFILE_CONFIG["maxsize"], ttl: float = STOCK_PROFILE_CONFIG["ttl"],
+                 stale_days: int = STOCK_PROFILE_CONFIG["stale_days"], fetcher=fetch_akshare_profile):
+        """
+        Args:
+            maxsize: 内存中最多缓存的股票数量
+            ttl: 内存缓存过期时间（秒），过期后重新读库
+            stale_days: 库中档案超过该天数未更新时回源刷新
+            fetcher: 回源函数，symbol -> 档案 dict
+        """
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, name="stock_profile")
+        self.stale_after = datetime.timedelta(days=stale_days)
+        self.fetcher = fetcher
+        self._columns_ready = False
+
+    def _ensure_columns(self, db):
+        if not self._columns_ready:
+            db.execute(text(ENSURE_PROFILE_COLUMNS_SQL))
+            db.commit()
+            self._columns_ready = True
+
+    def _read_stored(self, symbol: Optional[str] = None) -> List[Dict]:
+        """读取库中的档案，symbol 为空时读取全部"""
+        with session_scope() as db:
+            self._ensure_columns(db)
+            if symbol is None:
+                rows = db.execute(text(SELECT_PROFILE_SQL)).mappings().all()
+            else:
+                rows = db.execute(text(SELECT_PROFILE_SQL + " WHERE code = :code"), {"code": symbol}).mappings().all()
+        return [{**empty_profile(str(row['code'])), **{k: v for k, v in row.items() if v is not None}} for row in rows]
+
+    def _write_stored(self, profile: Dict):
+        with session_scope() as db:
+            self._ensure_columns(db)
+            db.execute(text(UPSERT_PROFILE_SQL), {key: profile[key] for key in ['code'] + PROFILE_FIELDS})
+            db.commit()
+
+    def is_stale(self, profile: Dict) -> bool:
+        updated_at = profile.get('profile_updated_at')
+        return (not profile.get('name') or not profile.get('industry') or updated_at is None
+                or datetime.datetime.now() - updated_at > self.stale_after)
+
+    def _load(self, symbol: str) -> Dict:
+        """读库，缺失或过期时回源并写回；库和上游都取不到时抛出异常（不缓存）"""
+        stored = None
+        try:
+            rows = self._read_stored(symbol)
+            stored = rows[0] if rows else None
+        except Exception as e:
+            print(f"[stock_profile] 读取 stock_basic_info 失败: {e}")
+        if stored is not None and not self.is_stale(stored):
+            return stored
+
+        try:
+            remote = self.fetcher(symbol)
+        except Exception as e:
+            if stored is None:
+                raise
+            print(f"[stock_profile] 刷新 {symbol} 档案失败，继续使用库中数据: {e}")
+            return stored
+
+        profile = dict(stored or empty_profile(symbol))
+        profile.update({k: v for k, v in remote.items() if v not in (None, '')})
+        profile['profile_updated_at'] = datetime.datetime.now()
+        try:
+            self._write_stored(profile)
+        except Exception as e:
+            print(f"[stock_profile] 写回 {symbol} 档案失败: {e}")
+        return profile
+
+    def get(self, symbol: str) -> Dict:
+        """个股档案，取不到时返回各字段为空的档案"""
+        try:
+            return self.cache.get_or_load(symbol, lambda: self._load(symbol))
+        except Exception as e:
+            print(f"[stock_profile] 获取 {symbol} 档案失败: {e}")
+            return empty_profile(symbol)
+
+    def get_name(self, symbol: str) -> str:
+        return self.get(symbol)['name'] or ""
+
+    def get_industry(self, symbol: str) -> str:
+        return self.get(symbol)['industry'] or ""
+
+    def warm(self) -> int:
+        """
+        一次查询把库中未过期的档案装入内存，过期或不完整的档案留到首次访问时回源
+
+        Returns:
+            int: 装入的股票数量
+        """
+        count = 0
+        for profile in self._read_stored():
+            if not self.is_stale(profile):
+                self.cache.set(profile['code'], profile)
+                count += 1
+        print(f"[stock_profile] 档案缓存预热完成: {count} 只股票")
+        return count
+
+
+stock_profile_cache = StockProfileCache()
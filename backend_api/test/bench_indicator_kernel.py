@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技术指标内核微基准：对比逐点循环实现与向量化内核的单只股票耗时，以及全市场二维批量计算耗时
+
+运行: python backend_api/test/bench_indicator_kernel.py
+"""
+
+import sys
+import os
+import timeit
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock import indicator_kernel
+from backend_api.stock.market_indicators import MarketBars, compute_market_indicators
+
+
+def loop_ema(x, period):
+    alpha = 2 / (period + 1)
+    out = np.zeros_like(x)
+    out[0] = x[0]
+    for i in range(1, len(x)):
+        out[i] = alpha * x[i] + (1 - alpha) * out[i - 1]
+    return out
+
+
+def loop_indicators(highs, lows, closes):
+    """原 TechnicalIndicators 的逐点循环写法（MACD + KDJ + 布林带 + RSI）"""
+    macd_line = loop_ema(closes, 12) - loop_ema(closes, 26)
+    loop_ema(macd_line, 9)
+    highest = pd.Series(highs).rolling(9).max()
+    lowest = pd.Series(lows).rolling(9).min()
+    rsv = 100 * (closes - lowest) / (highest - lowest)
+    k = d = 50.0
+    for i in range(len(rsv)):
+        if not np.isnan(rsv[i]):
+            k = (2 / 3) * k + (1 / 3) * rsv[i]
+            d = (2 / 3) * d + (1 / 3) * k
+    np.mean(closes[-20:]), np.std(closes[-20:])
+    deltas = np.diff(closes)
+    np.mean(np.where(deltas > 0, deltas, 0)[-14:])
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'bars':>6} {'loop(ms)':>10} {'kernel(ms)':>11} {'speedup':>8}")
+    for bars in (250, 5000):
+        closes = 20 + np.cumsum(rng.normal(0, 0.4, bars))
+        highs = closes + rng.uniform(0, 0.5, bars)
+        lows = closes - rng.uniform(0, 0.5, bars)
+        number = 200 if bars <= 250 else 20
+        loop_ms = min(timeit.repeat(lambda: loop_indicators(highs, lows, closes), number=number, repeat=3)) / number * 1000
+        kernel_ms = min(timeit.repeat(lambda: indicator_kernel.compute_indicators(highs, lows, closes), number=number, repeat=3)) / number * 1000
+        print(f"{bars:>6} {loop_ms:>10.3f} {kernel_ms:>11.3f} {loop_ms / kernel_ms:>7.1f}x")
+
+    print(f"\n{'stocks':>6} {'bars':>6} {'per-stock(s)':>13} {'batch(s)':>9}")
+    stocks, bars = 5000, 250
+    closes = 20 + np.cumsum(rng.normal(0, 0.4, (stocks, bars)), axis=1)
+    highs = closes + rng.uniform(0, 0.5, (stocks, bars))
+    lows = closes - rng.uniform(0, 0.5, (stocks, bars))
+    # 约 5% 的股票历史不足（新股），走逐行路径
+    short = rng.random(stocks) < 0.05
+    for matrix in (highs, lows, closes):
+        matrix[short, :bars // 2] = np.nan
+    market = MarketBars([f"{i:06d}" for i in range(stocks)], highs, lows, closes)
+    per_stock = min(timeit.repeat(
+        lambda: [indicator_kernel.compute_indicators(highs[i], lows[i], closes[i]) for i in range(stocks)],
+        number=1, repeat=2))
+    batch = min(timeit.repeat(lambda: compute_market_indicators(market), number=1, repeat=3))
+    print(f"{stocks:>6} {bars:>6} {per_stock:>13.3f} {batch:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
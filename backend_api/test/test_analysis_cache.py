@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+智能分析结果缓存测试：同一版本并发请求只计算一次，版本变化重新计算，失败结果不缓存
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from backend_api import database
+from backend_api.stock import stock_analysis_routes
+from backend_api.stock.cache import TTLCache
+
+
+class FakeVersion:
+    """替代 _analysis_version，返回 (最新日线日期, 实时行情更新时间, 指标快照更新时间)"""
+
+    def __init__(self, version):
+        self.version = version
+
+    def __call__(self, stock_code):
+        return self.version
+
+
+def install(monkeypatch, compute, version):
+    cache = TTLCache(maxsize=8, ttl=60, name="stock_analysis")
+    monkeypatch.setattr(stock_analysis_routes, "analysis_cache", cache)
+    monkeypatch.setattr(stock_analysis_routes, "_compute_analysis", compute)
+    monkeypatch.setattr(stock_analysis_routes, "_analysis_version", version)
+    return cache
+
+
+def test_parallel_sub_routes_share_one_computation(monkeypatch):
+    calls = []
+
+    def compute(code, *args):
+        calls.append(code)
+        time.sleep(0.05)
+        return {"success": True, "data": {"code": code}}
+
+    version = FakeVersion(("2024-06-03", "2024-06-04 10:00:00", "2024-06-03 18:00:00"))
+    cache = install(monkeypatch, compute, version)
+
+    async def fire():
+        return await asyncio.gather(*[stock_analysis_routes.get_analysis("600519") for _ in range(6)])
+
+    results = asyncio.run(fire())
+    assert calls == ["600519"]
+    assert all(r["data"]["code"] == "600519" for r in results)
+    assert cache.stats()["loads"] == 1
+
+    # 实时行情更新后版本变化，重新计算
+    version.version = ("2024-06-03", "2024-06-04 10:15:00", "2024-06-03 18:00:00")
+    asyncio.run(stock_analysis_routes.get_analysis("600519"))
+    assert len(calls) == 2
+
+
+def test_failed_analysis_is_not_cached(monkeypatch):
+    calls = []
+
+    def compute(code, *args):
+        calls.append(code)
+        raise stock_analysis_routes._AnalysisFailed({"error": "无法获取历史数据"})
+
+    install(monkeypatch, compute, FakeVersion((None, None, None)))
+    for _ in range(2):
+        assert asyncio.run(stock_analysis_routes.get_analysis("000001")) == {"error": "无法获取历史数据"}
+    assert len(calls) == 2
+
+
+def test_version_includes_indicator_snapshot(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'version.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE historical_quotes (code TEXT, date TEXT)"))
+        conn.execute(text("CREATE TABLE stock_realtime_quote (code TEXT PRIMARY KEY, update_time TEXT)"))
+        conn.execute(text("INSERT INTO historical_quotes VALUES ('600519', '2024-06-03')"))
+        conn.execute(text("INSERT INTO stock_realtime_quote VALUES ('600519', '2024-06-03 15:00:00')"))
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+
+    # 快照表尚未建立
+    assert stock_analysis_routes._analysis_version("600519") == ("2024-06-03", "2024-06-03 15:00:00", None)
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE stock_indicator_snapshot (code TEXT PRIMARY KEY, updated_at TEXT)"))
+        conn.execute(text("INSERT INTO stock_indicator_snapshot VALUES ('600519', '2024-06-02 18:00:00')"))
+    before = stock_analysis_routes._analysis_version("600519")
+    # 收盘后日线和行情都不再变化，只有快照刷新
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE stock_indicator_snapshot SET updated_at = '2024-06-03 18:00:00'"))
+    after = stock_analysis_routes._analysis_version("600519")
+    assert before[:2] == after[:2] and before != after
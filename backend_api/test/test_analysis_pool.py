@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+智能分析连接池压力测试：200 个并发分析请求下连接池占用不超过上限，请求结束后全部归还
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api import database
+from backend_api.config import DATABASE_CONFIG
+from backend_api.stock import stock_analysis_routes
+from backend_api.stock.cache import TTLCache
+
+STOCKS = 200
+
+
+def make_engine(path):
+    """与生产配置相同大小的连接池，借出超时设短，泄漏会直接表现为超时"""
+    engine = create_engine(
+        f"sqlite:///{path}",
+        poolclass=QueuePool,
+        pool_size=DATABASE_CONFIG["pool_size"],
+        max_overflow=DATABASE_CONFIG["max_overflow"],
+        pool_timeout=3,
+        connect_args={"check_same_thread": False},
+    )
+    rng = np.random.default_rng(0)
+    dates = [d.strftime("%Y-%m-%d") for d in pd.bdate_range("2024-01-02", periods=60)]
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE historical_quotes (
+                code TEXT, name TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL,
+                volume REAL, amount REAL, change_percent REAL, change REAL, turnover_rate REAL
+            )
+        """))
+        conn.execute(text("CREATE TABLE stock_realtime_quote (code TEXT PRIMARY KEY, current_price REAL, update_time TEXT)"))
+        rows, quotes = [], []
+        for i in range(STOCKS):
+            code = f"{600000 + i}"
+            closes = 10 + np.cumsum(rng.normal(0, 0.2, len(dates)))
+            for d, c in zip(dates, closes):
+                rows.append({"code": code, "name": code, "date": d, "open": c, "high": c + 0.2, "low": c - 0.2,
+                             "close": c, "volume": 1000.0, "amount": 1e4, "cp": 0.0, "ch": 0.0, "tr": 1.0})
+            quotes.append({"code": code, "price": float(closes[-1]), "ts": "2024-03-25 15:00:00"})
+        conn.execute(text("""
+            INSERT INTO historical_quotes VALUES
+            (:code, :name, :date, :open, :high, :low, :close, :volume, :amount, :cp, :ch, :tr)
+        """), rows)
+        conn.execute(text("INSERT INTO stock_realtime_quote VALUES (:code, :price, :ts)"), quotes)
+    return engine
+
+
+def test_pool_stays_flat_under_concurrent_analysis(tmp_path, monkeypatch):
+    engine = make_engine(tmp_path / "analysis.db")
+    usage = {"current": 0, "peak": 0}
+    lock = threading.Lock()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(*args):
+        with lock:
+            usage["current"] += 1
+            usage["peak"] = max(usage["peak"], usage["current"])
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(*args):
+        with lock:
+            usage["current"] -= 1
+
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    monkeypatch.setattr(stock_analysis_routes, "analysis_cache", TTLCache(maxsize=1024, ttl=60, name="stock_analysis"))
+
+    codes = [f"{600000 + i}" for i in range(STOCKS)]
+
+    async def fire():
+        return await asyncio.gather(*[stock_analysis_routes.get_analysis(code) for code in codes])
+
+    results = asyncio.run(fire())
+
+    assert all(r.get("success") for r in results), [r for r in results if not r.get("success")][:1]
+    assert results[0]["data"]["current_price"] > 0
+    assert usage["peak"] <= DATABASE_CONFIG["pool_size"] + DATABASE_CONFIG["max_overflow"]
+    # 所有连接都已归还连接池
+    assert usage["current"] == 0
+    assert engine.pool.checkedout() == 0
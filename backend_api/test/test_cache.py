@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内TTL缓存测试
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry_and_lru_eviction():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=1)
+    assert cache.get("a") == 1  # a 变为最近使用
+    cache.set("c", 3)           # 淘汰最久未使用的 b
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    clock.now = 11
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["expirations"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 2
+
+
+def test_concurrent_misses_load_once():
+    cache = TTLCache(maxsize=8, ttl=60)
+    calls = []
+    gate = threading.Event()
+
+    def loader():
+        calls.append(1)
+        gate.wait(1)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+    assert results == ["value"] * 8
+    assert cache.stats()["coalesced"] == 7
+    assert cache.get_or_load("k", loader) == "value"
+    assert calls == [1]
+
+
+def test_loader_error_is_not_cached_and_invalidate_all():
+    cache = TTLCache(maxsize=8, ttl=60)
+
+    def failing():
+        raise RuntimeError("upstream down")
+
+    try:
+        cache.get_or_load("k", failing)
+        assert False, "应抛出异常"
+    except RuntimeError:
+        pass
+    assert cache.get_or_load("k", lambda: 1) == 1
+    cache.invalidate_all()
+    assert cache.get_or_load("k", lambda: 2) == 2
+    assert cache.stats()["load_errors"] == 1
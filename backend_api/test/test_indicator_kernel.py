@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技术指标向量化内核测试：与逐点循环的参考实现对比
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock import indicator_kernel
+from backend_api.stock.stock_analysis import TechnicalIndicators
+
+
+def make_bars(n, seed=7):
+    rng = np.random.default_rng(seed)
+    closes = 20 + np.cumsum(rng.normal(0, 0.4, n))
+    highs = closes + rng.uniform(0, 0.5, n)
+    lows = closes - rng.uniform(0, 0.5, n)
+    return highs, lows, closes
+
+
+def loop_ema(x, period):
+    alpha = 2 / (period + 1)
+    out = np.zeros(len(x))
+    out[0] = x[0]
+    for i in range(1, len(x)):
+        out[i] = alpha * x[i] + (1 - alpha) * out[i - 1]
+    return out
+
+
+def loop_wilder_rsi(x, period=14):
+    deltas = np.diff(x)
+    gains = np.clip(deltas, 0, None)
+    losses = np.clip(-deltas, 0, None)
+    avg_gain, avg_loss = gains[:period].mean(), losses[:period].mean()
+    for g, l in zip(gains[period:], losses[period:]):
+        avg_gain = (avg_gain * (period - 1) + g) / period
+        avg_loss = (avg_loss * (period - 1) + l) / period
+    return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def test_ema_matches_loop_on_long_series():
+    _, _, closes = make_bars(5000)
+    for period in (2, 12, 26, 60):
+        np.testing.assert_allclose(indicator_kernel.ema(closes, period), loop_ema(closes, period), rtol=1e-9)
+
+
+def test_rsi_uses_wilder_smoothing():
+    _, _, closes = make_bars(300)
+    series = indicator_kernel.rsi(closes)
+    assert np.isnan(series[:14]).all()
+    np.testing.assert_allclose(series[-1], loop_wilder_rsi(closes), rtol=1e-9)
+    assert indicator_kernel.rsi(np.arange(1, 30, dtype=float))[-1] == 100.0
+
+
+def test_kdj_matches_loop_and_skips_flat_windows():
+    highs, lows, closes = make_bars(120)
+    highs[40:55] = lows[40:55] = closes[40:55] = 10.0  # 价格不变的窗口 RSV 无效
+    highest = pd.Series(highs).rolling(9).max().to_numpy()
+    lowest = pd.Series(lows).rolling(9).min().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = 100 * (closes - lowest) / (highest - lowest)
+    k = d = 50.0
+    for value in rsv:
+        if np.isfinite(value):
+            k = (2 / 3) * k + (1 / 3) * value
+            d = (2 / 3) * d + (1 / 3) * k
+    series = indicator_kernel.kdj(highs, lows, closes)
+    np.testing.assert_allclose([series["k"][-1], series["d"][-1]], [k, d], rtol=1e-9)
+    assert np.isnan(series["k"][:8]).all()
+    assert not np.isnan(series["k"][8:]).any()
+
+
+def test_bollinger_and_ma_match_pandas():
+    _, _, closes = make_bars(200)
+    bb = indicator_kernel.bollinger_bands(closes)
+    rolling = pd.Series(closes).rolling(20)
+    np.testing.assert_allclose(bb["middle"][19:], rolling.mean().to_numpy()[19:], rtol=1e-9)
+    np.testing.assert_allclose(bb["upper"][19:], (rolling.mean() + 2 * rolling.std(ddof=0)).to_numpy()[19:], rtol=1e-9)
+    np.testing.assert_allclose(indicator_kernel.sma(closes, 5)[4:], pd.Series(closes).rolling(5).mean().to_numpy()[4:], rtol=1e-9)
+
+
+def test_latest_values_match_scalar_api():
+    highs, lows, closes = make_bars(60)
+    latest = TechnicalIndicators.latest(TechnicalIndicators.calculate_series(highs, lows, closes))
+    assert latest["rsi"] == TechnicalIndicators.calculate_rsi(list(closes))
+    assert latest["macd"] == TechnicalIndicators.calculate_macd(list(closes))
+    assert latest["kdj"] == TechnicalIndicators.calculate_kdj(list(highs), list(lows), list(closes))
+    assert latest["bb"] == TechnicalIndicators.calculate_bollinger_bands(list(closes))
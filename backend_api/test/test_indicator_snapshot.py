@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标快照测试：快照中的收盘后结论与逐只股票现算的结果一致
+"""
+
+import sys
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock.market_indicators import MarketBars
+from backend_api.stock.indicator_snapshot import SNAPSHOT_BARS, SNAPSHOT_COLUMNS, build_snapshot_rows
+from backend_api.stock.stock_analysis import StockAnalysisService
+
+
+def make_market(lengths, seed=5):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i, n in enumerate(lengths):
+        closes = 10 + np.cumsum(rng.normal(0, 0.3, n))
+        frame = pd.DataFrame({
+            'code': f'{300000 + i}',
+            'date': pd.date_range('2024-01-01', periods=n, freq='B').date,
+            'high': closes + rng.uniform(0, 0.3, n),
+            'low': closes - rng.uniform(0, 0.3, n),
+            'close': closes,
+            'volume': rng.integers(1000, 5000, n).astype(float),
+        })
+        frame['rn'] = np.arange(n, 0, -1)
+        frames.append(frame[frame['rn'] <= SNAPSHOT_BARS])
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_snapshot_rows_match_per_stock_analysis():
+    df = make_market([90, 60, 25, 8])
+    rows = build_snapshot_rows(MarketBars.from_frame(df, SNAPSHOT_BARS))
+    assert len(rows) == 4
+
+    for values in rows:
+        row = dict(zip(SNAPSHOT_COLUMNS, values))
+        stock = df[df['code'] == row['code']].sort_values('rn', ascending=False)
+        historical_data = stock[['high', 'low', 'close', 'volume']].to_dict(orient='records')
+        close = float(stock['close'].iloc[-1])
+        indicators = StockAnalysisService.calculate_indicators(historical_data)
+        expected = StockAnalysisService.build_analysis(historical_data, close, indicators)
+
+        assert row['date'] == stock['date'].iloc[-1]
+        assert json.loads(row['indicators']) == indicators
+        assert json.loads(row['price_prediction']) == expected['price_prediction']
+        assert json.loads(row['key_levels']) == expected['key_levels']
+        assert json.loads(row['trading_recommendation']) == expected['trading_recommendation']
+        assert json.loads(row['bars'])['close'] == stock['close'].tolist()
+        if len(stock) < 60:
+            assert row['ma60'] is None
+
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def fetchone(self):
+        return self.row
+
+
+class FakeSession:
+    def __init__(self, row):
+        self.row = row
+
+    def execute(self, *args, **kwargs):
+        return FakeResult(self.row)
+
+
+def test_service_serves_snapshot_with_realtime_price():
+    df = make_market([60])
+    values = dict(zip(SNAPSHOT_COLUMNS, build_snapshot_rows(MarketBars.from_frame(df, SNAPSHOT_BARS))[0]))
+    row = (json.loads(values['bars']), json.loads(values['indicators']), json.loads(values['price_prediction']), 11.5,
+           values['date'], values['date'])
+
+    service = StockAnalysisService(FakeSession(row))
+    result = service.get_stock_analysis(values['code'])
+
+    historical_data = df.sort_values('rn', ascending=False)[['high', 'low', 'close', 'volume']].to_dict(orient='records')
+    expected = StockAnalysisService.build_analysis(historical_data, 11.5, StockAnalysisService.calculate_indicators(historical_data))
+    data = result['data']
+    assert data['current_price'] == 11.5
+    for key in ('technical_indicators', 'price_prediction', 'trading_recommendation', 'key_levels'):
+        assert data[key] == expected[key]
+
+
+class LiveOnlyService(StockAnalysisService):
+    """记录是否走了现算路径"""
+
+    live_calls = 0
+
+    def _get_history_with_price(self, stock_code, days=60):
+        self.live_calls += 1
+        return [{'high': 10.5, 'low': 9.5, 'close': 10.0, 'volume': 1000.0}] * 60, 10.0
+
+
+def test_service_falls_back_when_snapshot_is_stale():
+    df = make_market([60])
+    values = dict(zip(SNAPSHOT_COLUMNS, build_snapshot_rows(MarketBars.from_frame(df, SNAPSHOT_BARS))[0]))
+    row = (json.loads(values['bars']), json.loads(values['indicators']), json.loads(values['price_prediction']), 11.5,
+           values['date'], '2099-01-02')
+
+    service = LiveOnlyService(FakeSession(row))
+    result = service.get_stock_analysis(values['code'])
+
+    assert service.live_calls == 1
+    assert result['data']['current_price'] == 10.0
+
+    current = LiveOnlyService(FakeSession(row[:5] + (values['date'],)))
+    current.get_stock_analysis(values['code'])
+    assert current.live_calls == 0
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+关键价位数组实现测试：与逐点循环的参考实现结果一致
+"""
+
+import sys
+import os
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock.stock_analysis import KeyLevels
+
+
+def loop_significant(values, volumes, current_price, is_low, window_size=3):
+    """原实现：逐点 all() 判断局部极值，循环内计算平均成交量，any() 判断距离"""
+    levels = []
+    for i in range(window_size, len(values) - window_size):
+        window = range(i - window_size, i + window_size + 1)
+        if is_low:
+            ok = all(values[i] <= values[j] for j in window) and 0 < values[i] < current_price
+        else:
+            ok = all(values[i] >= values[j] for j in window) and values[i] > current_price
+        if ok:
+            avg_volume = sum(volumes) / len(volumes) if volumes else 0
+            volume_weight = volumes[i] / avg_volume if avg_volume > 0 else 1
+            if volume_weight > 0.8 and not any(abs(values[i] - e) < current_price * 0.02 for e in levels):
+                levels.append(round(values[i], 2))
+    return levels
+
+
+def loop_filter_and_sort(levels, current_price, is_support):
+    unique_levels = list(set(levels))
+    if is_support:
+        filtered = sorted([x for x in unique_levels if 0 < x < current_price], reverse=True)
+    else:
+        filtered = sorted([x for x in unique_levels if x > current_price])
+    final = []
+    for level in filtered:
+        if not any(abs(level - e) < current_price * 0.015 for e in final):
+            final.append(round(level, 2))
+    return final[:5]
+
+
+def make_series(rng, n):
+    base = rng.uniform(2, 150)
+    closes = np.abs(base + np.cumsum(rng.normal(0, base * 0.02, n))) + 0.5
+    highs = np.round(closes + rng.uniform(0, base * 0.02, n), 2)
+    lows = np.round(closes - rng.uniform(0, base * 0.02, n), 2)
+    volumes = rng.integers(0, 5, n) * 1000.0 if rng.random() < 0.2 else rng.uniform(1e5, 1e6, n)
+    return highs.tolist(), lows.tolist(), np.round(closes, 2).tolist(), volumes.tolist()
+
+
+def test_significant_extrema_match_loop_reference():
+    rng = np.random.default_rng(11)
+    for _ in range(300):
+        highs, lows, closes, volumes = make_series(rng, int(rng.integers(5, 250)))
+        current_price = round(closes[-1] * rng.uniform(0.9, 1.1), 2)
+        assert KeyLevels._find_significant_lows(lows, volumes, current_price) == \
+            loop_significant(lows, volumes, current_price, is_low=True)
+        assert KeyLevels._find_significant_highs(highs, volumes, current_price) == \
+            loop_significant(highs, volumes, current_price, is_low=False)
+
+
+def test_filter_and_sort_matches_loop_reference():
+    rng = np.random.default_rng(12)
+    for _ in range(300):
+        current_price = round(rng.uniform(2, 100), 2)
+        levels = np.round(current_price * rng.uniform(0.7, 1.3, int(rng.integers(0, 40))), 2).tolist()
+        levels += [float(int(current_price)), float(int(current_price)) + 0.5]
+        for is_support in (True, False):
+            assert KeyLevels._filter_and_sort_levels(levels, current_price, is_support) == \
+                loop_filter_and_sort(levels, current_price, is_support)
+
+
+def test_key_levels_on_multi_year_window():
+    rng = np.random.default_rng(13)
+    highs, lows, closes, volumes = make_series(rng, 2500)
+    historical_data = [{"high": h, "low": l, "close": c, "volume": v} for h, l, c, v in zip(highs, lows, closes, volumes)]
+    current_price = closes[-1]
+    result = KeyLevels.calculate_key_levels(historical_data, current_price)
+    assert 0 < len(result["support_levels"]) <= 3
+    assert all(level < current_price for level in result["support_levels"])
+    assert all(level > current_price for level in result["resistance_levels"])
+    assert result["support_levels"] == sorted(result["support_levels"], reverse=True)
+    assert result["resistance_levels"] == sorted(result["resistance_levels"])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场横截面指标测试：二维批量计算与逐只股票的一维计算结果一致
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock import indicator_kernel
+from backend_api.stock.market_indicators import MarketBars, compute_market_series, compute_market_indicators
+
+
+def make_long_frame(lengths, bars, seed=3):
+    """构造 load_market_bars 查询返回的长表，lengths 为每只股票的 K 线数量"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i, n in enumerate(lengths):
+        closes = 10 + np.cumsum(rng.normal(0, 0.3, n))
+        dates = pd.date_range('2024-01-01', periods=n, freq='B')
+        frame = pd.DataFrame({
+            'code': f'{600000 + i}',
+            'date': dates.date,
+            'high': closes + rng.uniform(0, 0.3, n),
+            'low': closes - rng.uniform(0, 0.3, n),
+            'close': closes,
+        })
+        frame['rn'] = np.arange(n, 0, -1)
+        frames.append(frame[frame['rn'] <= bars])
+    return pd.concat(frames, ignore_index=True).sample(frac=1, random_state=1)
+
+
+def test_market_series_matches_per_stock_kernel():
+    bars = 120
+    df = make_long_frame([150, 120, 80, 30, 5], bars)
+    # 第一只股票中间连续 12 天一字板，RSV 在首个有效值之后出现无效值
+    flat = (df['code'] == '600000') & df['rn'].between(40, 51)
+    df.loc[flat, ['high', 'low', 'close']] = 12.34
+    market = MarketBars.from_frame(df, bars)
+    series = compute_market_series(market)
+
+    for row, code in enumerate(market.codes):
+        stock = df[df['code'] == code].sort_values('rn', ascending=False)
+        expected = indicator_kernel.compute_indicators(stock['high'].to_numpy(), stock['low'].to_numpy(), stock['close'].to_numpy())
+        offset = bars - len(stock)
+        for key, values in expected.items():
+            np.testing.assert_allclose(series[key][row, offset:], values, rtol=1e-9, atol=1e-9, err_msg=f"{code} {key}")
+            assert np.isnan(series[key][row, :offset]).all()
+
+
+def test_cross_section_table_screening():
+    bars = 60
+    df = make_long_frame([100, 100, 10], bars)
+    table = compute_market_indicators(MarketBars.from_frame(df, bars))
+
+    assert list(table.index) == ['600000', '600001', '600002']
+    assert table.loc['600002', 'bars'] == 10
+    assert np.isnan(table.loc['600002', 'rsi'])
+    latest = df[df['rn'] == 1].set_index('code')
+    assert table.loc['600001', 'close'] == round(latest.loc['600001', 'close'], 4)
+    assert table.loc['600001', 'date'] == latest.loc['600001', 'date']
+    assert {'macd_hist_prev', 'rsi_prev', 'k_prev', 'd_prev'} <= set(table.columns)
+
+    picked = table.query("rsi < 101 and macd_hist_prev == macd_hist_prev")
+    assert set(picked.index) == {'600000', '600001'}
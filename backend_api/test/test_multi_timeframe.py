@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多周期分析测试：周线/月线由日线在内存中合成，多周期输出只查询一次日线
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock.stock_analysis import StockAnalysisService, resample_bars
+
+
+def make_daily(n, seed=21):
+    rng = np.random.default_rng(seed)
+    closes = 20 + np.cumsum(rng.normal(0, 0.3, n))
+    dates = pd.bdate_range('2023-01-02', periods=n)
+    return [
+        {
+            "code": "600000", "name": "浦发银行", "date": d.strftime("%Y-%m-%d"),
+            "open": float(c - 0.1), "high": float(c + 0.3), "low": float(c - 0.3), "close": float(c),
+            "volume": 1000.0 + i, "amount": 10000.0, "change_percent": 0.0, "change": 0.0, "turnover_rate": 0.5
+        }
+        for i, (d, c) in enumerate(zip(dates, closes))
+    ]
+
+
+def test_resample_weekly_and_monthly():
+    daily = make_daily(60)
+    weekly = resample_bars(daily, "weekly")
+    assert len(weekly) == 12
+    first_week = daily[:5]
+    assert weekly[0]["date"] == first_week[-1]["date"]
+    assert weekly[0]["open"] == first_week[0]["open"]
+    assert weekly[0]["close"] == first_week[-1]["close"]
+    assert weekly[0]["high"] == max(d["high"] for d in first_week)
+    assert weekly[0]["low"] == min(d["low"] for d in first_week)
+    assert weekly[0]["volume"] == sum(d["volume"] for d in first_week)
+    assert weekly[1]["change"] == round(weekly[1]["close"] - weekly[0]["close"], 4)
+
+    monthly = resample_bars(daily, "monthly")
+    assert [m["date"][:7] for m in monthly] == ["2023-01", "2023-02", "2023-03"]
+    assert resample_bars(daily, "daily") is daily
+
+
+class CountingService(StockAnalysisService):
+    def __init__(self, daily):
+        self.daily = daily
+        self.queries = []
+
+    def _get_history_with_price(self, stock_code, days=60):
+        self.queries.append(days)
+        return self.daily[-days:], None
+
+
+def test_multi_timeframe_uses_one_query():
+    service = CountingService(make_daily(1500))
+    result = service.get_multi_timeframe_analysis("600000", lookback=40)
+    assert service.queries == [40 * 23]
+    data = result["data"]
+    assert set(data) == {"daily", "weekly", "monthly"}
+    assert data["daily"]["bars"] == 40
+    assert data["weekly"]["bars"] == 40
+    assert data["monthly"]["end_date"] == data["daily"]["end_date"]
+    assert data["weekly"]["technical_indicators"]["rsi"]["value"] != data["daily"]["technical_indicators"]["rsi"]["value"]
+
+    weekly = service.get_stock_analysis("600000", lookback=40, timeframe="weekly")["data"]
+    assert weekly["technical_indicators"] == data["weekly"]["technical_indicators"]
+    assert service.queries[-1] == 40 * 5
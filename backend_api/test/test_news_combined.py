@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+综合资讯并发获取测试：总耗时取决于最慢的数据源，超时的数据源被跳过，写库在后台执行
+"""
+
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock import stock_news
+
+
+def install_sources(monkeypatch, delays, saved):
+    def delayed(name, value):
+        def fetch(*args):
+            time.sleep(delays[name])
+            if isinstance(value, Exception):
+                raise value
+            return value
+        return fetch
+
+    news_df = pd.DataFrame({
+        '新闻标题': ['贵州茅台发布年度业绩快报', '大盘午后震荡'],
+        '新闻内容': ['贵州茅台(600519)营收增长', '指数小幅波动'],
+        '发布时间': ['2024-05-01 10:00:00', '2024-05-01 11:00:00'],
+        '文章来源': ['东方财富', '某网站'],
+    })
+    announcements = [{'title': '贵州茅台董事会决议公告', 'publish_time': '2024-04-30', 'type': 'announcement', 'source': '上市公司公告'}]
+    research = [{'title': '茅台深度报告：高端白酒龙头', 'publish_time': '2024-04-29', 'type': 'research', 'source': '某证券'}]
+    monkeypatch.setattr(stock_news.stock_profile_cache, 'get_name', delayed('stock_name', '贵州茅台'))
+    monkeypatch.setattr(stock_news, '_fetch_news_frame', delayed('news', news_df))
+    monkeypatch.setattr(stock_news, '_fetch_announcements', delayed('announcement', announcements))
+    monkeypatch.setattr(stock_news, '_fetch_research_data', delayed('research', research))
+
+    done = threading.Event()
+
+    def fake_save(symbol, data):
+        time.sleep(0.3)
+        saved.append((symbol, len(data)))
+        done.set()
+    monkeypatch.setattr(stock_news, 'save_news_to_db', fake_save)
+    return done
+
+
+def call(symbol='600519'):
+    response = asyncio.run(stock_news.get_stock_news_combined(symbol=symbol, news_limit=50, announcement_limit=20, research_limit=10))
+    return json.loads(response.body)
+
+
+def test_sources_fetched_concurrently(monkeypatch):
+    saved = []
+    done = install_sources(monkeypatch, {'stock_name': 0.2, 'news': 0.3, 'announcement': 0.1, 'research': 0.4}, saved)
+    start = time.perf_counter()
+    result = call()
+    elapsed = time.perf_counter() - start
+    assert result['success']
+    assert result['failed_sources'] == []
+    assert [item['type'] for item in result['data']] == ['news', 'announcement', 'research']
+    # 总耗时约等于最慢的数据源（0.4s），而不是各数据源之和（1.0s），且不等待写库
+    assert elapsed < 0.8
+    assert saved == []
+    assert done.wait(2)
+    assert saved == [('600519', 3)]
+
+
+def test_slow_and_failing_sources_degrade(monkeypatch):
+    saved = []
+    monkeypatch.setitem(stock_news.NEWS_COMBINED_CONFIG, 'timeout_seconds',
+                        {'stock_name': 1, 'news': 1, 'announcement': 1, 'research': 0.2})
+    install_sources(monkeypatch, {'stock_name': 0, 'news': 0, 'announcement': 0, 'research': 1.5}, saved)
+    monkeypatch.setattr(stock_news, '_fetch_announcements', lambda *args: (_ for _ in ()).throw(RuntimeError('db down')))
+    start = time.perf_counter()
+    result = call()
+    assert time.perf_counter() - start < 1.0
+    assert result['success']
+    assert result['failed_sources'] == ['announcement', 'research']
+    assert [item['type'] for item in result['data']] == ['news']
+
+
+def test_research_retry_stops_at_deadline(monkeypatch):
+    attempts, sleeps = [], []
+
+    def throttled(symbol):
+        attempts.append(symbol)
+        raise RuntimeError('访问受限')
+    monkeypatch.setattr(stock_news.ak, 'stock_research_report_em', throttled)
+    # 只记录本线程的等待，其他测试留下的后台线程照常 sleep
+    real_sleep, caller = time.sleep, threading.get_ident()
+    monkeypatch.setattr(stock_news.time, 'sleep',
+                        lambda seconds: sleeps.append(seconds) if threading.get_ident() == caller else real_sleep(seconds))
+
+    # 第一次退避要等 10 秒，超过 3 秒的截止时间，不再重试
+    assert stock_news._fetch_research_data('600519', 10, time.monotonic() + 3) == []
+    assert attempts == ['600519'] and sleeps == []
+
+    # 没有截止时间时（/research_reports 接口）仍按原退避策略重试
+    attempts.clear()
+    assert stock_news._fetch_research_data('600519', 10) == []
+    assert len(attempts) == 3 and sleeps == [10, 20]
+
+
+def test_slow_research_does_not_occupy_news_workers(monkeypatch):
+    saved = []
+    monkeypatch.setitem(stock_news.NEWS_COMBINED_CONFIG, 'timeout_seconds',
+                        {'stock_name': 0.5, 'news': 0.5, 'announcement': 0.5, 'research': 0.1})
+    install_sources(monkeypatch, {'stock_name': 0, 'news': 0, 'announcement': 0, 'research': 1.0}, saved)
+    # 研报在独立线程池中执行，超时后仍占用的线程不影响后续请求的其他数据源
+    for _ in range(stock_news.NEWS_COMBINED_CONFIG['max_workers'] + 1):
+        result = call()
+        assert result['failed_sources'] == ['research']
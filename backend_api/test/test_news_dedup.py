@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+新闻标题近似去重测试：LSH 索引与两两比较的结果一致，支持对已保存标题增量去重
+"""
+
+import sys
+import os
+import random
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock.news_dedup import (
+    DEFAULT_THRESHOLD, NewsDeduplicator, jaccard, minhash_signatures, shingles
+)
+
+WORDS = ['贵州茅台', '宁德时代', '业绩', '预告', '增长', '股东', '减持', '回购', '公告', '季度', '营收', '净利润',
+         '同比', '大涨', '下跌', '机构', '调研', '评级', '买入', '分红', '董事会', '决议', '新能源', '订单']
+
+
+def make_titles(n, seed=0):
+    rng = random.Random(seed)
+    return [''.join(rng.sample(WORDS, 6)) + str(i) for i in range(n)]
+
+
+def pairwise(titles, threshold=DEFAULT_THRESHOLD):
+    """参考实现：与每条已保留标题两两比较"""
+    kept = []
+    for title in titles:
+        if all(jaccard(shingles(title), shingles(k)) < threshold for k in kept):
+            kept.append(title)
+    return kept
+
+
+def test_shingles_ignore_punctuation_and_case():
+    assert shingles('贵州茅台：一季度 营收增长!') == shingles('贵州茅台一季度营收增长')
+    assert shingles('ABC') == shingles('abc')
+    assert shingles('！？') == frozenset()
+    assert len(shingles('茅')) == 1
+
+
+def test_signature_estimates_jaccard():
+    a, b = shingles('贵州茅台发布2024年第一季度报告营收同比增长'), shingles('贵州茅台发布2024年第一季度报告净利润同比增长')
+    sig = minhash_signatures([a, b])
+    assert sig.shape == (2, 60)
+    assert abs((sig[0] == sig[1]).mean() - jaccard(a, b)) < 0.25
+    assert (minhash_signatures([a])[0] == sig[0]).all()
+
+
+def test_dedup_matches_pairwise():
+    base = make_titles(300)
+    rng = random.Random(1)
+    titles = []
+    for title in base:
+        titles.append(title)
+        if rng.random() < 0.3:
+            titles.append('【快讯】' + title + '！')  # 近似重复
+    items = [{'title': t} for t in titles]
+    unique = NewsDeduplicator().deduplicate(items)
+    assert [item['title'] for item in unique] == pairwise(titles)
+
+
+def test_incremental_against_stored_titles():
+    stored = make_titles(2000, seed=2)
+    deduplicator = NewsDeduplicator()
+    deduplicator.add_many(stored)
+    assert len(deduplicator) == 2000
+    assert deduplicator.find_duplicate(stored[10] + '。') == stored[10]
+    assert deduplicator.find_duplicate('完全无关的一条新标题内容') is None
+
+    fresh = [{'title': t + '！'} for t in stored[:50]] + [{'title': t} for t in make_titles(50, seed=3)]
+    start = time.perf_counter()
+    unique = deduplicator.deduplicate(fresh)
+    elapsed = time.perf_counter() - start
+    assert {item['title'] for item in unique} == {item['title'] for item in fresh[50:]} - set(stored)
+    assert elapsed < 0.5
+
+
+def test_deduplicate_news_prefers_source_priority():
+    from backend_api.stock.stock_news import deduplicate_news
+    news = [
+        {'title': '宁德时代获得新能源大额订单', 'source': '某网站', 'publish_time': '2024-05-01 10:00:00'},
+        {'title': '宁德时代获得新能源大额订单！', 'source': '东方财富', 'publish_time': '2024-05-01 10:00:00'},
+        {'title': '宁德时代董事会决议公告', 'source': '上市公司公告', 'publish_time': '2024-04-30'},
+    ]
+    unique = deduplicate_news(news)
+    assert [item['source'] for item in unique] == ['东方财富', '上市公司公告']
+    assert deduplicate_news(news, existing_titles=['宁德时代董事会决议公告']) == [unique[0]]
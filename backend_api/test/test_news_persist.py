@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+资讯写库测试：在真实表（SQLite，带 models 中声明的唯一约束）上整批 INSERT ... ON CONFLICT DO NOTHING，
+写入/跳过条数取自 RETURNING 结果；缺少发布时间或报告日期的条目重复写入时同样被约束跳过
+"""
+
+import sys
+import os
+import asyncio
+import datetime
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.models import Base, StockNews, StockResearchReport
+from backend_api.stock import stock_news
+
+
+def make_session_factory(monkeypatch, path):
+    """建表并替换 stock_news 的会话工厂，记录执行的 INSERT 语句数"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[StockNews.__table__, StockResearchReport.__table__])
+    inserts = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('INSERT'):
+            inserts.append(statement)
+
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(stock_news, 'SessionLocal', factory)
+    return factory, inserts
+
+
+def test_save_news_single_statement_and_conflicts(tmp_path, monkeypatch):
+    factory, inserts = make_session_factory(monkeypatch, tmp_path / "news.db")
+    # 30 天前保存过的新闻不在近似去重窗口内，由唯一约束跳过
+    with factory() as db:
+        db.add(StockNews(stock_code='600519', title='贵州茅台发布年度业绩快报', publish_time=datetime.datetime(2024, 5, 1, 10),
+                         created_at=datetime.datetime.now() - datetime.timedelta(days=30)))
+        db.commit()
+    inserts.clear()
+
+    news = [{'title': '贵州茅台发布年度业绩快报', 'publish_time': '2024-05-01 10:00:00'}]
+    news += [{'title': f'第{i}条独立新闻标题内容', 'publish_time': f'2024-05-02 {i % 24:02d}:{i // 24:02d}:00'} for i in range(48)]
+    # 同一批里两条没有发布时间的相同新闻，只写入一条
+    news += [{'title': '没有发布时间的新闻'}, {'title': '没有发布时间的新闻', 'publish_time': ''}]
+
+    saved, skipped = stock_news.save_news_to_db('600519', news)
+
+    assert len(inserts) == 1
+    assert (saved, skipped) == (49, 2)
+    with factory() as db:
+        assert db.query(func.count(StockNews.id)).scalar() == 50
+        undated = db.query(StockNews).filter(StockNews.title == '没有发布时间的新闻').one()
+        assert undated.publish_time == datetime.datetime.combine(datetime.date.today(), datetime.time())
+
+
+def test_save_research_reports_rerun_skips_all(tmp_path, monkeypatch):
+    factory, inserts = make_session_factory(monkeypatch, tmp_path / "research.db")
+    monkeypatch.setattr(stock_news.stock_profile_cache, 'get',
+                        lambda symbol: {'code': symbol, 'name': '贵州茅台', 'industry': '酿酒行业'})
+    reports = [
+        {'title': '茅台深度报告', 'rating': '买入', 'source': '某证券', 'publish_time': '2024-04-29 00:00:00', 'url': 'http://x/1.pdf'},
+        {'title': '', 'rating': '未评级', 'source': '研究机构', 'publish_time': '', 'url': ''},
+        {'title': '研报标题', 'rating': '增持', 'source': '另一证券', 'publish_time': '2024-04-28', 'url': 'http://x/3.pdf'},
+    ]
+
+    first = asyncio.run(stock_news.save_research_reports_to_db('600519', reports))
+    # 再次保存（含缺少报告日期的一条）全部被唯一约束跳过
+    second = asyncio.run(stock_news.save_research_reports_to_db('600519', reports))
+
+    assert first == (3, 0)
+    assert second == (0, 3)
+    assert len(inserts) == 2
+    with factory() as db:
+        rows = {row.report_name: row for row in db.query(StockResearchReport).all()}
+    assert set(rows) == {'茅台深度报告', '研报_600519_2', '研报标题_600519_3'}
+    assert rows['茅台深度报告'].stock_name == '贵州茅台' and rows['茅台深度报告'].industry == '酿酒行业'
+    assert rows['茅台深度报告'].report_date == datetime.datetime(2024, 4, 29)
+    assert rows['研报_600519_2'].dongcai_rating is None and rows['研报_600519_2'].institution is None
+    assert rows['研报_600519_2'].report_date == datetime.datetime.combine(datetime.date.today(), datetime.time())
+    assert rows['研报_600519_2'].pdf_url is None
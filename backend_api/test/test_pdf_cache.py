@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+研报PDF磁盘缓存测试：并发请求只回源一次、按大小淘汰最久未使用的文件（多进程共用目录）、接口支持 Range 和 ETag
+"""
+
+import sys
+import os
+import time
+import asyncio
+
+from aiohttp import web
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend_api.stock import stock_news
+from backend_api.stock.pdf_cache import PdfCache, PdfDownloadError, cache_key
+
+PDF_BODY = b'%PDF-1.4\n' + b'0123456789' * 5000
+
+
+async def start_upstream(requests):
+    """本地上游服务：/slow/*.pdf 延迟返回 PDF，/error 返回 HTML 错误页"""
+    async def pdf(request):
+        requests.append(request.path)
+        await asyncio.sleep(0.2)
+        return web.Response(body=PDF_BODY, content_type='application/pdf')
+
+    async def error(request):
+        requests.append(request.path)
+        return web.Response(text='<html>access denied</html>', content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/slow/{name}', pdf)
+    app.router.add_get('/error', error)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}'
+
+
+def test_concurrent_downloads_coalesce(tmp_path):
+    async def run():
+        requests = []
+        runner, base = await start_upstream(requests)
+        cache = PdfCache(directory=str(tmp_path), max_bytes=10 * len(PDF_BODY))
+        try:
+            url = f'{base}/slow/report.pdf'
+            results = await asyncio.gather(*[cache.fetch(url) for _ in range(10)])
+            cached = await cache.fetch(url)
+            error = None
+            try:
+                await cache.fetch(f'{base}/error')
+            except PdfDownloadError as e:
+                error = e
+        finally:
+            await cache.close()
+            await runner.cleanup()
+        return requests, results, cached, error, cache
+
+    requests, results, cached, error, cache = asyncio.run(run())
+
+    assert requests.count('/slow/report.pdf') == 1
+    assert len({path for path, _ in results}) == 1
+    with open(cached[0], 'rb') as f:
+        assert f.read() == PDF_BODY
+    assert cache.coalesced == 9 and cache.hits == 1 and cache.downloads == 1
+    assert cache.filename('http://x/slow/report.pdf') == 'report.pdf'
+    # 错误页面不写入缓存，也不留下临时文件
+    assert error is not None
+    assert os.listdir(tmp_path) == [os.path.basename(cached[0])]
+
+
+class LocalPdfCache(PdfCache):
+    """不访问网络，按 URL 直接生成指定大小的文件"""
+
+    def __init__(self, directory, max_bytes, sizes):
+        super().__init__(directory=directory, max_bytes=max_bytes)
+        self.sizes = sizes
+
+    async def _download(self, url, key):
+        with open(self.path_for(key), 'wb') as f:
+            f.write(PDF_BODY[:self.sizes.get(url, len(PDF_BODY))])
+        self._evict(keep=key)
+        self.downloads += 1
+
+
+async def fetch_in_order(cache, urls):
+    # 文件 mtime 精度有限，间隔一下保证 LRU 顺序确定
+    for url in urls:
+        await cache.fetch(url)
+        await asyncio.sleep(0.02)
+
+
+def test_lru_eviction_by_size(tmp_path):
+    cache = LocalPdfCache(str(tmp_path), max_bytes=250, sizes={'a': 100, 'b': 100, 'c': 100})
+
+    # a 第二次访问变为最近使用，写入 c 后超过 250 字节，淘汰最久未使用的 b
+    asyncio.run(fetch_in_order(cache, ['a', 'b', 'a', 'c']))
+    assert cache.lookup('b') is None
+    assert cache.lookup('a') is not None and cache.lookup('c') is not None
+    assert cache.stats()['bytes'] == 200 and cache.evictions == 1
+    assert not os.path.exists(cache.path_for(cache_key('b')))
+
+    # 重启后直接读取磁盘，按 mtime 保持 LRU 顺序
+    reloaded = PdfCache(directory=str(tmp_path), max_bytes=250)
+    assert reloaded.lookup('a') is not None
+    assert reloaded.stats()['files'] == 2
+
+
+def test_workers_share_directory_and_size_limit(tmp_path):
+    sizes = {'a': 100, 'b': 100, 'c': 100}
+    worker1 = LocalPdfCache(str(tmp_path), max_bytes=250, sizes=sizes)
+    worker2 = LocalPdfCache(str(tmp_path), max_bytes=250, sizes=sizes)
+
+    asyncio.run(fetch_in_order(worker1, ['a', 'b']))
+    # 其他进程下载的文件直接命中，不再回源
+    assert worker2.lookup('a') is not None
+    asyncio.run(fetch_in_order(worker2, ['c']))
+
+    # 两个进程合计仍不超过上限：worker2 写入 c 时淘汰了 worker1 下载的 b
+    assert worker2.downloads == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(cache_key(url) + '.pdf' for url in ['a', 'c'])
+    assert worker1.lookup('b') is None and worker1.stats()['bytes'] == 200
+
+
+def test_only_stale_part_files_are_removed(tmp_path):
+    # 其他 worker 正在写的临时文件保留，超过下载超时仍未完成的才清理
+    active = tmp_path / 'x.pdf.101.1.part'
+    stale = tmp_path / 'y.pdf.102.1.part'
+    active.write_bytes(b'%PDF')
+    stale.write_bytes(b'%PDF')
+    old = time.time() - 120
+    os.utime(stale, (old, old))
+
+    cache = PdfCache(directory=str(tmp_path), max_bytes=1000, timeout=60)
+    assert cache.lookup('http://x/report.pdf') is None
+    assert active.exists() and not stale.exists()
+
+
+def test_download_pdf_range_and_etag(tmp_path, monkeypatch):
+    cache = LocalPdfCache(str(tmp_path), max_bytes=10 * len(PDF_BODY), sizes={})
+    monkeypatch.setattr(stock_news, 'pdf_cache', cache)
+    app = FastAPI()
+    app.include_router(stock_news.router)
+    client = TestClient(app)
+    params = {'url': 'http://x/report.pdf', 'filename': '茅台研报.pdf'}
+
+    response = client.get('/api/stock/download_pdf', params=params)
+    assert response.status_code == 200
+    assert response.content == PDF_BODY
+    assert response.headers['content-type'] == 'application/pdf'
+    assert "filename*=utf-8''" in response.headers['content-disposition']
+    etag = response.headers['etag']
+
+    partial = client.get('/api/stock/download_pdf', params=params, headers={'Range': 'bytes=0-7'})
+    assert partial.status_code == 206
+    assert partial.content == PDF_BODY[:8]
+    assert partial.headers['content-range'] == f'bytes 0-7/{len(PDF_BODY)}'
+
+    not_modified = client.get('/api/stock/download_pdf', params=params, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert cache.downloads == 1
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+价格预测测试：闭式趋势拟合与 np.polyfit 一致，滚动更新与重建一致，批量结果与逐只结果一致
+"""
+
+import sys
+import os
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock.stock_analysis import PricePrediction, TechnicalIndicators, TrendState
+
+
+def random_closes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.round(20 * np.exp(np.cumsum(rng.normal(0, 0.02, n))), 2)
+
+
+def polyfit_prediction(closes, days=30):
+    """原实现：np.polyfit 线性拟合 + np.std 收益率波动"""
+    x = np.arange(len(closes))
+    slope, intercept = np.polyfit(x, closes, 1)
+    target = slope * (len(closes) + days) + intercept
+    volatility = np.std(np.diff(closes) / closes[:-1]) * np.sqrt(days)
+    return slope, target, target * (1 - volatility), target * (1 + volatility)
+
+
+def test_fit_matches_polyfit():
+    closes = random_closes(60)
+    slope, intercept = TrendState.from_closes(closes).fit()
+    expected_slope, expected_intercept = np.polyfit(np.arange(60), closes, 1)
+    assert np.isclose(slope, expected_slope)
+    assert np.isclose(intercept, expected_intercept)
+
+
+def test_push_matches_rebuild():
+    closes = random_closes(200, seed=1)
+    state = TrendState.from_closes(closes[:60], window=60)
+    for i in range(60, 200):
+        state.push(closes[i])
+        rebuilt = TrendState.from_closes(closes[i - 59:i + 1])
+        assert np.allclose(state.fit(), rebuilt.fit())
+        assert np.isclose(state.volatility(), rebuilt.volatility())
+    assert len(state) == 60
+
+
+def test_push_grows_without_window():
+    closes = random_closes(30, seed=2)
+    state = TrendState()
+    for close in closes:
+        state.push(close)
+    assert np.allclose(state.fit(), np.polyfit(np.arange(30), closes, 1))
+
+
+def test_predict_price_matches_polyfit():
+    closes = random_closes(60, seed=3)
+    historical_data = [{"close": c} for c in closes]
+    result = PricePrediction.predict_price(historical_data)
+    _, target, low, high = polyfit_prediction(closes)
+    assert result["target_price"] == round(target, 2)
+    assert result["prediction_range"] == {"min": round(low, 2), "max": round(high, 2)}
+    assert 0 <= result["confidence"] <= 100
+
+
+def test_predict_price_reuses_indicators():
+    closes = random_closes(60, seed=4)
+    historical_data = [{"close": c} for c in closes]
+    indicators = {"rsi": 20.0, "macd": {"macd": -1.0, "signal": 0.0, "histogram": -1.0}}
+    result = PricePrediction.predict_price(historical_data, indicators=indicators)
+    slope = polyfit_prediction(closes)[0]
+    assert result["confidence"] == 50 - 5 - 10 + (10 if slope > 0 else -10)
+
+
+def test_short_history_returns_empty_prediction():
+    result = PricePrediction.predict_price([{"close": 10.0}] * 19)
+    assert result["target_price"] == 0.0
+    assert result["prediction_range"] == {"min": 0.0, "max": 0.0}
+
+
+def test_batch_matches_single():
+    rows = [random_closes(60, seed=s) for s in range(5)]
+    matrix = np.vstack(rows)
+    matrix[1, :15] = np.nan   # 历史不足 60 根，左侧缺失
+    matrix[2, :45] = np.nan   # 不足 20 根
+    rsi, macd, hist = [], [], []
+    expected = []
+    for row in matrix:
+        closes = row[np.isfinite(row)]
+        indicators = TechnicalIndicators.latest(TechnicalIndicators.calculate_series(closes, closes, closes))
+        rsi.append(indicators["rsi"])
+        macd.append(indicators["macd"]["macd"])
+        hist.append(indicators["macd"]["histogram"])
+        expected.append(PricePrediction.predict_price([{"close": c} for c in closes], indicators=indicators))
+    batch = PricePrediction.predict_batch(matrix, np.array(rsi), np.array(macd), np.array(hist))
+    for row, single in enumerate(expected):
+        assert batch["target_price"][row] == single["target_price"]
+        assert batch["change_percent"][row] == single["change_percent"]
+        assert batch["min"][row] == single["prediction_range"]["min"]
+        assert batch["max"][row] == single["prediction_range"]["max"]
+        assert batch["confidence"][row] == single["confidence"]
+
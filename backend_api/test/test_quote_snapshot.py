@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时行情快照缓存测试
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock.quote_snapshot import QUOTE_BOARD_FIELDS, QuoteSnapshot, QuoteSnapshotCache
+
+
+def make_quotes():
+    codes = ['600000', '000001', '300750', '830799', '601318', '002594']
+    df = pd.DataFrame({col: np.nan for col in QUOTE_BOARD_FIELDS}, index=range(len(codes)))
+    df['code'] = codes
+    df['name'] = [f'股票{c}' for c in codes]
+    df['current_price'] = [10.0, 12.0, 200.0, 8.0, 45.0, 250.0]
+    df['pre_close'] = [9.5, 12.5, 190.0, 8.0, 44.0, 240.0]
+    df['change_percent'] = [5.26, -4.0, 5.26, 0.0, 2.27, np.nan]
+    df['volume'] = [100, 300, 200, 50, 400, 150]
+    df['turnover_rate'] = [1.0, 2.0, 3.0, np.nan, 0.5, 1.5]
+    return df
+
+
+def test_snapshot_pages_match_pandas_sort():
+    df = make_quotes()
+    snapshot = QuoteSnapshot(df)
+
+    data, total = snapshot.page('rise', 'all', 1, 3)
+    assert total == 6
+    assert [r['code'] for r in data] == ['600000', '300750', '601318']
+    assert data[0]['current'] == 10.0 and data[0]['change'] == 0.5
+
+    data, total = snapshot.page('fall', 'sz', 1, 20)
+    assert total == 3
+    # 缺失值排在最后
+    assert [r['code'] for r in data] == ['000001', '300750', '002594']
+
+    data, total = snapshot.page('volume', 'sh', 2, 1)
+    assert total == 2
+    assert [r['code'] for r in data] == ['600000']
+
+    data, _ = snapshot.page('turnover_rate', 'bj', 1, 20)
+    assert data[0]['rate'] is None
+
+
+def test_cache_reloads_only_when_version_changes():
+    class FakeCache(QuoteSnapshotCache):
+        def __init__(self):
+            super().__init__(check_interval=0)
+            self.version = ('2024-01-02 10:00:00', 6)
+            self.loads = 0
+
+        def _current_version(self, db):
+            return self.version
+
+        def _load(self, db, version):
+            self.loads += 1
+            return QuoteSnapshot(make_quotes(), version)
+
+    cache = FakeCache()
+    first = cache.get(None)
+    assert cache.get(None) is first
+    cache.version = ('2024-01-02 10:15:00', 6)
+    assert cache.get(None) is not first
+    assert cache.loads == 2
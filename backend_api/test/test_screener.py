@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+选股器测试：表达式求值、排序分页与 pandas 结果一致，非法表达式报错
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock.screener import QUOTE_COLUMNS, ScreenerCache, ScreenerError, ScreenerTable
+
+
+def make_table(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    codes = [f"{p}{i:05d}" for i, p in zip(range(n), rng.choice(['6', '0', '3', '8'], n))]
+    quotes = pd.DataFrame({column: rng.normal(10, 5, n) for column in QUOTE_COLUMNS})
+    quotes['code'] = codes
+    quotes['name'] = [f'股票{c}' for c in codes]
+    quotes.loc[::7, 'pe_dynamic'] = np.nan
+    indicators = pd.DataFrame({'code': codes[::2], 'rsi': rng.uniform(0, 100, len(codes[::2])),
+                               'ma20': rng.normal(10, 5, len(codes[::2]))})
+    return ScreenerTable(quotes, indicators), quotes, indicators
+
+
+def test_filter_matches_pandas():
+    table, quotes, indicators = make_table()
+    frame = quotes.merge(indicators, on='code', how='left')
+    expected = frame[(frame.change_percent > 10) & (frame.turnover_rate >= 8) & (frame.rsi < 60)]
+    data, total = table.screen("change_percent > 10 and turnover_rate >= 8 and rsi < 60", page_size=1000)
+    assert total == len(expected)
+    assert sorted(r['code'] for r in data) == sorted(expected.code)
+
+
+def test_sort_and_pagination():
+    table, quotes, _ = make_table()
+    expected = quotes[quotes.current_price > quotes.pre_close].sort_values('pe_dynamic', kind='stable', na_position='last')
+    first, total = table.screen("current > pre_close", sort_by='pe_dynamic', ascending=True, page=1, page_size=30)
+    second, _ = table.screen("current > pre_close", sort_by='pe_dynamic', ascending=True, page=2, page_size=30)
+    assert total == len(expected)
+    assert [r['code'] for r in first + second] == expected.code.tolist()[:60]
+
+    data, _ = table.screen(None, sort_by='pe_dynamic', page=1, page_size=len(quotes))
+    values = [r['pe_dynamic'] for r in data]
+    assert values[-1] is None  # 缺失值排在最后
+    present = [v for v in values if v is not None]
+    assert present == sorted(present, reverse=True)
+
+
+def test_market_and_chained_comparison():
+    table, quotes, _ = make_table()
+    data, total = table.screen("0 < pe_dynamic < 15 or not (pb < 20)", market='sh', page_size=1000)
+    expected = quotes[quotes.code.str.startswith('6')
+                      & (((quotes.pe_dynamic > 0) & (quotes.pe_dynamic < 15)) | ~(quotes.pb_ratio < 20))]
+    assert total == len(expected)
+    assert all(r['code'].startswith('6') for r in data)
+
+
+def test_missing_indicators_never_match():
+    table, quotes, _ = make_table()
+    data, total = table.screen("rsi >= 0", page_size=1000)
+    assert total == len(quotes.code[::2])
+    assert table.record(1)['rsi'] is None
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os').system('ls')",
+    "rsi.__class__",
+    "unknown_field > 1",
+    "rsi",
+    "rsi > ",
+    "-(rsi > 3) > 1",
+    "rsi in [1, 2]",
+    "x" * 600,
+])
+def test_invalid_expression(expression):
+    table, _, _ = make_table(20)
+    with pytest.raises(ScreenerError):
+        table.screen(expression)
+
+
+def test_invalid_sort_field():
+    table, _, _ = make_table(20)
+    with pytest.raises(ScreenerError):
+        table.screen(sort_by='name')
+
+
+def test_cache_includes_indicator_version():
+    class FakeCache(ScreenerCache):
+        def __init__(self):
+            super().__init__(check_interval=0)
+            self.loads = 0
+            self.indicator_version = None
+
+        def _current_version(self, db):
+            return ('2024-01-02 10:00:00', 20, self.indicator_version)
+
+        def _load(self, db, version):
+            self.loads += 1
+            return ScreenerTable(make_table(20)[1], None, version)
+
+    cache = FakeCache()
+    cache.get(None)
+    cache.get(None)
+    assert cache.loads == 1
+    cache.indicator_version = '2024-01-02 16:00:00'
+    cache.get(None)
+    assert cache.loads == 2
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+个股档案缓存测试：命中内存和库时不访问上游，缺失或过期时回源并写回，预热只装入未过期的档案
+"""
+
+import sys
+import os
+import datetime
+import pandas as pd
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock import stock_profile
+from backend_api.stock.stock_profile import StockProfileCache, empty_profile
+
+NOW = datetime.datetime.now()
+
+
+class FakeProfileCache(StockProfileCache):
+    """用字典代替 stock_basic_info"""
+
+    def __init__(self, stored, remote, **kwargs):
+        super().__init__(fetcher=self.fetch, **kwargs)
+        self.stored = stored
+        self.remote = remote
+        self.fetches = []
+        self.reads = 0
+
+    def fetch(self, symbol):
+        self.fetches.append(symbol)
+        if isinstance(self.remote, Exception):
+            raise self.remote
+        return {**empty_profile(symbol), **self.remote.get(symbol, {})}
+
+    def _read_stored(self, symbol=None):
+        self.reads += 1
+        if symbol is None:
+            return [dict(p) for p in self.stored.values()]
+        return [dict(self.stored[symbol])] if symbol in self.stored else []
+
+    def _write_stored(self, profile):
+        self.stored[profile['code']] = dict(profile)
+
+
+def profile(code, name, industry, updated_at=NOW):
+    return {**empty_profile(code), 'name': name, 'industry': industry, 'profile_updated_at': updated_at}
+
+
+def test_fresh_profile_served_from_db_then_memory():
+    cache = FakeProfileCache({'600519': profile('600519', '贵州茅台', '酿酒行业')}, {})
+    assert cache.get_name('600519') == '贵州茅台'
+    assert cache.get_industry('600519') == '酿酒行业'
+    assert cache.reads == 1
+    assert cache.fetches == []
+
+
+def test_missing_or_stale_profile_refreshed_and_written_back():
+    stale = profile('000001', '平安银行', '', NOW - datetime.timedelta(days=30))
+    cache = FakeProfileCache({'000001': stale}, {
+        '000001': {'name': '平安银行', 'industry': '银行', 'total_share': 1.9e10},
+        '300750': {'name': '宁德时代', 'industry': '电池'},
+    })
+    assert cache.get_industry('000001') == '银行'
+    assert cache.get_name('300750') == '宁德时代'
+    assert cache.fetches == ['000001', '300750']
+    assert cache.stored['000001']['total_share'] == 1.9e10
+    assert cache.stored['300750']['profile_updated_at'] is not None
+    cache.get('300750')
+    assert cache.fetches == ['000001', '300750']
+
+
+def test_upstream_failure_falls_back_without_caching_empty():
+    stale = profile('000001', '平安银行', '银行', NOW - datetime.timedelta(days=30))
+    cache = FakeProfileCache({'000001': stale}, RuntimeError('upstream down'))
+    assert cache.get_name('000001') == '平安银行'
+    assert cache.get_name('600000') == ''
+    cache.remote = {'600000': {'name': '浦发银行', 'industry': '银行'}}
+    assert cache.get_name('600000') == '浦发银行'
+
+
+def test_warm_loads_only_fresh_profiles():
+    cache = FakeProfileCache({
+        '600519': profile('600519', '贵州茅台', '酿酒行业'),
+        '000001': profile('000001', '平安银行', None),
+    }, {'000001': {'name': '平安银行', 'industry': '银行'}})
+    assert cache.warm() == 1
+    reads = cache.reads
+    cache.get('600519')
+    assert cache.reads == reads
+    assert cache.get_industry('000001') == '银行'
+
+
+def test_fetch_akshare_profile_parses_items(monkeypatch):
+    df = pd.DataFrame({'item': ['股票代码', '股票简称', '总股本', '流通股', '行业', '上市时间'],
+                       'value': ['600519', '贵州茅台', 1256197800.0, '1256197800', '酿酒行业', 20010827]})
+    monkeypatch.setattr(stock_profile.ak, 'stock_individual_info_em', lambda symbol: df)
+    result = stock_profile.fetch_akshare_profile('600519')
+    assert result['name'] == '贵州茅台' and result['industry'] == '酿酒行业'
+    assert result['total_share'] == 1256197800.0 and result['float_share'] == 1256197800.0
+
+
+def test_profile_total_share_units_match_tushare_turnover(monkeypatch):
+    """档案中的总股本（股）与 tushare 成交量（手）算出的换手率单位一致"""
+    from backend_core.data_collectors.tushare.historical import HistoricalQuoteCollector
+
+    df = pd.DataFrame({'item': ['股票简称', '总股本'], 'value': ['贵州茅台', 1256197800.0]})
+    monkeypatch.setattr(stock_profile.ak, 'stock_individual_info_em', lambda symbol: df)
+    profile = stock_profile.fetch_akshare_profile('600519')
+    basic = pd.DataFrame([profile]).set_index('code')[['name', 'total_share']]
+
+    # 成交 125619.78 手 = 12561978 股，占总股本 1%
+    daily = pd.DataFrame({'ts_code': ['600519.SH'], 'open': [1700.0], 'high': [1710.0], 'low': [1690.0],
+                          'close': [1705.0], 'pre_close': [1700.0], 'change': [5.0], 'vol': [125619.78],
+                          'amount': [2.1e7], 'pct_chg': [0.29]})
+    frame = HistoricalQuoteCollector.__new__(HistoricalQuoteCollector)._build_frame(daily, basic, '20240102')
+
+    assert frame.iloc[0]['turnover_rate'] == pytest.approx(1.0)
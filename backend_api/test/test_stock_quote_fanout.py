@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量行情并发拉取测试
+"""
+
+import sys
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend_api.stock import stock_manage
+from backend_api.stock.stock_manage import fetch_bid_ask_quotes
+
+
+def fake_fetch(code):
+    if code == "slow":
+        time.sleep(1)
+    if code == "bad":
+        raise ValueError("upstream error")
+    if code == "empty":
+        return None
+    time.sleep(0.2)
+    return {"code": code, "current_price": 1.0}
+
+
+def test_fetch_bid_ask_quotes_runs_concurrently_with_partial_results():
+    codes = ["000001", "600519", "bad", "slow", "empty", "300750"]
+    started = time.perf_counter()
+    result, errors = asyncio.run(fetch_bid_ask_quotes(codes, fetch=fake_fetch, timeout=0.5))
+    elapsed = time.perf_counter() - started
+
+    # 三只正常股票各耗时0.2秒，并发后总耗时约等于超时时间而不是累加
+    assert elapsed < 0.9
+    assert [item["code"] for item in result] == ["000001", "600519", "300750"]
+    assert errors == [
+        {"code": "bad", "error": "upstream error"},
+        {"code": "slow", "error": "timeout"},
+        {"code": "empty", "error": "no_data"},
+    ]
+
+
+def test_timeout_starts_when_worker_picks_up_code(monkeypatch):
+    # 2 个线程处理 6 只股票：后面的股票要排队 0.6 秒，但每只执行只需 0.3 秒，不应判为超时
+    monkeypatch.setattr(stock_manage, "quote_executor", ThreadPoolExecutor(max_workers=2))
+
+    def fetch(code):
+        time.sleep(0.3)
+        return {"code": code}
+
+    codes = [f"{600000 + i}" for i in range(6)]
+    result, errors = asyncio.run(fetch_bid_ask_quotes(codes, fetch=fetch, timeout=0.5, queue_timeout=5))
+    assert errors == []
+    assert [item["code"] for item in result] == codes
+
+
+def test_queued_codes_cancelled_when_pool_is_busy(monkeypatch):
+    monkeypatch.setattr(stock_manage, "quote_executor", ThreadPoolExecutor(max_workers=1))
+    calls = []
+
+    def fetch(code):
+        calls.append(code)
+        time.sleep(1.0 if code == "hung" else 0)
+        return {"code": code}
+
+    result, errors = asyncio.run(fetch_bid_ask_quotes(["hung", "000001"], fetch=fetch, timeout=0.2, queue_timeout=0.3))
+    assert result == []
+    assert errors == [{"code": "hung", "error": "timeout"}, {"code": "000001", "error": "busy"}]
+    # 排队超时的请求已从线程池队列中取消，不会在之后占用线程
+    time.sleep(1.0)
+    assert calls == ["hung"]
+
+
+
+class EagerExecutor(ThreadPoolExecutor):
+    """提交后等到 fetch 已在线程中开始执行才返回：线程已占用，但事件循环还没处理开始通知"""
+
+    def __init__(self, entered):
+        super().__init__(max_workers=1)
+        self.entered = entered
+
+    def submit(self, fn, *args, **kwargs):
+        future = super().submit(fn, *args, **kwargs)
+        self.entered.wait()
+        return future
+
+
+def test_code_started_at_queue_deadline_is_not_reported_busy(monkeypatch):
+    entered = threading.Event()
+    monkeypatch.setattr(stock_manage, "quote_executor", EagerExecutor(entered))
+
+    def fetch(code):
+        entered.set()
+        time.sleep(0.2)
+        return {"code": code}
+
+    # 排队超时与线程开始同时发生：已开始执行的调用应等待结果，而不是报 busy
+    result = asyncio.run(stock_manage._fetch_in_pool(fetch, "600519", timeout=1, queue_timeout=0))
+    assert result == {"code": "600519"}
@@ -36,6 +36,11 @@ DATA_COLLECTORS = {
         'log_dir': str(ROOT_DIR / 'backend_core' / 'logs'),  # 日志目录
         'db_file': str(DB_DIR / 'stock_analysis.db'),  # 数据库文件路径
         'max_connection_errors': 10,  # 最大连接错误次数
+        'bulk_ingest': True,  # 实时行情批量入库（COPY + 集合合并）
+        'fetch_workers': 8,  # 历史行情并发抓取线程数
+        'fetch_rate_per_second': 8,  # 单个上游主机每秒请求上限
+        'fetch_burst': 8,  # 令牌桶突发容量
+        'write_batch_size': 500,  # 写入线程每批入库的股票数
     }
 }
 
@@ -5,7 +5,7 @@ AKShare数据采集器基类
 
 import akshare as ak
 import pandas as pd
-from typing import Optional, Dict, Any, Callable, TypeVar, Any, List, Union
+from typing import Optional, Dict, Any, Callable, TypeVar, Any, List, Union, Iterable, Iterator, Mapping, Sequence
 from datetime import datetime, timedelta
 import logging
 import time
@@ -21,6 +21,170 @@ from config.config import DATA_COLLECTORS
 
 T = TypeVar('T')
 
+# ---------------------------------------------------------------------------
+# 列映射：akshare 中文列 -> 数据库字段
+# ---------------------------------------------------------------------------
+
+# stock_zh_a_spot_em -> stock_realtime_quote
+REALTIME_QUOTE_COLUMNS = {
+    '代码': 'code',
+    '名称': 'name',
+    '最新价': 'current_price',
+    '涨跌幅': 'change_percent',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '最高': 'high',
+    '最低': 'low',
+    '今开': 'open',
+    '昨收': 'pre_close',
+    '换手率': 'turnover_rate',
+    '市盈率-动态': 'pe_dynamic',
+    '总市值': 'total_market_value',
+    '市净率': 'pb_ratio',
+    '流通市值': 'circulating_market_value',
+}
+
+# stock_zh_a_hist -> historical_quotes
+HISTORICAL_QUOTE_COLUMNS = {
+    '日期': 'date',
+    '开盘': 'open',
+    '收盘': 'close',
+    '最高': 'high',
+    '最低': 'low',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '振幅': 'amplitude',
+    '涨跌幅': 'change_percent',
+    '涨跌额': 'change',
+    '换手率': 'turnover_rate',
+}
+
+# stock_zh_index_spot_em -> index_realtime_quotes
+INDEX_SPOT_COLUMNS = {
+    '代码': 'code',
+    '名称': 'name',
+    '最新价': 'price',
+    '涨跌额': 'change',
+    '涨跌幅': 'pct_chg',
+    '今开': 'open',
+    '昨收': 'pre_close',
+    '最高': 'high',
+    '最低': 'low',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '振幅': 'amplitude',
+    '量比': 'volume_ratio',
+    'index_spot_type': 'index_spot_type',
+}
+
+# stock_board_industry_name_em -> industry_board_realtime_quotes
+INDUSTRY_BOARD_COLUMNS = {
+    '板块代码': 'board_code',
+    '板块名称': 'board_name',
+    '最新价': 'latest_price',
+    '涨跌额': 'change_amount',
+    '涨跌幅': 'change_percent',
+    '总市值': 'total_market_value',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '换手率': 'turnover_rate',
+    '领涨股': 'leading_stock_name',
+    '领涨股涨跌幅': 'leading_stock_change_percent',
+    '领涨股代码': 'leading_stock_code',
+}
+
+# stock_notice_report -> stock_notice_report
+NOTICE_REPORT_COLUMNS = {
+    '代码': 'code',
+    '名称': 'name',
+    '公告标题': 'notice_title',
+    '公告类型': 'notice_type',
+    '公告日期': 'publish_date',
+    '网址': 'url',
+}
+
+
+def normalize_frame(
+    df: pd.DataFrame,
+    column_map: Mapping[str, str],
+    numeric_columns: Optional[Iterable[str]] = None,
+    text_columns: Optional[Iterable[str]] = None,
+    stamps: Optional[Dict[str, Any]] = None,
+    strip_numeric_text: bool = False
+) -> pd.DataFrame:
+    """
+    对整张表做向量化规整：重命名中文列、数值列转型、去除文本空白、
+    写入时间戳列，最后把 NaN 统一替换为 None
+
+    Args:
+        df: akshare 返回的原始DataFrame
+        column_map: 中文列名 -> 数据库字段名，缺失的列会被忽略
+        numeric_columns: 需要转为数值的字段（映射后的名字）
+        text_columns: 需要去除首尾空白的字段（映射后的名字）
+        stamps: 需要整列写入的常量，如 {'update_time': now}
+        strip_numeric_text: 数值列是否先剔除非数字字符（如 "1,234.5%"）
+
+    Returns:
+        pd.DataFrame: 规整后的DataFrame，元素为可直接绑定的 Python 对象
+    """
+    keep_cols = [col for col in column_map if col in df.columns]
+    frame = df[keep_cols].rename(columns=column_map)
+
+    for col in numeric_columns or ():
+        if col not in frame.columns:
+            continue
+        series = frame[col]
+        if strip_numeric_text and series.dtype == object:
+            series = series.astype(str).str.replace(r'[^\d\.\-]', '', regex=True)
+        frame[col] = pd.to_numeric(series, errors='coerce')
+
+    for col in text_columns or ():
+        if col in frame.columns:
+            frame[col] = frame[col].astype('string').str.strip()
+
+    for col, value in (stamps or {}).items():
+        frame[col] = value
+
+    return frame.astype(object).where(frame.notna(), None)
+
+
+def frame_to_records(df: pd.DataFrame, columns: Sequence[str]) -> List[tuple]:
+    """
+    按指定列顺序把规整后的DataFrame转为元组列表（用于 COPY / execute_values）
+
+    Args:
+        df: normalize_frame 的输出
+        columns: 列顺序
+
+    Returns:
+        List[tuple]: 记录元组
+    """
+    return list(df[list(columns)].itertuples(index=False, name=None))
+
+
+def iter_param_batches(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[str]] = None,
+    batch_size: int = 1000
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    把规整后的DataFrame切分为参数字典批次，可直接传给
+    session.execute(text(sql), batch) 做 executemany
+
+    Args:
+        df: normalize_frame 的输出
+        columns: 需要输出的列，默认全部
+        batch_size: 每批条数
+
+    Yields:
+        List[Dict[str, Any]]: 一批参数字典
+    """
+    if columns is not None:
+        df = df[list(columns)]
+    records = df.to_dict('records')
+    for start in range(0, len(records), batch_size):
+        yield records[start:start + batch_size]
+
 class AKShareCollector:
     """AKShare数据采集器基类"""
     
@@ -0,0 +1,276 @@
+"""
+并发抓取引擎
+有界线程池并发调用上游接口，按主机做令牌桶限流，失败时按抖动指数退避重试，
+抓取结果统一交给单个写入线程分批入库
+"""
+
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, Type
+
+
+class TokenBucket:
+    """令牌桶限流器（线程安全）"""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            rate: 每秒补充的令牌数，<=0 表示不限流
+            capacity: 桶容量（允许的突发请求数），默认等于 rate
+            clock: 时钟函数，便于测试替换
+            sleep: 休眠函数，便于测试替换
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        获取令牌，不足时阻塞等待
+
+        Args:
+            tokens: 需要的令牌数
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(host: str, rate: float, capacity: Optional[float] = None) -> TokenBucket:
+    """
+    获取按主机共享的限流器，同一进程内访问同一上游的采集任务共用一个令牌桶
+
+    Args:
+        host: 上游主机标识
+        rate: 每秒请求数（仅首次创建时生效）
+        capacity: 突发容量（仅首次创建时生效）
+
+    Returns:
+        TokenBucket: 限流器
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = TokenBucket(rate, capacity)
+            _limiters[host] = limiter
+        return limiter
+
+
+@dataclass
+class FetchStats:
+    """一次抓取任务的统计信息"""
+    submitted: int = 0
+    fetched: int = 0
+    empty: int = 0
+    failed: int = 0
+    skipped: int = 0
+    written: int = 0
+    write_errors: int = 0
+    retries: int = 0
+    elapsed: float = 0.0
+    failures: Dict[Hashable, str] = field(default_factory=dict)
+
+
+_DONE = object()
+
+
+class ConcurrentFetchEngine:
+    """
+    并发抓取引擎
+
+    fetch_fn(key) 在工作线程中执行，返回任意结果（None 或空 DataFrame 视为无数据）；
+    writer_fn(items) 只在写入线程中执行，items 为 [(key, result), ...]，返回写入行数。
+    """
+
+    def __init__(
+        self,
+        fetch_fn: Callable[[Any], Any],
+        writer_fn: Callable[[List[Tuple[Any, Any]]], int],
+        max_workers: int = 8,
+        limiter: Optional[TokenBucket] = None,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+        retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        keep_empty: bool = False,
+        should_stop: Optional[Callable[[], bool]] = None,
+        logger: Optional[logging.Logger] = None,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            fetch_fn: 单个任务的抓取函数
+            writer_fn: 批量写入函数
+            max_workers: 并发线程数
+            limiter: 限流器，None 表示不限流
+            max_retries: 每个任务最多尝试次数
+            backoff_base: 退避基数（秒）
+            backoff_max: 单次退避上限（秒）
+            retry_on: 需要重试的异常类型
+            batch_size: 写入批大小（按结果条数计）
+            flush_interval: 写入线程最长攒批时间（秒）
+            keep_empty: 为 True 时空结果也交给写入函数（如需记录"无数据"的断点）
+            should_stop: 返回 True 时不再发起新的抓取
+            logger: 日志对象
+            sleep: 休眠函数，便于测试替换
+        """
+        self.fetch_fn = fetch_fn
+        self.writer_fn = writer_fn
+        self.max_workers = max(1, max_workers)
+        self.limiter = limiter
+        self.max_retries = max(1, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_on = retry_on
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.keep_empty = keep_empty
+        self.should_stop = should_stop or (lambda: False)
+        self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self._sleep = sleep
+
+    def _backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间（full jitter）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _fetch_one(self, key: Any, results: "queue.Queue", stats: FetchStats, stats_lock: threading.Lock):
+        if self.should_stop():
+            with stats_lock:
+                stats.skipped += 1
+            return
+        for attempt in range(self.max_retries):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                data = self.fetch_fn(key)
+            except self.retry_on as e:
+                if attempt < self.max_retries - 1 and not self.should_stop():
+                    with stats_lock:
+                        stats.retries += 1
+                    delay = self._backoff(attempt)
+                    self.logger.warning(f"抓取 {key} 第{attempt + 1}次失败，{delay:.2f}秒后重试: {e}")
+                    self._sleep(delay)
+                    continue
+                with stats_lock:
+                    stats.failed += 1
+                    stats.failures[key] = str(e)
+                self.logger.error(f"抓取 {key} 失败: {e}")
+                return
+            except Exception as e:
+                with stats_lock:
+                    stats.failed += 1
+                    stats.failures[key] = str(e)
+                self.logger.error(f"抓取 {key} 失败（不重试）: {e}")
+                return
+
+            is_empty = data is None or getattr(data, 'empty', False)
+            with stats_lock:
+                if is_empty:
+                    stats.empty += 1
+                else:
+                    stats.fetched += 1
+            if not is_empty or self.keep_empty:
+                results.put((key, data))
+            return
+
+    def _flush(self, batch: List[Tuple[Any, Any]], stats: FetchStats, stats_lock: threading.Lock):
+        if not batch:
+            return
+        try:
+            written = self.writer_fn(batch)
+        except Exception as e:
+            with stats_lock:
+                stats.write_errors += len(batch)
+                for key, _ in batch:
+                    stats.failures[key] = f"写入失败: {e}"
+            self.logger.error(f"批量写入 {len(batch)} 条结果失败: {e}", exc_info=True)
+            return
+        with stats_lock:
+            stats.written += written or 0
+
+    def _writer_loop(self, results: "queue.Queue", stats: FetchStats, stats_lock: threading.Lock):
+        batch: List[Tuple[Any, Any]] = []
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = results.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is _DONE:
+                self._flush(batch, stats, stats_lock)
+                return
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or (batch and time.monotonic() - last_flush >= self.flush_interval):
+                self._flush(batch, stats, stats_lock)
+                batch = []
+                last_flush = time.monotonic()
+
+    def run(self, keys: Iterable[Any]) -> FetchStats:
+        """
+        并发抓取全部任务并等待写入完成
+
+        Args:
+            keys: 任务键（如股票代码）
+
+        Returns:
+            FetchStats: 统计信息
+        """
+        stats = FetchStats()
+        stats_lock = threading.Lock()
+        # 有界队列：写入跟不上时让工作线程等待，避免结果在内存中无限堆积
+        results: "queue.Queue" = queue.Queue(maxsize=self.batch_size * 4)
+        started = time.perf_counter()
+
+        writer = threading.Thread(target=self._writer_loop, args=(results, stats, stats_lock), name='fetch-engine-writer', daemon=True)
+        writer.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fetch-engine') as pool:
+                for key in keys:
+                    stats.submitted += 1
+                    pool.submit(self._fetch_one, key, results, stats, stats_lock)
+        finally:
+            results.put(_DONE)
+            writer.join()
+        stats.elapsed = time.perf_counter() - started
+        self.logger.info(
+            f"抓取完成: 提交{stats.submitted}, 有数据{stats.fetched}, 无数据{stats.empty}, "
+            f"失败{stats.failed}, 跳过{stats.skipped}, 重试{stats.retries}, 写入{stats.written}, "
+            f"耗时{stats.elapsed:.1f}秒"
+        )
+        return stats
@@ -5,19 +5,96 @@
 
 import akshare as ak
 import pandas as pd
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Iterable, List, Set, Tuple
 from pathlib import Path
 import logging
 from datetime import datetime
-import time
 import signal
-from requests.exceptions import RequestException
 
 # 直接导入base模块
-from .base import AKShareCollector
+from .base import AKShareCollector, HISTORICAL_QUOTE_COLUMNS, normalize_frame, iter_param_batches
+from .fetch_engine import ConcurrentFetchEngine, get_rate_limiter
 from backend_core.database.db import SessionLocal
+from backend_core.utils.trading_calendar import get_trading_calendar
 from sqlalchemy import text
 
+HISTORICAL_NUMERIC_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'amount', 'change_percent']
+HISTORICAL_UPSERT_FIELDS = ['code', 'name', 'market', 'date'] + HISTORICAL_NUMERIC_FIELDS
+
+HISTORICAL_UPSERT_SQL = '''
+    INSERT INTO historical_quotes
+    (code, name, market, date, open, high, low, close, volume, amount, change_percent)
+    VALUES (:code, :name, :market, :date, :open, :high, :low, :close, :volume, :amount, :change_percent)
+    ON CONFLICT (code, date) DO UPDATE SET
+        name = EXCLUDED.name,
+        market = EXCLUDED.market,
+        open = EXCLUDED.open,
+        high = EXCLUDED.high,
+        low = EXCLUDED.low,
+        close = EXCLUDED.close,
+        volume = EXCLUDED.volume,
+        amount = EXCLUDED.amount,
+        change_percent = EXCLUDED.change_percent
+'''
+
+CHECKPOINT_UPSERT_SQL = '''
+    INSERT INTO historical_backfill_checkpoint (code, date, status, updated_at)
+    VALUES (:code, :date, :status, CURRENT_TIMESTAMP)
+    ON CONFLICT (code, date) DO UPDATE SET
+        status = EXCLUDED.status,
+        updated_at = EXCLUDED.updated_at
+'''
+
+
+def plan_backfill(
+    stocks: Iterable[Tuple[str, str]],
+    dates: List[str],
+    done: Set[Tuple[str, str]]
+) -> List[Tuple[str, str, Tuple[str, ...]]]:
+    """
+    根据断点记录计算每只股票仍需补采的日期
+
+    Args:
+        stocks: [(code, name), ...]
+        dates: 区间内应有的日期（YYYY-MM-DD，升序）
+        done: 已完成的 (code, date) 集合
+
+    Returns:
+        List[Tuple[str, str, Tuple[str, ...]]]: [(code, name, 缺失日期), ...]，已补齐的股票不出现
+    """
+    tasks = []
+    for code, name in stocks:
+        missing = tuple(d for d in dates if (code, d) not in done)
+        if missing:
+            tasks.append((code, name, missing))
+    return tasks
+
+
+def checkpoint_rows(code: str, dates: Iterable[str], fetched: Set[str]) -> List[Dict[str, str]]:
+    """
+    生成断点记录：有数据的日期记为 done；早于上游返回的最新日期却没有数据的（停牌）记为 empty；
+    晚于最新日期的可能是上游尚未发布或被限流返回了空结果，不记断点，下次运行重新补采
+
+    Args:
+        code: 股票代码
+        dates: 本次请求覆盖的缺失日期
+        fetched: 上游实际返回数据的日期集合（整个请求区间，不限于缺失日期）
+
+    Returns:
+        List[Dict[str, str]]: CHECKPOINT_UPSERT_SQL 的参数列表，上游整体无数据时为空
+    """
+    if not fetched:
+        return []
+    latest = max(fetched)
+    rows = []
+    for d in dates:
+        if d in fetched:
+            rows.append({'code': code, 'date': d, 'status': 'done'})
+        elif d < latest:
+            rows.append({'code': code, 'date': d, 'status': 'empty'})
+    return rows
+
+
 class HistoricalQuoteCollector(AKShareCollector):
     """历史行情数据采集器"""
     
@@ -68,60 +145,100 @@ class HistoricalQuoteCollector(AKShareCollector):
                 PRIMARY KEY (code, date)
             )
         '''))
+        session.execute(text('''
+            CREATE TABLE IF NOT EXISTS historical_backfill_checkpoint (
+                code TEXT,
+                date TEXT,
+                status TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (code, date)
+            )
+        '''))
         session.commit()
         session.close()
         return True
     
-    def _safe_value(self, val: Any) -> Optional[float]:
-        """
-        安全地转换数值
-        
-        Args:
-            val: 输入值
-            
-        Returns:
-            Optional[float]: 转换后的浮点数，如果转换失败则返回None
-        """
-        if pd.isna(val):
-            return None
-            
-        if isinstance(val, str):
-            import re
-            val = val.strip().replace('"', '').replace("'", '').replace(" ", '')
-            val = re.sub(r'[^\d\.\-]', '', val)
-            
-        try:
-            return float(val)
-        except Exception:
-            return None
-    
     def _fetch_stock_data(self, code: str, date_str: str) -> pd.DataFrame:
         """
-        获取单个股票的历史数据
-        
+        获取单个股票的历史数据（不做重试，重试和限流由并发抓取引擎负责）
+
         Args:
             code: 股票代码
             date_str: 日期字符串，格式：YYYYMMDD
-            
+
         Returns:
             pd.DataFrame: 历史行情数据
         """
-        return self._retry_on_failure(
-            ak.stock_zh_a_hist,
+        return ak.stock_zh_a_hist(
             symbol=code,
             period="daily",
             start_date=date_str,
             end_date=date_str,
             adjust="qfq"
         )
-    
+
+    def _build_engine(self, fetch_fn, writer_fn, keep_empty: bool = False) -> ConcurrentFetchEngine:
+        """
+        按配置创建并发抓取引擎，限流器按上游主机共享
+
+        Args:
+            fetch_fn: 单只股票的抓取函数
+            writer_fn: 批量写入函数
+            keep_empty: 空结果是否也交给写入函数
+
+        Returns:
+            ConcurrentFetchEngine: 抓取引擎
+        """
+        rate = self.config.get('fetch_rate_per_second', 8)
+        limiter = get_rate_limiter('eastmoney', rate, self.config.get('fetch_burst', rate))
+        return ConcurrentFetchEngine(
+            fetch_fn,
+            writer_fn,
+            max_workers=self.config.get('fetch_workers', 8),
+            limiter=limiter,
+            max_retries=self.config.get('max_retries', 3),
+            backoff_base=self.config.get('fetch_backoff_base', 0.5),
+            backoff_max=self.config.get('fetch_backoff_max', 10.0),
+            batch_size=self.config.get('write_batch_size', 500),
+            keep_empty=keep_empty,
+            should_stop=lambda: self.should_stop,
+            logger=self.logger
+        )
+
+    def _write_frames(self, items: List[Tuple[Tuple[str, str], pd.DataFrame]]) -> int:
+        """
+        写入线程：把一批股票的行情合并后批量 UPSERT，一批一个事务
+
+        Args:
+            items: [((code, name), DataFrame), ...]
+
+        Returns:
+            int: 写入行数
+        """
+        frame = pd.concat([df for _, df in items], ignore_index=True)
+        session = SessionLocal()
+        try:
+            written = 0
+            for params in iter_param_batches(frame, HISTORICAL_UPSERT_FIELDS):
+                session.execute(text(HISTORICAL_UPSERT_SQL), params)
+                written += len(params)
+            session.commit()
+            return written
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
     def collect_quotes(self, date_str: str) -> Tuple[int, int]:
         """
         采集指定日期的历史行情数据
-        
+
+        多线程并发抓取（按主机令牌桶限流、抖动退避重试），结果由单个写入线程分批入库。
+
         Args:
             date_str: 日期字符串，格式：YYYYMMDD
-            
+
         Returns:
             Tuple[int, int]: (成功数量, 失败数量)
         """
@@ -132,96 +249,177 @@ class HistoricalQuoteCollector(AKShareCollector):
             except ValueError:
                 self.logger.error("日期格式错误，请使用YYYYMMDD格式")
                 return 0, 0
-                
+
             # 获取股票列表
             stock_list = self._retry_on_failure(ak.stock_zh_a_spot_em)
-            total_stocks = len(stock_list)
-            
-            success_count = 0
-            error_count = 0
-            connection_error_count = 0
-            max_connection_errors = self.config.get('max_connection_errors', 10)
-            
-            self.logger.info(f"开始采集 {date_str} 的历史行情数据，共 {total_stocks} 只股票")
-            
-            # 连接数据库
-            session = self._init_db()
-            
-            # 遍历股票列表
-            for _, row in stock_list.iterrows():
-                if self.should_stop:
-                    self.logger.info("检测到中断信号，正在安全退出...")
-                    break
-                    
-                try:
-                    code = row['代码']
-                    name = row['名称']
-                    market = 'A股'
-                    
-                    # 获取历史数据
-                    try:
-                        df = self._fetch_stock_data(code, date_str)
-                    except RequestException as e:
-                        connection_error_count += 1
-                        self.logger.error(f"网络连接错误 ({connection_error_count}/{max_connection_errors}): {str(e)}")
-                        if connection_error_count >= max_connection_errors:
-                            self.logger.error("连接错误次数过多，程序退出")
-                            session.close()
-                            return success_count, error_count
-                        time.sleep(5)
-                        continue
-                    except Exception as e:
-                        self.logger.error(f"获取股票 {code} 数据时出错: {str(e)}")
-                        error_count += 1
-                        continue
-                        
-                    if df.empty:
-                        self.logger.warning(f"股票 {code} 在 {date_str} 没有交易数据")
-                        continue
-                        
-                    # 处理数据
-                    daily_data = df.iloc[0]
-                    try:
-                        session.execute(text('''
-                            INSERT OR REPLACE INTO historical_quotes
-                            (code, name, market, date, open, high, low, close,
-                             volume, amount, change_percent)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        '''), (
-                            code, name, market, date_str,
-                            self._safe_value(daily_data['开盘']),
-                            self._safe_value(daily_data['最高']),
-                            self._safe_value(daily_data['最低']),
-                            self._safe_value(daily_data['收盘']),
-                            self._safe_value(daily_data['成交量']),
-                            self._safe_value(daily_data['成交额']),
-                            self._safe_value(daily_data['涨跌幅'])
-                        ))
-                        session.commit()
-                        success_count += 1
-                        connection_error_count = 0
-                        
-                        if success_count % 100 == 0:
-                            self.logger.info(f"已处理 {success_count}/{total_stocks} 只股票")
-                            
-                    except Exception as e:
-                        error_count += 1
-                        self.logger.error(f"保存股票 {code} 数据时出错: {str(e)}")
-                        continue
-                        
-                except Exception as e:
-                    error_count += 1
-                    self.logger.error(f"处理股票 {code} 时出错: {str(e)}")
-                    continue
-                    
-            session.close()
-            self.logger.info(f"历史行情数据采集完成。成功: {success_count}, 失败: {error_count}")
-            
+            stocks = list(zip(stock_list['代码'], stock_list['名称']))
+            self.logger.info(f"开始采集 {date_str} 的历史行情数据，共 {len(stocks)} 只股票")
+
+            self._init_db()
+            market = 'A股'
+
+            def fetch(stock: Tuple[str, str]) -> Optional[pd.DataFrame]:
+                code, name = stock
+                df = self._fetch_stock_data(code, date_str)
+                if df is None or df.empty:
+                    return None
+                return normalize_frame(
+                    df.head(1),
+                    HISTORICAL_QUOTE_COLUMNS,
+                    numeric_columns=HISTORICAL_NUMERIC_FIELDS,
+                    stamps={'code': code, 'name': name, 'market': market},
+                    strip_numeric_text=True
+                )
+
+            stats = self._build_engine(fetch, self._write_frames).run(stocks)
+            success_count = stats.fetched - stats.write_errors
+            error_count = stats.failed + stats.write_errors
+            self.logger.info(
+                f"历史行情数据采集完成。成功: {success_count}, 失败: {error_count}, "
+                f"无数据: {stats.empty}, 耗时: {stats.elapsed:.1f}秒"
+            )
+
             if self.should_stop:
-                self.logger.info("程序被用户中断")
-                
+                self.logger.info(f"程序被用户中断，{stats.skipped} 只股票未采集")
+
             return success_count, error_count
-            
+
         except Exception as e:
             self.logger.error(f"采集历史行情数据时出错: {str(e)}", exc_info=True)
-            return 0, 0 
\ No newline at end of file
+            return 0, 0
+
+    def _load_checkpoints(self, start: str, end: str) -> Set[Tuple[str, str]]:
+        """
+        读取区间内已完成的 (code, date)
+
+        Args:
+            start: 开始日期，YYYY-MM-DD
+            end: 结束日期，YYYY-MM-DD
+
+        Returns:
+            Set[Tuple[str, str]]: 已完成的 (code, date) 集合
+        """
+        session = SessionLocal()
+        try:
+            rows = session.execute(text('''
+                SELECT code, date FROM historical_backfill_checkpoint
+                WHERE date BETWEEN :start AND :end AND status IN ('done', 'empty')
+            '''), {'start': start, 'end': end}).fetchall()
+            return {(row[0], row[1]) for row in rows}
+        finally:
+            session.close()
+
+    def _write_backfill(self, items: List[Tuple[Tuple[str, str, Tuple[str, ...]], pd.DataFrame]]) -> int:
+        """
+        写入线程：行情 UPSERT 与断点记录在同一事务内提交，中断后不会出现"已记断点但未入库"
+
+        Args:
+            items: [((code, name, 缺失日期), DataFrame), ...]
+
+        Returns:
+            int: 写入的行情行数
+        """
+        # 上游返回的是整个请求区间，只写入缺失日期；断点按完整返回结果判断
+        frames = [df[df['date'].isin(missing)] for (_, _, missing), df in items if not df.empty]
+        session = SessionLocal()
+        try:
+            written = 0
+            if frames:
+                frame = pd.concat(frames, ignore_index=True)
+                for params in iter_param_batches(frame, HISTORICAL_UPSERT_FIELDS):
+                    session.execute(text(HISTORICAL_UPSERT_SQL), params)
+                    written += len(params)
+            checkpoints = []
+            for (code, _, missing), df in items:
+                fetched = set(df['date']) if not df.empty else set()
+                checkpoints.extend(checkpoint_rows(code, missing, fetched))
+            if checkpoints:
+                session.execute(text(CHECKPOINT_UPSERT_SQL), checkpoints)
+            session.commit()
+            return written
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def backfill(self, start_date: str, end_date: str) -> Tuple[int, int]:
+        """
+        按日期区间补采历史行情，可断点续采
+
+        每只股票的缺失日期合并为一次 stock_zh_a_hist(start_date, end_date) 请求；
+        进度按 (code, date) 记录在 historical_backfill_checkpoint，重新运行时只补采缺失部分。
+
+        Args:
+            start_date: 开始日期，格式：YYYYMMDD
+            end_date: 结束日期，格式：YYYYMMDD
+
+        Returns:
+            Tuple[int, int]: (成功股票数, 失败股票数)
+        """
+        try:
+            try:
+                start = datetime.strptime(start_date, '%Y%m%d')
+                end = datetime.strptime(end_date, '%Y%m%d')
+            except ValueError:
+                self.logger.error("日期格式错误，请使用YYYYMMDD格式")
+                return 0, 0
+            if start > end:
+                self.logger.error("开始日期不能晚于结束日期")
+                return 0, 0
+
+            dates = get_trading_calendar().trading_days(start, end)
+            if not dates:
+                self.logger.info("区间内没有交易日，无需补采")
+                return 0, 0
+
+            self._init_db()
+            stock_list = self._retry_on_failure(ak.stock_zh_a_spot_em)
+            stocks = list(zip(stock_list['代码'], stock_list['名称']))
+            done = self._load_checkpoints(dates[0], dates[-1])
+            tasks = plan_backfill(stocks, dates, done)
+            self.logger.info(
+                f"补采 {start_date}-{end_date}：{len(stocks)} 只股票 × {len(dates)} 天，"
+                f"已完成 {len(done)} 条，待补采 {len(tasks)} 只股票"
+            )
+            if not tasks:
+                return 0, 0
+
+            market = 'A股'
+
+            def fetch(task: Tuple[str, str, Tuple[str, ...]]) -> pd.DataFrame:
+                code, name, missing = task
+                df = ak.stock_zh_a_hist(
+                    symbol=code,
+                    period="daily",
+                    start_date=missing[0].replace('-', ''),
+                    end_date=missing[-1].replace('-', ''),
+                    adjust="qfq"
+                )
+                if df is None or df.empty:
+                    return pd.DataFrame(columns=HISTORICAL_UPSERT_FIELDS)
+                frame = normalize_frame(
+                    df,
+                    HISTORICAL_QUOTE_COLUMNS,
+                    numeric_columns=HISTORICAL_NUMERIC_FIELDS,
+                    stamps={'code': code, 'name': name, 'market': market},
+                    strip_numeric_text=True
+                )
+                frame['date'] = pd.to_datetime(frame['date']).dt.strftime('%Y-%m-%d')
+                return frame
+
+            # 上游整体无数据时不记断点，空表无需交给写入线程
+            stats = self._build_engine(fetch, self._write_backfill).run(tasks)
+            success_count = stats.fetched + stats.empty - stats.write_errors
+            error_count = stats.failed + stats.write_errors
+            self.logger.info(
+                f"补采完成。成功: {success_count}, 失败: {error_count}, 写入 {stats.written} 行, "
+                f"耗时: {stats.elapsed:.1f}秒"
+            )
+            if self.should_stop:
+                self.logger.info(f"程序被用户中断，{stats.skipped} 只股票未补采，重新运行即可续采")
+            return success_count, error_count
+
+        except Exception as e:
+            self.logger.error(f"补采历史行情数据时出错: {str(e)}", exc_info=True)
+            return 0, 0
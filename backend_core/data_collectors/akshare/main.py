@@ -30,6 +30,12 @@ def run_historical_collector(date_str: str):
     success_count, error_count = collector.collect_quotes(date_str)
     print(f"历史行情数据采集完成。成功: {success_count}, 失败: {error_count}")
 
+def run_backfill(start_date: str, end_date: str):
+    """按日期区间补采历史行情（可断点续采）"""
+    collector = HistoricalQuoteCollector()
+    success_count, error_count = collector.backfill(start_date, end_date)
+    print(f"历史行情补采完成。成功: {success_count}, 失败: {error_count}")
+
 def run_index_collector():
     """运行指数行情采集器"""
     collector = IndexQuoteCollector()
@@ -54,10 +60,14 @@ if __name__ == '__main__':
     
     parser = argparse.ArgumentParser(description='AKShare数据采集工具')
     parser.add_argument('--type', type=str, required=True,
-                      choices=['realtime', 'historical', 'index'],
-                      help='采集类型：realtime(实时行情), historical(历史行情), index(指数行情)')
+                      choices=['realtime', 'historical', 'backfill', 'index'],
+                      help='采集类型：realtime(实时行情), historical(历史行情), backfill(区间补采), index(指数行情)')
     parser.add_argument('--date', type=str,
                       help='历史行情采集的日期，格式：YYYYMMDD')
+    parser.add_argument('--start', type=str,
+                      help='补采开始日期，格式：YYYYMMDD')
+    parser.add_argument('--end', type=str,
+                      help='补采结束日期，格式：YYYYMMDD')
     
     args = parser.parse_args()
     
@@ -68,5 +78,10 @@ if __name__ == '__main__':
             print("历史行情采集需要指定日期参数 --date")
             sys.exit(1)
         run_historical_collector(args.date)
+    elif args.type == 'backfill':
+        if not args.start or not args.end:
+            print("区间补采需要指定日期参数 --start 和 --end")
+            sys.exit(1)
+        run_backfill(args.start, args.end)
     elif args.type == 'index':
         run_index_collector() 
\ No newline at end of file
@@ -5,16 +5,19 @@
 
 import akshare as ak
 import pandas as pd
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from pathlib import Path
 import logging
 from datetime import datetime
+import time
 
 # 直接导入base模块
-from .base import AKShareCollector
-from backend_core.database.db import SessionLocal
+from .base import AKShareCollector, REALTIME_QUOTE_COLUMNS, normalize_frame, frame_to_records
+from backend_core.database.db import SessionLocal, copy_rows
 from sqlalchemy import text
 
+REALTIME_QUOTE_FIELDS = list(REALTIME_QUOTE_COLUMNS.values()) + ['update_time']
+
 class AkshareRealtimeQuoteCollector(AKShareCollector):
     """沪深京A股实时行情数据采集器"""
     
@@ -84,26 +87,189 @@ class AkshareRealtimeQuoteCollector(AKShareCollector):
         session.close()
         return True
     
-    def _safe_value(self, val: Any) -> Optional[float]:
+    def _build_records(self, df: pd.DataFrame, update_time: str) -> List[tuple]:
         """
-        安全地转换数值
-        
+        把行情快照转换为与 REALTIME_QUOTE_FIELDS 顺序一致的记录元组
+
         Args:
-            val: 输入值
-            
+            df: stock_zh_a_spot_em 返回的DataFrame
+            update_time: 本次快照的更新时间
+
         Returns:
-            Optional[float]: 转换后的浮点数，如果转换失败则返回None
+            List[tuple]: 记录元组列表，同一代码出现多次时保留最后一条（与逐行 UPSERT 的结果一致）
         """
-        return None if pd.isna(val) else float(val)
-    
+        frame = normalize_frame(
+            df,
+            REALTIME_QUOTE_COLUMNS,
+            numeric_columns=REALTIME_QUOTE_FIELDS[2:-1],
+            stamps={'update_time': update_time}
+        )
+        frame = frame.drop_duplicates('code', keep='last')
+        return frame_to_records(frame, REALTIME_QUOTE_FIELDS)
+
+    def _is_lock_error(self, e: Exception) -> bool:
+        """是否为锁等待超时或死锁错误"""
+        return ("LockNotAvailable" in str(e)) or ("DeadlockDetected" in str(e))
+
+    def _bulk_upsert(self, session, records: List[tuple]) -> int:
+        """
+        批量入库：COPY 到临时表，再用两条集合语句合并到
+        stock_basic_info 和 stock_realtime_quote，整个快照在一个事务内完成
+
+        Args:
+            session: 数据库会话
+            records: _build_records 生成的记录元组
+
+        Returns:
+            int: stock_realtime_quote 受影响的行数
+        """
+        columns = ', '.join(REALTIME_QUOTE_FIELDS)
+        update_set = ',\n                    '.join(
+            f'{col} = EXCLUDED.{col}' for col in REALTIME_QUOTE_FIELDS if col != 'code'
+        )
+        max_retries = 3
+        retry_count = 0
+        while True:
+            try:
+                session.execute(text('''
+                    CREATE TEMP TABLE tmp_stock_realtime_quote
+                    (LIKE stock_realtime_quote INCLUDING DEFAULTS) ON COMMIT DROP
+                '''))
+                copy_rows(session, 'tmp_stock_realtime_quote', REALTIME_QUOTE_FIELDS, records)
+                session.execute(text('''
+                    INSERT INTO stock_basic_info (code, name, create_date)
+                    SELECT DISTINCT ON (code) code, name, update_time
+                    FROM tmp_stock_realtime_quote
+                    ORDER BY code
+                    ON CONFLICT (code) DO UPDATE SET
+                        name = EXCLUDED.name,
+                        create_date = EXCLUDED.create_date
+                '''))
+                result = session.execute(text(f'''
+                    INSERT INTO stock_realtime_quote ({columns})
+                    SELECT DISTINCT ON (code) {columns}
+                    FROM tmp_stock_realtime_quote
+                    ORDER BY code
+                    ON CONFLICT (code) DO UPDATE SET
+                    {update_set}
+                '''))
+                return result.rowcount
+            except Exception as e:
+                session.rollback()
+                if self._is_lock_error(e) and retry_count < max_retries - 1:
+                    retry_count += 1
+                    self.logger.warning(f"实时行情批量合并锁冲突，第{retry_count}次重试: {e}")
+                    time.sleep(0.2 * retry_count)
+                    continue
+                raise
+
+    def _row_upsert(self, session, records: List[tuple]) -> int:
+        """
+        逐行入库（bulk_ingest 关闭时使用），每只股票两条 UPSERT 语句
+
+        Args:
+            session: 数据库会话
+            records: _build_records 生成的记录元组
+
+        Returns:
+            int: 成功写入的股票数量
+        """
+        affected_rows = 0
+        max_retries = 3
+        for record in records:
+            data = dict(zip(REALTIME_QUOTE_FIELDS, record))
+            code, name = data['code'], data['name']
+
+            # --- 重试机制插入 stock_basic_info ---
+            retry_count = 0
+            while retry_count < max_retries:
+                try:
+                    session.execute(text('''
+                        INSERT INTO stock_basic_info (code, name, create_date)
+                        VALUES (:code, :name, :create_date)
+                        ON CONFLICT (code) DO UPDATE SET
+                            name = EXCLUDED.name,
+                            create_date = EXCLUDED.create_date
+                    '''), {'code': code, 'name': name, 'create_date': data['update_time']})
+                    break
+                except Exception as e:
+                    if self._is_lock_error(e):
+                        retry_count += 1
+                        session.rollback()
+                        self.logger.warning(f"stock_basic_info插入锁冲突，第{retry_count}次重试: {e}")
+                        time.sleep(0.2 * retry_count)
+                        continue
+                    else:
+                        session.rollback()
+                        raise
+            if retry_count >= max_retries:
+                self.logger.error(f"stock_basic_info插入锁冲突重试{max_retries}次仍失败: code={code}, name={name}")
+                continue
+
+            # --- 重试机制插入 stock_realtime_quote ---
+            retry_count = 0
+            while retry_count < max_retries:
+                try:
+                    session.execute(
+                        text('''
+                            INSERT INTO stock_realtime_quote
+                            (code, name, current_price, change_percent, volume, amount,
+                            high, low, open, pre_close, turnover_rate, pe_dynamic,
+                            total_market_value, pb_ratio, circulating_market_value,
+                            update_time)
+                            VALUES (
+                                :code, :name, :current_price, :change_percent, :volume, :amount,
+                                :high, :low, :open, :pre_close, :turnover_rate, :pe_dynamic,
+                                :total_market_value, :pb_ratio, :circulating_market_value,
+                                :update_time
+                            )
+                            ON CONFLICT (code) DO UPDATE SET
+                                name = EXCLUDED.name,
+                                current_price = EXCLUDED.current_price,
+                                change_percent = EXCLUDED.change_percent,
+                                volume = EXCLUDED.volume,
+                                amount = EXCLUDED.amount,
+                                high = EXCLUDED.high,
+                                low = EXCLUDED.low,
+                                open = EXCLUDED.open,
+                                pre_close = EXCLUDED.pre_close,
+                                turnover_rate = EXCLUDED.turnover_rate,
+                                pe_dynamic = EXCLUDED.pe_dynamic,
+                                total_market_value = EXCLUDED.total_market_value,
+                                pb_ratio = EXCLUDED.pb_ratio,
+                                circulating_market_value = EXCLUDED.circulating_market_value,
+                                update_time = EXCLUDED.update_time
+                        '''),
+                        data)
+                    break
+                except Exception as e:
+                    if self._is_lock_error(e):
+                        retry_count += 1
+                        session.rollback()
+                        self.logger.warning(f"stock_realtime_quote插入锁冲突，第{retry_count}次重试: {e}")
+                        time.sleep(0.2 * retry_count)
+                        continue
+                    else:
+                        session.rollback()
+                        raise
+            if retry_count >= max_retries:
+                self.logger.error(f"stock_realtime_quote插入锁冲突重试{max_retries}次仍失败: code={code}, name={name}")
+                continue
+
+            affected_rows += 1
+        return affected_rows
+
     def collect_quotes(self) -> bool:
         """
         采集实时行情数据
+
+        默认走批量入库（配置项 bulk_ingest），整份快照一次 COPY + 两条合并语句；
+        关闭后退回逐行 UPSERT。
+
         Returns:
             bool: 是否成功
         """
         try:
-            affected_rows = 0 
             session = SessionLocal()
             df = self._retry_on_failure(ak.stock_zh_a_spot_em)
             if df is None or (hasattr(df, 'empty') and df.empty):
@@ -111,108 +277,13 @@ class AkshareRealtimeQuoteCollector(AKShareCollector):
                 return False
             self.logger.info("采集到 %d 条股票行情数据", len(df))
 
-            for _, row in df.iterrows():
-                code = row['代码']
-                name = row['名称']
-                data = {
-                    'code': code,
-                    'name': name,
-                    'current_price': self._safe_value(row['最新价']),
-                    'change_percent': self._safe_value(row['涨跌幅']),
-                    'volume': self._safe_value(row['成交量']),
-                    'amount': self._safe_value(row['成交额']),
-                    'high': self._safe_value(row['最高']),
-                    'low': self._safe_value(row['最低']),
-                    'open': self._safe_value(row['今开']),
-                    'pre_close': self._safe_value(row['昨收']),
-                    'turnover_rate': self._safe_value(row['换手率']),
-                    'pe_dynamic': self._safe_value(row['市盈率-动态']),
-                    'total_market_value': self._safe_value(row['总市值']),
-                    'pb_ratio': self._safe_value(row['市净率']),
-                    'circulating_market_value': self._safe_value(row['流通市值']),
-                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-
-                # --- 重试机制插入 stock_basic_info ---
-                max_retries = 3
-                retry_count = 0
-                while retry_count < max_retries:
-                    try:
-                        session.execute(text('''
-                            INSERT INTO stock_basic_info (code, name, create_date)
-                            VALUES (:code, :name, :create_date)
-                            ON CONFLICT (code) DO UPDATE SET
-                                name = EXCLUDED.name,
-                                create_date = EXCLUDED.create_date
-                        '''), {'code': code, 'name': name, 'create_date': data['update_time']})
-                        break
-                    except Exception as e:
-                        if ("LockNotAvailable" in str(e)) or ("DeadlockDetected" in str(e)):
-                            retry_count += 1
-                            session.rollback()
-                            self.logger.warning(f"stock_basic_info插入锁冲突，第{retry_count}次重试: {e}")
-                            import time
-                            time.sleep(0.2 * retry_count)
-                            continue
-                        else:
-                            session.rollback()
-                            raise
-                if retry_count >= max_retries:
-                    self.logger.error(f"stock_basic_info插入锁冲突重试{max_retries}次仍失败: code={code}, name={name}")
-                    continue
-
-                # --- 重试机制插入 stock_realtime_quote ---
-                retry_count = 0
-                while retry_count < max_retries:
-                    try:
-                        session.execute(    
-                            text('''
-                                INSERT INTO stock_realtime_quote
-                                (code, name, current_price, change_percent, volume, amount,
-                                high, low, open, pre_close, turnover_rate, pe_dynamic,
-                                total_market_value, pb_ratio, circulating_market_value,
-                                update_time)
-                                VALUES (
-                                    :code, :name, :current_price, :change_percent, :volume, :amount,
-                                    :high, :low, :open, :pre_close, :turnover_rate, :pe_dynamic,
-                                    :total_market_value, :pb_ratio, :circulating_market_value,
-                                    :update_time
-                                )
-                                ON CONFLICT (code) DO UPDATE SET
-                                    name = EXCLUDED.name,
-                                    current_price = EXCLUDED.current_price,
-                                    change_percent = EXCLUDED.change_percent,
-                                    volume = EXCLUDED.volume,
-                                    amount = EXCLUDED.amount,
-                                    high = EXCLUDED.high,
-                                    low = EXCLUDED.low,
-                                    open = EXCLUDED.open,
-                                    pre_close = EXCLUDED.pre_close,
-                                    turnover_rate = EXCLUDED.turnover_rate,
-                                    pe_dynamic = EXCLUDED.pe_dynamic,
-                                    total_market_value = EXCLUDED.total_market_value,
-                                    pb_ratio = EXCLUDED.pb_ratio,
-                                    circulating_market_value = EXCLUDED.circulating_market_value,
-                                    update_time = EXCLUDED.update_time
-                            '''), 
-                            {'code': code, 'name': name, 'current_price': data['current_price'], 'change_percent': data['change_percent'], 'volume': data['volume'], 'amount': data['amount'], 'high': data['high'], 'low': data['low'], 'open': data['open'], 'pre_close': data['pre_close'], 'turnover_rate': data['turnover_rate'], 'pe_dynamic': data['pe_dynamic'], 'total_market_value': data['total_market_value'], 'pb_ratio': data['pb_ratio'], 'circulating_market_value': data['circulating_market_value'], 'update_time': data['update_time']})
-                        break
-                    except Exception as e:
-                        if ("LockNotAvailable" in str(e)) or ("DeadlockDetected" in str(e)):
-                            retry_count += 1
-                            session.rollback()
-                            self.logger.warning(f"stock_realtime_quote插入锁冲突，第{retry_count}次重试: {e}")
-                            import time
-                            time.sleep(0.2 * retry_count)
-                            continue
-                        else:
-                            session.rollback()
-                            raise
-                if retry_count >= max_retries:
-                    self.logger.error(f"stock_realtime_quote插入锁冲突重试{max_retries}次仍失败: code={code}, name={name}")
-                    continue
-
-                affected_rows += 1
+            records = self._build_records(df, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            started = time.perf_counter()
+            if self.config.get('bulk_ingest', True):
+                affected_rows = self._bulk_upsert(session, records)
+            else:
+                affected_rows = self._row_upsert(session, records)
+            self.logger.info("实时行情入库 %d 条，耗时 %.3f 秒", affected_rows, time.perf_counter() - started)
 
             # 记录操作日志
             session.execute(text('''
@@ -6,6 +6,13 @@ from pathlib import Path
 from backend_core.config.config import DATA_COLLECTORS
 from backend_core.database.db import SessionLocal
 from sqlalchemy import text
+from .base import INDEX_SPOT_COLUMNS, normalize_frame, iter_param_batches
+
+INDEX_SPOT_NUMERIC_FIELDS = [
+    'price', 'change', 'pct_chg', 'open', 'pre_close', 'high', 'low',
+    'volume', 'amount', 'amplitude', 'volume_ratio'
+]
+INDEX_SPOT_FIELDS = ['code', 'name'] + INDEX_SPOT_NUMERIC_FIELDS + ['update_time', 'collect_time', 'index_spot_type']
 
 class RealtimeIndexSpotAkCollector:
     def __init__(self, db_path=None):
@@ -73,12 +80,17 @@ class RealtimeIndexSpotAkCollector:
             df = pd.concat([df1, df2, df3], ignore_index=True)
             # 去重
             df = df.drop_duplicates(subset=['代码'], keep='first')
-            df['collect_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            df['update_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            records = normalize_frame(
+                df,
+                INDEX_SPOT_COLUMNS,
+                numeric_columns=INDEX_SPOT_NUMERIC_FIELDS,
+                stamps={'update_time': now, 'collect_time': now}
+            )
             affected_rows = 0
             # 清空表
             session.execute(text('DELETE FROM index_realtime_quotes'))
-            for _, row in df.iterrows():
+            for batch in iter_param_batches(records, INDEX_SPOT_FIELDS):
                 session.execute(text('''
                     INSERT INTO index_realtime_quotes (
                         code, name, price, change, pct_chg, open, pre_close, high, low, volume, amount, amplitude, volume_ratio, update_time, collect_time, index_spot_type
@@ -101,12 +113,8 @@ class RealtimeIndexSpotAkCollector:
                         update_time = EXCLUDED.update_time,
                         collect_time = EXCLUDED.collect_time,
                         index_spot_type = EXCLUDED.index_spot_type
-                '''), 
-                {'code': row['代码'], 'name': row['名称'], 'price': row['最新价'], 'change': row['涨跌额'], 'pct_chg': row['涨跌幅'], 'open': row['今开'], 'pre_close': row['昨收'],
-                    'high': row['最高'], 'low': row['最低'], 'volume': row['成交量'], 'amount': row['成交额'], 'amplitude': row['振幅'], 
-                    'volume_ratio': row['量比'], 'update_time': row['update_time'], 'collect_time': row['collect_time'], 'index_spot_type': row['index_spot_type']
-                })
-                affected_rows += 1
+                '''), batch)
+                affected_rows += len(batch)
             # 记录操作日志
             session.execute(text('''
                 INSERT INTO realtime_collect_operation_logs 
@@ -6,6 +6,12 @@ import os
 from backend_core.config.config import DATA_COLLECTORS
 from backend_core.database.db import SessionLocal
 from sqlalchemy import text
+from .base import INDUSTRY_BOARD_COLUMNS, normalize_frame, iter_param_batches
+
+INDUSTRY_BOARD_NUMERIC_FIELDS = [
+    'latest_price', 'change_amount', 'change_percent', 'total_market_value',
+    'volume', 'amount', 'turnover_rate', 'leading_stock_change_percent'
+]
 
 class RealtimeStockIndustryBoardCollector:
     def __init__(self):
@@ -21,47 +27,25 @@ class RealtimeStockIndustryBoardCollector:
     def save_to_db(self, df):
         session = SessionLocal()
         try:
-            # 字段映射：中文->英文
-            col_map = {
-                "板块代码": "board_code",
-                "板块名称": "board_name",
-                "最新价": "latest_price",
-                "涨跌额": "change_amount",
-                "涨跌幅": "change_percent",
-                "总市值": "total_market_value",
-                "成交量": "volume",
-                "成交额": "amount",
-                "换手率": "turnover_rate",
-                "领涨股": "leading_stock_name",
-                "领涨股涨跌幅": "leading_stock_change_percent",
-                "领涨股代码": "leading_stock_code"
-            }
-            # 只保留映射字段
+            # 字段映射：中文->英文，只保留映射字段
             now = datetime.now().replace(microsecond=0)
-            keep_cols = [k for k in col_map.keys() if k in df.columns]
-            df = df[keep_cols].rename(columns=col_map)
-            df['update_time'] = now
+            df = normalize_frame(
+                df,
+                INDUSTRY_BOARD_COLUMNS,
+                numeric_columns=INDUSTRY_BOARD_NUMERIC_FIELDS,
+                stamps={'update_time': now.isoformat()}
+            )
             columns = list(df.columns)
             # 清空旧数据（可选，或用upsert）
             session.execute(text(f"DELETE FROM {self.table_name}"))
             # 插入新数据（upsert）
-            for _, row in df.iterrows():
-                value_dict = {}
-                for col in columns:
-                    v = row[col]
-                    if hasattr(v, 'item'):
-                        v = v.item()
-                    if str(type(v)).endswith("Timestamp'>"):
-                        v = v.to_pydatetime().isoformat()
-                    if col == 'update_time' and not isinstance(v, str):
-                        v = v.isoformat()
-                    value_dict[col] = v
-                placeholders = ','.join([f':{col}' for col in columns])
-                col_names = ','.join([f'"{col}"' for col in columns])
-                # 构造upsert SQL
-                update_set = ','.join([f'"{col}"=EXCLUDED."{col}"' for col in columns if col not in ('board_code','update_time')])
-                sql = f'INSERT INTO {self.table_name} ({col_names}) VALUES ({placeholders}) ON CONFLICT (board_code, update_time) DO UPDATE SET {update_set}'
-                session.execute(text(sql), value_dict)
+            placeholders = ','.join([f':{col}' for col in columns])
+            col_names = ','.join([f'"{col}"' for col in columns])
+            # 构造upsert SQL
+            update_set = ','.join([f'"{col}"=EXCLUDED."{col}"' for col in columns if col not in ('board_code','update_time')])
+            sql = f'INSERT INTO {self.table_name} ({col_names}) VALUES ({placeholders}) ON CONFLICT (board_code, update_time) DO UPDATE SET {update_set}'
+            for batch in iter_param_batches(df, columns):
+                session.execute(text(sql), batch)
             session.commit()
             return True, None
         except Exception as e:
@@ -12,10 +12,12 @@ from datetime import datetime, date
 import time
 
 # 直接导入base模块
-from .base import AKShareCollector
+from .base import AKShareCollector, NOTICE_REPORT_COLUMNS, normalize_frame, iter_param_batches
 from backend_core.database.db import SessionLocal
 from sqlalchemy import text
 
+NOTICE_REPORT_FIELDS = list(NOTICE_REPORT_COLUMNS.values())
+
 def convert_dates(obj):
     if isinstance(obj, dict):
         return {k: convert_dates(v) for k, v in obj.items()}
@@ -146,41 +148,31 @@ class AkshareStockNoticeReportCollector(AKShareCollector):
             self.logger.info(f"采集到 {len(df)} 条A股公告数据")
             
             # 批量处理数据
+            records = normalize_frame(
+                df,
+                NOTICE_REPORT_COLUMNS,
+                text_columns=NOTICE_REPORT_FIELDS,
+                stamps={'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+            )
+            records['url'] = records['url'].fillna('')
             affected_rows = 0
-            for _, row in df.iterrows():
-                try:
-                    # 准备数据
-                    data = {
-                        'code': str(row['代码']).strip(),
-                        'name': str(row['名称']).strip(),
-                        'notice_title': str(row['公告标题']).strip(),
-                        'notice_type': str(row['公告类型']).strip(),
-                        'publish_date': str(row['公告日期']).strip(),
-                        'url': str(row['网址']).strip() if pd.notna(row['网址']) else '',
-                        'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    
-                    # 插入或更新数据（PostgreSQL UPSERT）
-                    data = convert_dates(data)
-                    session.execute(
-                        text('''
-                            INSERT INTO stock_notice_report
-                            (code, name, notice_title, notice_type, publish_date, url, updated_at)
-                            VALUES (:code, :name, :notice_title, :notice_type, :publish_date, :url, :updated_at)
-                            ON CONFLICT (code, notice_title, publish_date)
-                            DO UPDATE SET
-                                name = EXCLUDED.name,
-                                notice_type = EXCLUDED.notice_type,
-                                url = EXCLUDED.url,
-                                updated_at = EXCLUDED.updated_at
-                        '''),
-                        data
-                    )
-                    affected_rows += 1
-                    
-                except Exception as e:
-                    self.logger.warning(f"处理单条公告数据时出错: {str(e)}, 数据: {row.to_dict()}")
-                    raise
+            for batch in iter_param_batches(records, NOTICE_REPORT_FIELDS + ['updated_at']):
+                # 插入或更新数据（PostgreSQL UPSERT）
+                session.execute(
+                    text('''
+                        INSERT INTO stock_notice_report
+                        (code, name, notice_title, notice_type, publish_date, url, updated_at)
+                        VALUES (:code, :name, :notice_title, :notice_type, :publish_date, :url, :updated_at)
+                        ON CONFLICT (code, notice_title, publish_date)
+                        DO UPDATE SET
+                            name = EXCLUDED.name,
+                            notice_type = EXCLUDED.notice_type,
+                            url = EXCLUDED.url,
+                            updated_at = EXCLUDED.updated_at
+                    '''),
+                    batch
+                )
+                affected_rows += len(batch)
             
             # 记录操作日志
             log_data = {
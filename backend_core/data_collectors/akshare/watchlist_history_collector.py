@@ -1,15 +1,22 @@
-import time
 from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
 import akshare as ak
+import pandas as pd
 from sqlalchemy.orm import Session
-from sqlalchemy import exists
-from backend_core.database.db import get_db
+from sqlalchemy import exists, func
+from backend_core.config.config import DATA_COLLECTORS
+from backend_core.database.db import get_db, bulk_upsert
+from backend_core.data_collectors.akshare.base import HISTORICAL_QUOTE_COLUMNS, normalize_frame, iter_param_batches
+from backend_core.data_collectors.akshare.fetch_engine import ConcurrentFetchEngine, get_rate_limiter
 
 # 假设有自选股表 watchlist，字段 code
 from backend_core.models.watchlist import Watchlist  # 需根据实际路径调整
 from backend_core.models.historical_quotes import HistoricalQuotes  # 需根据实际路径调整
 from backend_core.models.watchlist_history_collection_logs import WatchlistHistoryCollectionLogs  # 需根据实际路径调整
 
+FULL_HISTORY_START = '19940101'
+WATCHLIST_HISTORY_FIELDS = ['code', 'name'] + list(HISTORICAL_QUOTE_COLUMNS.values())
+
 def get_watchlist_codes(db: Session):
     """获取自选股股票代码列表，去重。"""
     codes = db.query(Watchlist.stock_code).distinct().all()
@@ -38,7 +45,6 @@ def log_collection(db: Session, stock_code: str, affected_rows: int, status: str
 
 def insert_historical_quotes(db: Session, stock_code: str, df):
     """批量插入历史行情数据，避免重复插入。"""
-    rows = []
     # 根据code从watchlist表获取股票名称
     stock_name = None
     result = db.query(Watchlist.stock_name).filter(Watchlist.stock_code == stock_code).first()
@@ -46,73 +52,145 @@ def insert_historical_quotes(db: Session, stock_code: str, df):
         stock_name = result[0]
     print(f"stock_name: {stock_name}")
 
-    for _, row in df.iterrows():
-        hq = HistoricalQuotes(
-            code=stock_code,
-            name=stock_name,
-            date=row.get('日期'),
-            open=row.get('开盘'),
-            close=row.get('收盘'),
-            high=row.get('最高'),
-            low=row.get('最低'),
-            volume=row.get('成交量'),
-            amount=row.get('成交额'),
-            amplitude=row.get('振幅'),
-            change_percent=row.get('涨跌幅'),
-            change=row.get('涨跌额'),
-            turnover_rate=row.get('换手率')
-            #adjust='qfq'
-        )
-        rows.append(hq)
-    if rows:
-        # 执行upsert操作，避免重复插入
-        # 这里只能用原生SQL或SQLAlchemy的merge/on_conflict等方式，以下为通用实现（以PostgreSQL为例，其他数据库需调整语法）
-        from sqlalchemy.dialects.postgresql import insert
-
-        for hq in rows:
-            stmt = insert(HistoricalQuotes).values(
-                code=hq.code,
-                name=hq.name,    # 新增股票名称字段      
-                date=hq.date,
-                open=hq.open,
-                close=hq.close,
-                high=hq.high,
-                low=hq.low,
-                volume=hq.volume,
-                amount=hq.amount,
-                amplitude=hq.amplitude,
-                change_percent=hq.change_percent,
-                change=hq.change,
-                turnover_rate=hq.turnover_rate
-                #adjust=hq.adjust
-            ).on_conflict_do_update(
-                index_elements=['code', 'date'],
-                set_={
-                    'name': hq.name,
-                    'open': hq.open,
-                    'close': hq.close,
-                    'high': hq.high,
-                    'low': hq.low,
-                    'volume': hq.volume,
-                    'amount': hq.amount,
-                    'amplitude': hq.amplitude,
-                    'change_percent': hq.change_percent,
-                    'change': hq.change,
-                    'turnover_rate': hq.turnover_rate
-                    #'adjust': hq.adjust
-                }
-            )
-            db.execute(stmt)
+    records = normalize_frame(
+        df,
+        HISTORICAL_QUOTE_COLUMNS,
+        numeric_columns=[col for col in HISTORICAL_QUOTE_COLUMNS.values() if col != 'date'],
+        stamps={'code': stock_code, 'name': stock_name}
+        #adjust='qfq'
+    )
+    if records.empty:
+        return 0
+
+    # 执行upsert操作，避免重复插入（以PostgreSQL为例，其他数据库需调整语法）
+    from sqlalchemy.dialects.postgresql import insert
+
+    stmt = insert(HistoricalQuotes)
+    update_cols = [col for col in records.columns if col not in ('code', 'date')]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['code', 'date'],
+        set_={col: stmt.excluded[col] for col in update_cols}
+    )
+    for batch in iter_param_batches(records):
+        db.execute(stmt, batch)
+    db.commit()
+    return len(records)
+
+def get_latest_dates(db: Session, codes) -> Dict[str, datetime]:
+    """一次分组查询取得各股票已入库的最新交易日。"""
+    codes = list(codes)
+    if not codes:
+        return {}
+    rows = db.query(HistoricalQuotes.code, func.max(HistoricalQuotes.date)) \
+        .filter(HistoricalQuotes.code.in_(codes)) \
+        .group_by(HistoricalQuotes.code) \
+        .all()
+    return {code: pd.Timestamp(latest) for code, latest in rows if latest is not None}
+
+def plan_incremental(codes, latest_dates: Dict[str, datetime], end_date: str) -> List[Tuple[str, str]]:
+    """
+    计算每只股票需要补采的起始日期，已是最新的股票不出现。
+
+    Args:
+        codes: 自选股代码
+        latest_dates: get_latest_dates 的结果
+        end_date: 截止日期，格式YYYYMMDD
+
+    Returns:
+        List[Tuple[str, str]]: [(code, start_date), ...]，从未采集过的股票从 FULL_HISTORY_START 开始
+    """
+    tasks = []
+    for code in sorted(codes):
+        latest = latest_dates.get(code)
+        start = (latest + timedelta(days=1)).strftime('%Y%m%d') if latest is not None else FULL_HISTORY_START
+        if start <= end_date:
+            tasks.append((code, start))
+    return tasks
+
+def _build_limiter():
+    """与其他东方财富接口采集任务共享的限流器。"""
+    config = DATA_COLLECTORS.get('akshare', {})
+    rate = config.get('fetch_rate_per_second', 8)
+    return get_rate_limiter('eastmoney', rate, config.get('fetch_burst', rate))
+
+def collect_watchlist_incremental():
+    """
+    自选股历史行情增量采集：只补采每只股票最新交易日之后的数据，所有新增行一次多行 UPSERT 写入。
+    返回采集成功的股票数量和失败的股票数量。
+    """
+    db = next(get_db())
+    try:
+        codes = set(get_watchlist_codes(db))
+        names = dict(db.query(Watchlist.stock_code, Watchlist.stock_name).all())
+        end_date = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
+        tasks = plan_incremental(codes, get_latest_dates(db, codes), end_date)
+        print(f"自选股 {len(codes)} 只，需增量采集 {len(tasks)} 只")
+        if not tasks:
+            return {"success": 0, "fail": 0}
+
+        def fetch(task):
+            code, start_date = task
+            return ak.stock_zh_a_hist(symbol=code, period='daily', start_date=start_date, end_date=end_date, adjust='qfq')
+
+        frames = []
+
+        def collect(items):
+            for (code, _), df in items:
+                frames.append(normalize_frame(
+                    df,
+                    HISTORICAL_QUOTE_COLUMNS,
+                    numeric_columns=[col for col in HISTORICAL_QUOTE_COLUMNS.values() if col != 'date'],
+                    stamps={'code': code, 'name': names.get(code)}
+                ).reindex(columns=WATCHLIST_HISTORY_FIELDS))
+            return 0
+
+        config = DATA_COLLECTORS.get('akshare', {})
+        stats = ConcurrentFetchEngine(
+            fetch,
+            collect,
+            max_workers=config.get('fetch_workers', 8),
+            limiter=_build_limiter(),
+            max_retries=config.get('max_retries', 3)
+        ).run(tasks)
+
+        affected = {}
+        if frames:
+            records = pd.concat(frames, ignore_index=True)
+            records = records.astype(object).where(records.notna(), None)
+            bulk_upsert(db, HistoricalQuotes.__tablename__, WATCHLIST_HISTORY_FIELDS,
+                        records.itertuples(index=False, name=None), ['code', 'date'])
+            affected = records.groupby('code').size().to_dict()
+
+        now = datetime.now()
+        db.add_all([
+            WatchlistHistoryCollectionLogs(stock_code=code, affected_rows=affected.get(code, 0),
+                                           status='success', created_at=now)
+            for code, start in tasks if (code, start) not in stats.failures
+        ] + [
+            WatchlistHistoryCollectionLogs(stock_code=code, affected_rows=0, status='fail',
+                                           error_message=stats.failures[(code, start)], created_at=now)
+            for code, start in tasks if (code, start) in stats.failures
+        ])
         db.commit()
-    return len(rows)
+        return {"success": len(tasks) - stats.failed, "fail": stats.failed}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
-def collect_watchlist_history():
+def collect_watchlist_history(incremental: bool = True):
     """
     自选股历史行情采集主函数。
+    incremental 为 True 时只补采缺失的尾部数据；为 False 时对未采集过的股票全量重建
+    （先删除再从 FULL_HISTORY_START 重新采集，用于前复权价格需要整体刷新的场景）。
     返回采集成功的股票数量和失败的股票数量。
     """
+    if incremental:
+        return collect_watchlist_incremental()
     db = next(get_db())
     codes = get_watchlist_codes(db)
+    limiter = _build_limiter()
     success_count = 0
     fail_count = 0
     for stock_code in set(codes):
@@ -120,7 +198,8 @@ def collect_watchlist_history():
             continue
         try:
             end_date = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
-            df = ak.stock_zh_a_hist(symbol=stock_code, period='daily', start_date='19940101', end_date=end_date, adjust='qfq')
+            limiter.acquire()
+            df = ak.stock_zh_a_hist(symbol=stock_code, period='daily', start_date=FULL_HISTORY_START, end_date=end_date, adjust='qfq')
             # 批量插入前，先删除该stock_code的历史数据
             db.query(HistoricalQuotes).filter(HistoricalQuotes.code == stock_code).delete()
             affected_rows = insert_historical_quotes(db, stock_code, df)
@@ -130,5 +209,4 @@ def collect_watchlist_history():
             db.rollback()
             log_collection(db, stock_code, 0, 'fail', str(e))
             fail_count += 1
-        time.sleep(10)
     return {"success": success_count, "fail": fail_count}
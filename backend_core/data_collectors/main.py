@@ -1,7 +1,7 @@
 import sys
 import logging
 from apscheduler.schedulers.blocking import BlockingScheduler
-from datetime import datetime, timedelta
+from datetime import datetime
 from backend_core.data_collectors.akshare.realtime import AkshareRealtimeQuoteCollector
 from backend_core.data_collectors.tushare.historical import HistoricalQuoteCollector
 from backend_core.data_collectors.tushare.realtime import RealtimeQuoteCollector
@@ -11,6 +11,8 @@ from backend_core.data_collectors.akshare.realtime_stock_industry_board_ak impor
 from backend_core.data_collectors.akshare.realtime_stock_notice_report_ak import AkshareStockNoticeReportCollector
 from apscheduler.schedulers.background import BackgroundScheduler
 from backend_core.data_collectors.akshare.watchlist_history_collector import collect_watchlist_history
+from backend_core.utils.trading_calendar import get_trading_calendar
+from backend_core.database.db import SessionLocal
 import time
 
 
@@ -28,6 +30,9 @@ scheduler = BlockingScheduler()
 
 def collect_akshare_realtime():
     try:
+        if not get_trading_calendar().is_trading_day(datetime.now()):
+            logging.info("[定时任务] 今日非交易日，跳过 AKShare 实时行情采集")
+            return
         logging.info("[定时任务] AKShare 实时行情采集开始...")
         df = ak_collector.collect_quotes()
         # 可在此处保存数据到数据库或文件
@@ -45,21 +50,33 @@ def collect_akshare_index_realtime():
 
 def collect_tushare_historical():
     try:
-        today = datetime.now()
-        if today.weekday() == 5:  # 周六
-            today = today - timedelta(days=1)
-        elif today.weekday() == 6:  # 周日
-            today = today - timedelta(days=2)
-        elif today.weekday() == 0:  # 周一
-            today = today - timedelta(days=3)
-        else:  # 周二到周五
-            today = today - timedelta(days=1)
-        today = today.strftime('%Y%m%d')
+        # 采集上一个交易日（跳过周末和节假日）
+        today = get_trading_calendar().previous_trading_day(datetime.now()).strftime('%Y%m%d')
         logging.info(f"[定时任务] Tushare 历史行情采集开始，日期: {today}")
-        tushare_hist_collector.collect_historical_quotes(today)
+        if not tushare_hist_collector.collect_historical_quotes(today):
+            # 日线未写入时不刷新快照，避免用旧数据覆盖
+            logging.error("[定时任务] Tushare 历史行情采集失败，跳过指标快照刷新")
+            return
         logging.info("[定时任务] Tushare 历史行情采集完成")
     except Exception as e:
         logging.error(f"[定时任务] Tushare 历史行情采集异常: {e}")
+        return
+    refresh_indicator_snapshot()
+
+def refresh_indicator_snapshot():
+    """日线入库后刷新全市场指标快照，供分析接口按主键读取"""
+    try:
+        # 指标计算在 backend_api 中实现，只在需要时导入
+        from backend_api.stock.indicator_snapshot import refresh_indicator_snapshot as refresh
+        logging.info("[定时任务] 指标快照刷新开始...")
+        db = SessionLocal()
+        try:
+            count = refresh(db)
+        finally:
+            db.close()
+        logging.info(f"[定时任务] 指标快照刷新完成，共 {count} 只股票")
+    except Exception as e:
+        logging.error(f"[定时任务] 指标快照刷新异常: {e}")
 
 def collect_tushare_realtime():
     try:
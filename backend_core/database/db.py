@@ -1,7 +1,8 @@
-
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+import csv
+import io
 
 Base = declarative_base()
 
@@ -30,4 +31,78 @@ def get_db():
         yield db
     finally:
         if db.is_active:
-            db.close()
\ No newline at end of file
+            db.close()
+
+def copy_rows(session, table: str, columns, rows) -> int:
+    """
+    通过 COPY FROM STDIN 把记录批量写入表（通常是会话内的临时表），
+    与 session 共用同一连接和事务。
+
+    Args:
+        session: SQLAlchemy 会话
+        table: 目标表名
+        columns: 列名序列
+        rows: 与 columns 顺序一致的元组序列，None 写为 NULL
+
+    Returns:
+        int: 写入的行数
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for row in rows:
+        writer.writerow(['' if v is None else v for v in row])
+        count += 1
+    if count == 0:
+        return 0
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')",
+            buffer
+        )
+    finally:
+        cursor.close()
+    return count
+
+def bulk_upsert(session, table: str, columns, rows, conflict_columns, update_columns=None,
+                do_nothing: bool = False, page_size: int = 1000) -> int:
+    """
+    多行 INSERT ... ON CONFLICT 批量写入（psycopg2 execute_values），
+    与 session 共用同一连接和事务，提交由调用方负责。
+
+    Args:
+        session: SQLAlchemy 会话
+        table: 目标表名
+        columns: 列名序列
+        rows: 与 columns 顺序一致的元组序列
+        conflict_columns: 冲突判定列（主键或唯一索引）
+        update_columns: 冲突时更新的列，默认除冲突列外的全部列
+        do_nothing: 为 True 时冲突行保持不变
+        page_size: 每条 INSERT 语句包含的行数
+
+    Returns:
+        int: 提交给数据库的行数
+    """
+    from psycopg2.extras import execute_values
+
+    rows = list(rows)
+    if not rows:
+        return 0
+    if do_nothing:
+        action = 'DO NOTHING'
+    else:
+        if update_columns is None:
+            update_columns = [c for c in columns if c not in conflict_columns]
+        action = 'DO UPDATE SET ' + ', '.join(f'{c} = EXCLUDED.{c}' for c in update_columns)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s "
+        f"ON CONFLICT ({', '.join(conflict_columns)}) {action}"
+    )
+    cursor = session.connection().connection.cursor()
+    try:
+        execute_values(cursor, sql, rows, page_size=page_size)
+    finally:
+        cursor.close()
+    return len(rows)
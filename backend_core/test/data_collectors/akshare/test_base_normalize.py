@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from backend_core.data_collectors.akshare.base import (
+    HISTORICAL_QUOTE_COLUMNS,
+    REALTIME_QUOTE_COLUMNS,
+    frame_to_records,
+    iter_param_batches,
+    normalize_frame,
+)
+
+
+def test_normalize_frame_renames_and_converts_nan():
+    df = pd.DataFrame({
+        '代码': ['000001', '600000'],
+        '名称': [' 平安银行 ', '浦发银行'],
+        '最新价': [10.5, np.nan],
+        '涨跌幅': ['1.2', '-'],
+        '无关列': [1, 2],
+    })
+    frame = normalize_frame(
+        df,
+        REALTIME_QUOTE_COLUMNS,
+        numeric_columns=['current_price', 'change_percent'],
+        text_columns=['name'],
+        stamps={'update_time': '2024-01-02 15:00:00'},
+    )
+    assert list(frame.columns) == ['code', 'name', 'current_price', 'change_percent', 'update_time']
+    rows = frame.to_dict('records')
+    assert rows[0] == {
+        'code': '000001', 'name': '平安银行', 'current_price': 10.5,
+        'change_percent': 1.2, 'update_time': '2024-01-02 15:00:00',
+    }
+    assert rows[1]['current_price'] is None
+    assert rows[1]['change_percent'] is None
+
+
+def test_normalize_frame_strips_numeric_text():
+    df = pd.DataFrame({'日期': ['2024-01-02'], '成交额': ['1,234.5元'], '换手率': ['0.8%']})
+    frame = normalize_frame(
+        df,
+        HISTORICAL_QUOTE_COLUMNS,
+        numeric_columns=['amount', 'turnover_rate'],
+        strip_numeric_text=True,
+    )
+    assert frame.loc[0, 'amount'] == 1234.5
+    assert frame.loc[0, 'turnover_rate'] == 0.8
+
+
+def test_records_and_batches():
+    df = pd.DataFrame({'代码': [f'{i:06d}' for i in range(5)], '最新价': [1.0, 2.0, np.nan, 4.0, 5.0]})
+    frame = normalize_frame(df, REALTIME_QUOTE_COLUMNS, numeric_columns=['current_price'])
+    assert frame_to_records(frame, ['current_price', 'code'])[2] == (None, '000002')
+    batches = list(iter_param_batches(frame, ['code'], batch_size=2))
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert batches[-1] == [{'code': '000004'}]
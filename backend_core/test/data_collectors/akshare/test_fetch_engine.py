@@ -0,0 +1,99 @@
+import threading
+
+from backend_core.data_collectors.akshare.fetch_engine import ConcurrentFetchEngine, TokenBucket
+
+
+def test_engine_fetches_concurrently_and_writes_from_single_thread():
+    writer_threads = set()
+    written = []
+
+    def fetch(key):
+        if key % 5 == 0:
+            return None
+        return {'key': key}
+
+    def write(items):
+        writer_threads.add(threading.current_thread().name)
+        written.extend(key for key, _ in items)
+        return len(items)
+
+    engine = ConcurrentFetchEngine(fetch, write, max_workers=4, batch_size=7, flush_interval=0.05)
+    stats = engine.run(range(50))
+
+    assert stats.submitted == 50
+    assert stats.empty == 10
+    assert stats.fetched == 40
+    assert stats.written == 40
+    assert sorted(written) == [k for k in range(50) if k % 5 != 0]
+    assert writer_threads == {'fetch-engine-writer'}
+
+
+def test_engine_retries_then_records_failures():
+    attempts = {}
+    lock = threading.Lock()
+
+    def fetch(key):
+        with lock:
+            attempts[key] = attempts.get(key, 0) + 1
+            count = attempts[key]
+        if key == 'flaky' and count < 3:
+            raise ConnectionError('reset')
+        if key == 'dead':
+            raise ConnectionError('down')
+        return key
+
+    delays = []
+    engine = ConcurrentFetchEngine(
+        fetch, lambda items: len(items),
+        max_workers=2, max_retries=3, backoff_base=0.1, sleep=delays.append
+    )
+    stats = engine.run(['ok', 'flaky', 'dead'])
+
+    assert stats.fetched == 2
+    assert stats.failed == 1
+    assert 'dead' in stats.failures
+    assert attempts == {'ok': 1, 'flaky': 3, 'dead': 3}
+    assert stats.retries == 4
+    assert all(0 <= d <= 0.2 for d in delays)
+
+
+def test_engine_write_failure_is_counted_not_raised():
+    def write(items):
+        raise RuntimeError('db down')
+
+    stats = ConcurrentFetchEngine(lambda k: k, write, max_workers=2).run([1, 2, 3])
+    assert stats.written == 0
+    assert stats.write_errors == 3
+
+
+def test_engine_should_stop_skips_remaining():
+    stats = ConcurrentFetchEngine(lambda k: k, lambda items: len(items), should_stop=lambda: True).run(range(5))
+    assert stats.skipped == 5
+    assert stats.fetched == 0
+
+
+def test_token_bucket_waits_when_empty():
+    now = [0.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0.5
+    assert slept == [0.5]
+
+
+def test_engine_keep_empty_passes_empty_results_to_writer():
+    written = []
+    engine = ConcurrentFetchEngine(
+        lambda k: None if k == 'none' else k,
+        lambda items: written.extend(items) or len(items),
+        keep_empty=True,
+    )
+    stats = engine.run(['a', 'none'])
+    assert stats.empty == 1
+    assert sorted(written, key=str) == [('a', 'a'), ('none', None)]
@@ -0,0 +1,86 @@
+import pandas as pd
+
+from backend_core.data_collectors.akshare import historical
+from backend_core.data_collectors.akshare.historical import checkpoint_rows, plan_backfill
+
+
+def test_plan_backfill_only_returns_missing_pairs():
+    dates = ['2024-01-02', '2024-01-03', '2024-01-04']
+    stocks = [('000001', '平安银行'), ('600000', '浦发银行'), ('000002', '万科A')]
+    done = {
+        ('000001', '2024-01-02'), ('000001', '2024-01-03'), ('000001', '2024-01-04'),
+        ('600000', '2024-01-02'),
+    }
+
+    tasks = plan_backfill(stocks, dates, done)
+
+    assert tasks == [
+        ('600000', '浦发银行', ('2024-01-03', '2024-01-04')),
+        ('000002', '万科A', tuple(dates)),
+    ]
+
+
+def test_checkpoint_rows_marks_missing_dates_empty():
+    rows = checkpoint_rows('600000', ['2024-01-03', '2024-01-04'], {'2024-01-04'})
+    assert rows == [
+        {'code': '600000', 'date': '2024-01-03', 'status': 'empty'},
+        {'code': '600000', 'date': '2024-01-04', 'status': 'done'},
+    ]
+
+
+def test_checkpoint_rows_leaves_dates_after_latest_unrecorded():
+    # 上游最新只到 01-04：01-05 可能尚未发布，不记断点，下次重新补采
+    rows = checkpoint_rows('600000', ['2024-01-03', '2024-01-05'], {'2024-01-02', '2024-01-04'})
+    assert rows == [{'code': '600000', 'date': '2024-01-03', 'status': 'empty'}]
+
+
+def test_checkpoint_rows_records_nothing_for_empty_response():
+    # 整体空结果（限流或尚未发布）不能变成永久缺口
+    assert checkpoint_rows('600000', ['2024-01-03', '2024-01-04'], set()) == []
+
+
+class FakeSession:
+    """记录每条语句的参数"""
+
+    def __init__(self):
+        self.executed = []
+        self.committed = False
+
+    def execute(self, statement, params=None):
+        self.executed.append((' '.join(str(statement).split()), params))
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_write_backfill_writes_missing_dates_and_skips_empty_checkpoints(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(historical, 'SessionLocal', lambda: session)
+    collector = historical.HistoricalQuoteCollector.__new__(historical.HistoricalQuoteCollector)
+    frame = pd.DataFrame({
+        'code': '600000', 'name': '浦发银行', 'market': 'A股',
+        'date': ['2024-01-02', '2024-01-04'],
+        'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0, 'amount': 1.0, 'change_percent': 0.0,
+    })
+    items = [
+        (('600000', '浦发银行', ('2024-01-03', '2024-01-04', '2024-01-05')), frame),
+        (('000001', '平安银行', ('2024-01-03',)), pd.DataFrame(columns=historical.HISTORICAL_UPSERT_FIELDS)),
+    ]
+
+    written = collector._write_backfill(items)
+
+    assert written == 1
+    quotes = [params for sql, params in session.executed if sql.startswith('INSERT INTO historical_quotes')]
+    assert [row['date'] for batch in quotes for row in batch] == ['2024-01-04']
+    checkpoints = [params for sql, params in session.executed if 'historical_backfill_checkpoint' in sql]
+    assert checkpoints == [[
+        {'code': '600000', 'date': '2024-01-03', 'status': 'empty'},
+        {'code': '600000', 'date': '2024-01-04', 'status': 'done'},
+    ]]
+    assert session.committed
@@ -0,0 +1,126 @@
+import logging
+
+import pandas as pd
+import pytest
+
+from backend_core.data_collectors.akshare import realtime
+from backend_core.data_collectors.akshare.realtime import REALTIME_QUOTE_FIELDS, AkshareRealtimeQuoteCollector
+
+
+class FakeResult:
+    rowcount = 2
+
+
+class FakeSession:
+    """记录执行的语句；fail_on 中的语句前缀依次抛出对应异常"""
+
+    def __init__(self, fail_on=None):
+        self.statements = []
+        self.rollbacks = 0
+        self.fail_on = list(fail_on or [])
+
+    def execute(self, statement, params=None):
+        sql = ' '.join(str(statement).split())
+        self.statements.append(sql)
+        if self.fail_on and sql.startswith(self.fail_on[0][0]):
+            raise self.fail_on.pop(0)[1]
+        return FakeResult()
+
+    def rollback(self):
+        self.rollbacks += 1
+        # 事务回滚后 ON COMMIT DROP 的临时表随之消失
+        self.statements.append('ROLLBACK')
+
+
+def make_collector():
+    collector = AkshareRealtimeQuoteCollector.__new__(AkshareRealtimeQuoteCollector)
+    collector.logger = logging.getLogger('test_realtime_bulk')
+    return collector
+
+
+def spot_frame():
+    return pd.DataFrame({
+        '序号': [1, 2, 3],
+        '代码': ['600000', '000001', '600000'],
+        '名称': ['浦发银行', '平安银行', '浦发银行'],
+        '最新价': [10.0, 12.0, 10.2],
+        '涨跌幅': [1.0, -0.5, 2.0],
+        '成交量': [1000, 2000, 1100],
+        '成交额': [1e4, 2.4e4, 1.1e4],
+        '最高': [10.5, 12.5, 10.5],
+        '最低': [9.8, 11.8, 9.8],
+        '今开': [9.9, 12.1, 9.9],
+        '昨收': [9.9, 12.06, 10.0],
+        '换手率': [0.1, 0.2, 0.11],
+        '市盈率-动态': [5.0, '-', 5.1],
+        '总市值': [3e11, 2e11, 3e11],
+        '市净率': [0.5, 0.6, 0.5],
+        '流通市值': [2.9e11, 1.9e11, 2.9e11],
+        '60日涨跌幅': [3.0, 4.0, 3.0],
+    })
+
+
+def test_build_records_column_order_and_duplicate_codes():
+    records = make_collector()._build_records(spot_frame(), '2024-01-02 10:00:00')
+
+    assert REALTIME_QUOTE_FIELDS[0] == 'code' and REALTIME_QUOTE_FIELDS[-1] == 'update_time'
+    assert all(len(record) == len(REALTIME_QUOTE_FIELDS) for record in records)
+    rows = [dict(zip(REALTIME_QUOTE_FIELDS, record)) for record in records]
+    # 同一快照中重复的代码只保留最后一条
+    assert [row['code'] for row in rows] == ['000001', '600000']
+    assert rows[1]['current_price'] == 10.2 and rows[1]['change_percent'] == 2.0
+    assert rows[0]['pe_dynamic'] is None
+    assert rows[0]['update_time'] == '2024-01-02 10:00:00'
+
+
+def test_bulk_upsert_copies_then_merges(monkeypatch):
+    copies = []
+    monkeypatch.setattr(realtime, 'copy_rows', lambda session, table, columns, rows: copies.append((table, columns, rows)))
+    session = FakeSession()
+    records = make_collector()._build_records(spot_frame(), '2024-01-02 10:00:00')
+
+    assert make_collector()._bulk_upsert(session, records) == 2
+
+    assert copies == [('tmp_stock_realtime_quote', REALTIME_QUOTE_FIELDS, records)]
+    create, basic, quote = session.statements
+    assert create.startswith('CREATE TEMP TABLE tmp_stock_realtime_quote') and 'ON COMMIT DROP' in create
+    assert basic.startswith('INSERT INTO stock_basic_info (code, name, create_date)')
+    assert 'SELECT DISTINCT ON (code) code, name, update_time FROM tmp_stock_realtime_quote' in basic
+    columns = ', '.join(REALTIME_QUOTE_FIELDS)
+    assert quote.startswith(f'INSERT INTO stock_realtime_quote ({columns}) SELECT DISTINCT ON (code) {columns}')
+    assert 'code = EXCLUDED.code' not in quote
+    assert all(f'{col} = EXCLUDED.{col}' in quote for col in REALTIME_QUOTE_FIELDS[1:])
+
+
+def test_bulk_upsert_retry_recreates_temp_table(monkeypatch):
+    copies = []
+    monkeypatch.setattr(realtime, 'copy_rows', lambda session, table, columns, rows: copies.append(table))
+    monkeypatch.setattr(realtime.time, 'sleep', lambda seconds: None)
+    session = FakeSession(fail_on=[('INSERT INTO stock_realtime_quote', RuntimeError('DeadlockDetected: deadlock detected'))])
+    records = make_collector()._build_records(spot_frame(), '2024-01-02 10:00:00')
+
+    assert make_collector()._bulk_upsert(session, records) == 2
+
+    assert session.rollbacks == 1
+    # 回滚后重新建临时表、重新 COPY，再合并
+    rollback = session.statements.index('ROLLBACK')
+    assert session.statements[rollback + 1].startswith('CREATE TEMP TABLE tmp_stock_realtime_quote')
+    assert sum(sql.startswith('CREATE TEMP TABLE') for sql in session.statements) == 2
+    assert copies == ['tmp_stock_realtime_quote', 'tmp_stock_realtime_quote']
+
+
+def test_bulk_upsert_raises_non_lock_errors_and_gives_up_after_retries(monkeypatch):
+    monkeypatch.setattr(realtime, 'copy_rows', lambda *args: None)
+    monkeypatch.setattr(realtime.time, 'sleep', lambda seconds: None)
+    records = make_collector()._build_records(spot_frame(), '2024-01-02 10:00:00')
+
+    session = FakeSession(fail_on=[('INSERT INTO stock_basic_info', ValueError('bad data'))])
+    with pytest.raises(ValueError):
+        make_collector()._bulk_upsert(session, records)
+    assert session.rollbacks == 1
+
+    lock = RuntimeError('LockNotAvailable: could not obtain lock')
+    session = FakeSession(fail_on=[('CREATE TEMP TABLE', lock)] * 3)
+    with pytest.raises(RuntimeError):
+        make_collector()._bulk_upsert(session, records)
+    assert session.rollbacks == 3
@@ -0,0 +1,17 @@
+import pandas as pd
+
+from backend_core.data_collectors.akshare.watchlist_history_collector import FULL_HISTORY_START, plan_incremental
+
+
+def test_plan_incremental_fetches_only_missing_tail():
+    latest = {
+        '000001': pd.Timestamp('2024-01-05'),
+        '600000': pd.Timestamp('2024-01-10'),
+    }
+
+    tasks = plan_incremental({'000001', '600000', '300750'}, latest, '20240110')
+
+    assert tasks == [
+        ('000001', '20240106'),
+        ('300750', FULL_HISTORY_START),
+    ]
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+from backend_core.data_collectors.tushare.historical import HISTORICAL_FIELDS, HistoricalQuoteCollector
+
+
+def test_build_frame_computes_turnover_and_amplitude_vectorized():
+    df = pd.DataFrame({
+        'ts_code': ['600000.SH', '000001.SZ', '300001.SZ'],
+        'open': [10.0, 12.0, 5.0],
+        'high': [11.0, 13.0, 5.5],
+        'low': [9.5, 11.5, 4.5],
+        'close': [10.5, 12.5, 5.0],
+        'pre_close': [10.0, 0, 5.0],
+        'change': [0.5, 0.5, 0.0],
+        'vol': [10000, 20000, 3000],
+        'amount': [100000, 250000, None],
+        'pct_chg': [5.0, 4.1, 0.0],
+    })
+    basic = pd.DataFrame(
+        {'name': ['浦发银行', '平安银行'], 'total_share': [100000000.0, None]},
+        index=pd.Index(['600000', '000001'], name='code'),
+    )
+
+    frame = HistoricalQuoteCollector.__new__(HistoricalQuoteCollector)._build_frame(df, basic, '20240102')
+
+    assert list(frame.columns) == HISTORICAL_FIELDS
+    rows = frame.set_index('code')
+    assert rows.loc['600000', 'name'] == '浦发银行'
+    assert rows.loc['600000', 'turnover_rate'] == pytest.approx(1.0)
+    assert rows.loc['600000', 'amplitude'] == pytest.approx(15.0)
+    assert rows.loc['600000', 'amount'] == pytest.approx(100000000)
+    assert rows.loc['600000', 'date'] == '2024-01-02'
+    # 总股本缺失、昨收为0、未知股票均得到 None
+    assert rows.loc['000001', 'turnover_rate'] is None
+    assert rows.loc['000001', 'amplitude'] is None
+    assert rows.loc['300001', 'name'] == ''
+    assert rows.loc['300001', 'amount'] is None
@@ -71,4 +71,35 @@ def test_collect_historical_quotes(mock_set_token, mock_pro_api, tmp_path):
     rows = cursor.fetchall()
     assert ("600000", "浦发银行") in rows
     assert ("000001", "平安银行") in rows
-    conn.close() 
\ No newline at end of file
+    conn.close() 
+
+@patch("backend_core.data_collectors.tushare.historical.bulk_upsert")
+@patch("backend_core.data_collectors.tushare.historical.SessionLocal")
+@patch("tushare.pro_api")
+@patch("tushare.set_token")
+def test_collect_historical_quotes_returns_false_when_write_fails(mock_set_token, mock_pro_api, mock_session, mock_upsert):
+    mock_pro = MagicMock()
+    mock_pro.daily.return_value = pd.DataFrame({"ts_code": ["600000.SH"], "vol": [100], "close": [10.0]})
+    mock_pro_api.return_value = mock_pro
+    mock_upsert.side_effect = RuntimeError("connection reset")
+    collector = HistoricalQuoteCollector({"token": "fake_token"})
+    collector._init_db = MagicMock()
+    collector._load_basic_info = MagicMock(return_value=pd.DataFrame(
+        {"name": ["浦发银行"], "total_share": [1e8]}, index=pd.Index(["600000"], name="code")))
+
+    assert collector.collect_historical_quotes("20240101") is False
+
+
+@pytest.mark.parametrize("collected", [True, False])
+def test_snapshot_refresh_only_after_successful_collect(monkeypatch, collected):
+    from backend_core.data_collectors import main
+    refreshed = []
+    calendar = MagicMock()
+    calendar.previous_trading_day.return_value = pd.Timestamp("2024-01-02")
+    monkeypatch.setattr(main, "get_trading_calendar", lambda: calendar)
+    monkeypatch.setattr(main.tushare_hist_collector, "collect_historical_quotes", lambda date_str: collected)
+    monkeypatch.setattr(main, "refresh_indicator_snapshot", lambda: refreshed.append(True))
+
+    main.collect_tushare_historical()
+
+    assert refreshed == ([True] if collected else [])
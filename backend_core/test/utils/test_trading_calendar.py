@@ -0,0 +1,42 @@
+from datetime import date
+
+from backend_core.utils.trading_calendar import TradingCalendar, load_trading_calendar
+
+# 2024-02-09 至 2024-02-16 为春节休市
+DAYS = ['2024-02-05', '2024-02-06', '2024-02-07', '2024-02-08', '2024-02-19', '2024-02-20']
+
+
+def test_is_trading_day_accepts_various_formats():
+    cal = TradingCalendar(DAYS)
+    assert cal.is_trading_day('2024-02-08')
+    assert cal.is_trading_day('20240219')
+    assert cal.is_trading_day(date(2024, 2, 20))
+    assert not cal.is_trading_day('2024-02-12')
+    assert not cal.is_trading_day('2024-01-02')  # 早于日历起点
+
+
+def test_previous_trading_day_skips_holidays():
+    cal = TradingCalendar(DAYS)
+    assert cal.previous_trading_day('2024-02-19') == date(2024, 2, 8)
+    assert cal.previous_trading_day('2024-02-14') == date(2024, 2, 8)
+    assert cal.previous_trading_day('2024-02-19', inclusive=True) == date(2024, 2, 19)
+    assert cal.previous_trading_day('2024-02-05') is None
+    # 超出日历范围按工作日估计：2024-02-26 为周一
+    assert cal.previous_trading_day('2024-02-26') == date(2024, 2, 23)
+
+
+def test_trading_days_between_and_list():
+    cal = TradingCalendar(DAYS)
+    assert cal.trading_days_between('2024-02-06', '2024-02-19') == 4
+    assert cal.trading_days_between('2024-02-10', '2024-02-18') == 0
+    assert cal.trading_days_between('2024-02-19', '2024-02-06') == 0
+    # 2024-02-21 ~ 2024-02-23 超出日历范围，按工作日计数
+    assert cal.trading_days_between('2024-02-20', '2024-02-25') == 4
+    assert cal.trading_days('20240207', '20240219') == ['2024-02-07', '2024-02-08', '2024-02-19']
+
+
+def test_load_trading_calendar_reads_local_file(tmp_path):
+    path = tmp_path / 'trade_calendar.csv'
+    path.write_text('trade_date\n' + '\n'.join(DAYS) + '\n')
+    cal = load_trading_calendar(path)
+    assert len(cal) == len(DAYS)
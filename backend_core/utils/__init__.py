@@ -0,0 +1,12 @@
+"""
+工具模块
+提供交易日历等采集端与API共用的工具
+"""
+
+from .trading_calendar import TradingCalendar, get_trading_calendar, load_trading_calendar
+
+__all__ = [
+    'TradingCalendar',
+    'get_trading_calendar',
+    'load_trading_calendar',
+]
@@ -0,0 +1,171 @@
+"""
+交易日历
+从 akshare 加载一次 A 股交易日历并保存到本地文件，之后直接读取本地文件；
+按自然日建立布尔表、累计计数和"上一交易日"下标，常用查询均为 O(1)
+"""
+
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DateLike = Union[date, datetime, str, np.datetime64, pd.Timestamp]
+
+CALENDAR_FILE = Path(__file__).resolve().parent.parent / 'data' / 'trade_calendar.csv'
+# 本地文件超过这个天数未更新时尝试从上游刷新（上游通常包含当年剩余的交易日）
+REFRESH_AFTER_DAYS = 7
+
+
+def _to_day(value: DateLike) -> np.datetime64:
+    """把各种日期表示统一成 numpy 的日精度日期"""
+    if isinstance(value, str):
+        value = value.strip()
+        if len(value) == 8 and value.isdigit():
+            value = f"{value[:4]}-{value[4:6]}-{value[6:]}"
+        return np.datetime64(value[:10], 'D')
+    if isinstance(value, datetime):
+        value = value.date()
+    return np.datetime64(value, 'D')
+
+
+class TradingCalendar:
+    """交易日历，查询接口接受 date/datetime/'YYYY-MM-DD'/'YYYYMMDD'"""
+
+    def __init__(self, trading_days: Iterable[DateLike]):
+        """
+        Args:
+            trading_days: 全部交易日
+        """
+        days = np.unique(np.array([_to_day(d) for d in trading_days], dtype='datetime64[D]'))
+        if len(days) == 0:
+            raise ValueError("交易日历为空")
+        self.days = days
+        self.start = days[0]
+        self.end = days[-1]
+        span = int((self.end - self.start).astype(int)) + 1
+        offsets = (days - self.start).astype(int)
+        # 自然日偏移 -> 是否交易日
+        self._is_open = np.zeros(span, dtype=bool)
+        self._is_open[offsets] = True
+        # 自然日偏移 -> 截至当天（含）的交易日数量
+        self._count = np.cumsum(self._is_open, dtype=np.int32)
+        # 自然日偏移 -> 截至当天（含）最后一个交易日在 days 中的下标
+        self._last_index = self._count - 1
+
+    def __len__(self):
+        return len(self.days)
+
+    def _offset(self, value: DateLike) -> int:
+        return int((_to_day(value) - self.start).astype(int))
+
+    def is_trading_day(self, value: DateLike) -> bool:
+        """
+        是否交易日。日历范围之后的日期按周一至周五估计，之前的日期视为非交易日
+        """
+        offset = self._offset(value)
+        if offset < 0:
+            return False
+        if offset >= len(self._is_open):
+            return pd.Timestamp(_to_day(value)).weekday() < 5
+        return bool(self._is_open[offset])
+
+    def previous_trading_day(self, value: DateLike, inclusive: bool = False) -> Optional[date]:
+        """
+        上一个交易日
+
+        Args:
+            value: 参考日期
+            inclusive: 参考日期本身是交易日时是否直接返回它
+
+        Returns:
+            date: 上一个交易日，早于日历起点时返回 None
+        """
+        offset = self._offset(value) - (0 if inclusive else 1)
+        if offset < 0:
+            return None
+        if offset >= len(self._is_open):
+            # 超出日历范围，按工作日往前找
+            day = pd.Timestamp(self.start + np.timedelta64(offset, 'D'))
+            while day.weekday() >= 5:
+                day -= timedelta(days=1)
+            return day.date()
+        index = self._last_index[offset]
+        return None if index < 0 else self.days[index].astype(object)
+
+    def trading_days_between(self, start: DateLike, end: DateLike) -> int:
+        """区间 [start, end] 内（两端包含）的交易日数量"""
+        lo, hi = self._offset(start), self._offset(end)
+        if hi < lo:
+            return 0
+        last = len(self._count) - 1
+        upper = self._count[min(hi, last)] if hi >= 0 else 0
+        lower = self._count[min(lo - 1, last)] if lo - 1 >= 0 else 0
+        extra = 0
+        if hi > last:
+            # 超出日历范围的部分按工作日计数
+            extra = int(np.busday_count(max(self.end + 1, _to_day(start)), _to_day(end) + 1))
+        return int(upper - lower) + extra
+
+    def trading_days(self, start: DateLike, end: DateLike) -> List[str]:
+        """区间 [start, end] 内的交易日列表（YYYY-MM-DD，升序），仅限日历范围内"""
+        lo, hi = np.searchsorted(self.days, [_to_day(start), _to_day(end)], side='left')
+        if hi < len(self.days) and self.days[hi] == _to_day(end):
+            hi += 1
+        return [str(d) for d in self.days[lo:hi]]
+
+
+def _fetch_calendar() -> pd.Series:
+    import akshare as ak
+    return pd.to_datetime(ak.tool_trade_date_hist_sina()['trade_date'])
+
+
+def load_trading_calendar(path: Path = CALENDAR_FILE, refresh: bool = False) -> TradingCalendar:
+    """
+    加载交易日历：优先读本地文件，文件不存在、过旧或 refresh=True 时从 akshare 刷新并保存；
+    上游不可用时退回本地文件
+
+    Args:
+        path: 本地日历文件
+        refresh: 是否强制从上游刷新
+
+    Returns:
+        TradingCalendar: 交易日历
+    """
+    path = Path(path)
+    stale = not path.exists() or (
+        datetime.now() - datetime.fromtimestamp(path.stat().st_mtime)
+    ).days >= REFRESH_AFTER_DAYS
+    if refresh or stale:
+        try:
+            days = _fetch_calendar()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            pd.DataFrame({'trade_date': days.dt.strftime('%Y-%m-%d')}).to_csv(path, index=False)
+            logger.info(f"交易日历已从上游刷新，共 {len(days)} 个交易日，保存到 {path}")
+            return TradingCalendar(days)
+        except Exception as e:
+            if not path.exists():
+                raise
+            logger.warning(f"刷新交易日历失败，使用本地文件: {e}")
+    return TradingCalendar(pd.read_csv(path, dtype=str)['trade_date'])
+
+
+_calendar: Optional[TradingCalendar] = None
+_loaded_at: Optional[datetime] = None
+_calendar_lock = threading.Lock()
+
+
+def get_trading_calendar() -> TradingCalendar:
+    """进程内共享的交易日历（首次调用时加载，常驻进程每 REFRESH_AFTER_DAYS 天重新加载一次）"""
+    global _calendar, _loaded_at
+    if _calendar is None or (datetime.now() - _loaded_at).days >= REFRESH_AFTER_DAYS:
+        with _calendar_lock:
+            if _calendar is None or (datetime.now() - _loaded_at).days >= REFRESH_AFTER_DAYS:
+                _calendar = load_trading_calendar()
+                _loaded_at = datetime.now()
+    return _calendar
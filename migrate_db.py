@@ -9,6 +9,43 @@ from sqlalchemy import inspect
 from sqlalchemy.exc import ProgrammingError
 from sqlalchemy import text
 
+# 资讯写库去重用的唯一约束（与 models 中的 UniqueConstraint 一致）：(表名, 约束名, 约束列, 时间列, 时间列为空时的替代列)
+NEWS_UNIQUE_CONSTRAINTS = [
+    ('stock_news', 'uq_stock_news_code_title_time', ['stock_code', 'title', 'publish_time'], 'publish_time', 'created_at'),
+    ('stock_research_reports', 'uq_stock_research_reports_code_name_date', ['stock_code', 'report_name', 'report_date'], 'report_date', 'updated_at'),
+]
+
+def migrate_news_unique_constraints(db):
+    """
+为资讯和研报表建立唯一约束：先把为空的时间列补成抓取当天，再删除重复数据（保留 id 最小的一条），最后加约束
+一次性执行，表较大时可能需要较长时间
+"""
+    inspector = inspect(db.bind)
+    for table, name, columns, time_column, fallback_column in NEWS_UNIQUE_CONSTRAINTS:
+        if not inspector.has_table(table):
+            print(f"✅ {table}表不存在，跳过（建表时由模型创建约束）")
+            continue
+        exists = db.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = :name AND conrelid = CAST(:table AS regclass))"
+        ), {"name": name, "table": table}).scalar()
+        if exists:
+            print(f"✅ {table}表已存在唯一约束 {name}")
+            continue
+        print(f"为{table}表添加唯一约束 {name}...")
+        filled = db.execute(text(
+            f"UPDATE {table} SET {time_column} = date_trunc('day', {fallback_column}) "
+            f"WHERE {time_column} IS NULL AND {fallback_column} IS NOT NULL"
+        )).rowcount
+        removed = db.execute(text(
+            f"DELETE FROM {table} WHERE id IN ("
+            f"SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY {', '.join(columns)} ORDER BY id) AS rn FROM {table} "
+            f"WHERE {' AND '.join(f'{c} IS NOT NULL' for c in columns)}) t "
+            f"WHERE t.rn > 1)"
+        )).rowcount
+        db.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE ({', '.join(columns)})"))
+        db.commit()
+        print(f"✅ 成功添加唯一约束 {name}（补齐{time_column} {filled} 条，删除重复数据 {removed} 条）")
+
 def migrate_database():
     """
 迁移数据库，添加缺失的列和表（适配PostgreSQL，推荐直接用Alembic管理迁移）
@@ -43,6 +80,7 @@ def migrate_database():
             db.add(admin)
             db.commit()
             print("✅ 成功创建默认管理员账号")
+        migrate_news_unique_constraints(db)
         db.commit()
         print("🎉 数据库迁移完成")
     except ProgrammingError as e: